@@ -1,29 +1,234 @@
 """Interact with The Diary Godmother webpage."""
 import datetime
-import requests
+import json
+import logging
+import threading
+import time
 import time_util
+import calendar_parser
+import calendars
+import store_hours
+import metrics
+import flavor_index
+import storage
 import humanize
-import pytz
+from circuit import CircuitBreaker, CircuitOpenError
 from collections import namedtuple
-from dateutil import tz
 
-from dateutil.relativedelta import relativedelta
-from bs4 import BeautifulSoup
+logger = logging.getLogger(__name__)
 
 
-def _build_params(dt):
+def _build_params(dt, cid=calendars.DEFAULT_CALENDAR.cid):
     """Takes a date and builds the parameters needed to scrape the dgm website.
 
     :param dt: the `datetime` object
+    :param cid: the id of the calendar to scrape
     :returns: the `params` that contain the needed api information
     """
     params = (('yr', dt.year),
               ('month', dt.month),
               ('dy', dt.day),
-              ('cid', 'mc-0191cbfb6d82b4fdb92b8847a2046366'))
+              ('cid', cid))
     return params
 
 
+def _build_session(retries, pool_size):
+    """Builds a pooled http session that retries failed requests with backoff
+
+    :param retries: the maximum number of retries for a request
+    :param pool_size: the maximum number of pooled connections per host
+    :returns: the `requests.Session`
+    """
+    # requests is only imported once the calendar is actually scraped
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.packages.urllib3.util.retry import Retry
+
+    retry = Retry(total=retries, backoff_factor=0.3,
+                  status_forcelist=(500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _run_concurrently(func, items, workers):
+    """Calls a function for every item in a bounded pool of threads
+
+    :param func: the function to call with each item
+    :param items: the items to call the function with
+    :param workers: the maximum number of threads
+    :returns: a list of `(value, error)` tuples in the order of the items
+    """
+    items = list(items)
+    results = [None] * len(items)
+    pending = iter(enumerate(items))
+    lock = threading.Lock()
+    recorder = metrics.current()
+
+    def worker():
+        metrics.attach(recorder)
+        while True:
+            with lock:
+                try:
+                    i, item = next(pending)
+                except StopIteration:
+                    return
+            try:
+                results[i] = (func(item), None)
+            except Exception as e:
+                results[i] = (None, e)
+
+    # a single item is not worth a thread
+    count = min(workers, len(items))
+    if count <= 1:
+        worker()
+        return results
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _build_day_result(days, dt, stale=False):
+    """Takes the parsed days of a month and builds the result for a single date
+
+    :param days: the `dict` of parsed days returned by `calendar_parser`
+    :param dt: the `datetime` object
+    :param stale: whether the days are expired data served in place of a fetch
+    :returns: a `Result `namedtuple` holding the results
+    """
+    result = _build_cached_day_result(days, dt)
+    if stale:
+        return result._replace(stale=True)
+    return result
+
+
+def _build_cached_day_result(days, dt):
+    """Takes the parsed days of a month and builds the result for a single date
+
+    :param days: the `dict` of parsed days returned by `calendar_parser`
+    :param dt: the `datetime` object
+    :returns: a `Result `namedtuple` holding the results
+    """
+    key = time_util.stringify_date(dt)
+
+    # check for no results or html error
+    if key not in days:
+        return _build_result(False, None, dt, 0, False, False, None)
+    flavors = days[key]
+    if flavors is None:
+        return _build_result(False, None, dt, 0, False, True,
+            'More than one table cell event summary with id of calendar-' +
+               key + 'found.')
+
+    # ensure that it is not closed on this day
+    if _is_closing(flavors):
+        return _build_result(False, None, dt, 0, True, False, None)
+
+    # build the flavor forecast result
+    return _build_flavor_forecast(flavors, dt)
+
+
+def _is_closing(flavors):
+    """Takes the parsed events of a day and checks whether they close the store
+
+    :param flavors: the list of event titles of the day
+    :returns: `True` if the store is closed that day
+    """
+    return any('closed' in f.lower() for f in flavors)
+
+
+def _is_closed_month(days):
+    """Takes the parsed days of a month and checks whether every event of it
+    closes the store, e.g. a month the store is closed for the season
+
+    :param days: the `dict` of parsed days
+    :returns: `True` if the month has events and all of them are closings
+    """
+    events = [flavors for flavors in days.values() if flavors]
+    return bool(events) and all(_is_closing(flavors) for flavors in events)
+
+
+def _has_events(days):
+    """Takes the parsed days of a month and checks whether any day has an event
+
+    :param days: the `dict` of parsed days
+    :returns: `True` if the calendar published anything for the month
+    """
+    return any(days.values())
+
+
+def _months_between(start, year, month):
+    """Takes a date and a month and counts the months from the month of the
+    date to it
+
+    :param start: the `date` to count from
+    :param year: the year of the month
+    :param month: the month
+    :returns: the number of months, negative for a month in the past
+    """
+    return (year - start.year) * 12 + month - start.month
+
+
+def _record_check(entry, changed):
+    """Takes a revalidated month and counts the revalidation in its history
+
+    :param entry: the previous `MonthEntry`
+    :param changed: whether the parsed days changed
+    :returns: a tuple of the new number of checks and changes
+    """
+    checks, changes = entry.checks + 1, entry.changes + int(changed)
+    if checks > CHANGE_HISTORY:
+        checks, changes = checks // 2, changes // 2
+    return checks, changes
+
+
+def _month_range(start, months):
+    """Takes a date and lists the month of the date and the months following it
+
+    :param start: the `datetime` of the first month
+    :param months: the number of months
+    :returns: a list of `(year, month)` tuples
+    """
+    index = start.year * 12 + start.month - 1
+    return [(i // 12, i % 12 + 1) for i in range(index, index + months)]
+
+
+def _parse_snapshot(data):
+    """Takes the contents of a snapshot written by `warmer.py` and loads it
+
+    :param data: the json of the snapshot
+    :returns: a tuple of the timestamp the snapshot was generated at and a
+        `dict` of `(year, month)` to parsed days, empty when the snapshot was
+        written by another parser version
+    """
+    snapshot = json.loads(data)
+    if snapshot.get('version') != PARSER_VERSION:
+        return 0, {}
+
+    months = {}
+    for month, days in snapshot['months'].items():
+        year, month = month.split('-')
+        months[(int(year), int(month))] = _load_days(days)
+    return snapshot.get('generated', 0), months
+
+
+def _read_snapshot(path):
+    """Reads a snapshot written by `warmer.py`
+
+    :param path: the local path or S3 url of the snapshot
+    :returns: a tuple of the timestamp the snapshot was generated at and a
+        `dict` of `(year, month)` to parsed days
+    """
+    return _parse_snapshot(storage.read(path)[0])
+
+
 def _build_flavor_forecast(flavors, dt):
     """Takes the flavors array and the searched date and builds a result object
     with containing the flavor forecast information
@@ -43,48 +248,19 @@ def _build_flavor_forecast(flavors, dt):
         return _build_result(True, flavors, dt, len(flavors), False, False, None)
 
 
-def _is_closed(dt):
+def _is_closed(dt, hours=None):
     """Takes a date and determines if the dairy godmother is closed at that time
 
-    :param dt_obj: the `datetime` object
+    :param dt: the `datetime` object, naive datetimes are treated as UTC
+    :param hours: the `store_hours.StoreHours` of the store, `STORE_HOURS` by default
     :returns: a `Status `namedtuple` holding the open or closed status of the store
 
     """
-    '''
-
-    All dates are converted to UTC to remove any local or native timestamps
-    due to where the skill is being run. 
-
-    EST Store hours: M-T 12:00pm-21:00pm, W-Th-F-S-Su 12:00pm-22:00pm
-    UTC Store hours: M  00:00 - 02:00, 16:00 - 24:00
-                     T  00:00 - 01:00, 16:00 - 24:00
-                     W  00:00 - 01:00, 16:00 - 24:00
-                     Th 00:00 - 02:00, 16:00 - 24:00
-                     Fr 00:00 - 02:00, 16:00 - 24:00
-                     S  00:00 - 02:00, 16:00 - 24:00 
-                     Su 00:00 - 02:00, 16:00 - 24:00
-    '''
-    if((dt.isoweekday() in [1, 4, 5, 6, 7]) and (dt.hour in range(2, 16))):
-        return _build_status(False, True, dt, False, None)
-    elif((dt.isoweekday() in [2, 3]) and (dt.hour in range(1, 16))):
-        return _build_status(False, True, dt, False, None)
-    else:
-        return _build_status(True, False, dt, False, None)
-
-
-def _seconds_until_open(dt):
-    """Takes a date and calculates the number of seconds until the dairy godmother
-    opens
-
-    :param date: the date to calculate against
-    :returns: the number of seconds until the dairy godmother opens
-
-    """
-    dt_open = time_util.build_time(dt.year, dt.month, dt.day, 16, 00, 00)
-    return (dt_open - dt).seconds
+    state = (hours or STORE_HOURS).lookup(dt)
+    return _build_status(state.is_open, not state.is_open, dt, state, False, None)
 
 
-def _seconds_until_close(dt):
+def _build_result(found, flavors, date, size, closed, has_error, error, stale=False):
     """Takes a date and calculates the number of seconds until the dairy godmother
     closes
 
@@ -92,47 +268,40 @@ def _seconds_until_close(dt):
     :returns: the number of seconds until the dairy godmother closes
 
     """
-    if((dt.isoweekday() in [1, 2]) and (dt.hour in range(16, 24))):
-        dt_close = time_util.build_time(dt.year, dt.month, dt.day + 1, 01, 00, 00)
-        return (dt_close - dt).seconds
-    elif((dt.isoweekday() in [1, 2]) and (dt.hour in range(0, 1))):
-        dt_close = time_util.build_time(dt.year, dt.month, dt.day, 01, 00, 00)
-        return (dt_close - dt).seconds
-    elif((dt.isoweekday() in [3, 4, 5, 6, 7]) and (dt.hour in range(16, 24))):
-        dt_close = time_util.build_time(
-            dt.year, dt.month, dt.day + 1, 2, 00, 00)
-        return (dt_close - dt).seconds
-    elif((dt.isoweekday() in [3, 4, 5, 6, 7]) and (dt.hour in range(0, 2))):
-        dt_close = time_util.build_time(dt.year, dt.month, dt.day, 02, 00, 00)
-        return (dt_close - dt).seconds
+    return Result(found=found, flavors=flavors, date=time_util.stringify_date(date),
+                  size=size, closed=closed, has_error=has_error, error=error, stale=stale)
 
 
-def _build_result(found, flavors, date, size, closed, has_error, error):
-    """Takes a date and calculates the number of seconds until the dairy godmother
-    closes
+def _build_next_flavor(found, flavor, date, has_error, error):
+    """Takes the outcome of a flavor lookup and builds a next flavor object
 
-    :param date: the date to calculate against
-    :returns: the number of seconds until the dairy godmother closes
+    :param flavor: the flavor name as written on the calendar, or as asked for
+        when it was not found
+    :param date: the `datetime` the flavor is next served on or `None`
+    :returns: a `NextFlavor `namedtuple` holding the lookup results
 
     """
-    return Result(found=found, flavors=flavors, date=time_util.stringify_date(date), humanized_date=humanize.naturaldate(date),
-                  size=size, closed=closed, has_error=has_error, error=error)
+    return NextFlavor(found=found, flavor=flavor,
+                      date=time_util.stringify_date(date) if date else None,
+                      humanized_date=humanize.naturaldate(date) if date else None,
+                      has_error=has_error, error=error)
 
 
-def _build_status(is_open, is_closed, date, has_error, error):
-    """Takes a date and calculates the number of seconds until the dairy godmother
-    closes
+def _build_status(is_open, is_closed, date, state, has_error, error):
+    """Takes the open or closed state of the store at a date and builds a status
+    object with the time left until it opens or closes
 
-    :param date: the date to calculate against
-    :returns: the number of seconds until the dairy godmother closes
+    :param date: the date the state was calculated for
+    :param state: the `store_hours.OpenState` at the date
+    :returns: a `Status `namedtuple` holding the open or closed status of the store
 
     """
     if(is_open):
-        return Status(is_open=is_open, is_closed=is_closed, date=date, humanized_date=humanize.naturaldate(date),
-                  time_left=time_util.humanize_time(_seconds_until_close(date)), has_error=has_error, error=error)
+        return Status(is_open=is_open, is_closed=is_closed, date=date,
+                      seconds_left=state.seconds_until_close, has_error=has_error, error=error)
     else:
-        return Status(is_open=is_open, is_closed=is_closed, date=date, humanized_date=humanize.naturaldate(date),
-                  time_left=time_util.humanize_time(_seconds_until_open(date)), has_error=has_error, error=error)
+        return Status(is_open=is_open, is_closed=is_closed, date=date,
+                      seconds_left=state.seconds_until_open, has_error=has_error, error=error)
 
 
 def _build_hours(open_str, close_str, date):
@@ -143,38 +312,245 @@ def _build_hours(open_str, close_str, date):
     :returns: the number of seconds until the dairy godmother closes
 
     """
-    return Hours(open_str=open_str, close_str=close_str, date=date, humanized_date=humanize.naturaldate(date))
+    return Hours(open_str=open_str, close_str=close_str, date=date)
 
 # Create objects to store the results for a search and the status of the
-# store being open or closed
-Result = namedtuple('Result', [
-                    'found', 'flavors', 'date', 'humanized_date', 'size', 'closed', 'has_error', 'error'])
-Status = namedtuple('Status', ['is_open', 'is_closed',
-                               'date', 'humanized_date', 'time_left', 'has_error', 'error'])
-Hours = namedtuple('Hours', ['open_str', 'close_str', 'date', 'humanized_date'])
+# store being open or closed. They are slotted tuples, and the humanized fields
+# are only worked out when a response speaks them.
+class Result(namedtuple('Result', [
+        'found', 'flavors', 'date', 'size', 'closed', 'has_error', 'error', 'stale'])):
+    __slots__ = ()
+
+    @property
+    def humanized_date(self):
+        return humanize.naturaldate(datetime.datetime.strptime(self.date, time_util.ALEXA_TIME_FORMAT))
+
+
+class Status(namedtuple('Status', ['is_open', 'is_closed', 'date', 'seconds_left', 'has_error', 'error'])):
+    __slots__ = ()
+
+    @property
+    def humanized_date(self):
+        return humanize.naturaldate(self.date)
+
+    @property
+    def time_left(self):
+        return time_util.humanize_time(self.seconds_left)
+
+
+class Hours(namedtuple('Hours', ['open_str', 'close_str', 'date'])):
+    __slots__ = ()
+
+    @property
+    def humanized_date(self):
+        return humanize.naturaldate(self.date)
+
+NextFlavor = namedtuple('NextFlavor', ['found', 'flavor', 'date', 'humanized_date', 'has_error', 'error'])
+
+# Create object to store a parsed calendar month along with the validators
+# needed to revalidate it with a conditional request, and the number of times
+# it was revalidated and found changed
+MonthEntry = namedtuple('MonthEntry', ['fetched', 'days', 'etag', 'last_modified', 'checks', 'changes'])
+
+# The store hours shared by every status and hours lookup
+STORE_HOURS = store_hours.StoreHours()
+
+
+# Default number of seconds a parsed calendar month is kept before refetching
+DEFAULT_TTL = 60 * 60
+
+# Multiple of the ttl a month before the current one is cached for, as the
+# days of past months are not edited anymore
+PAST_TTL_FACTOR = 30 * 24
+
+# Largest multiple of the ttl a future month that was never seen changing is
+# cached for. The current month always keeps the ttl, so a closing added on the
+# day is picked up.
+MAX_TTL_FACTOR = 8
+
+# Number of revalidations of a month its change rate is learned over, older
+# history is halved away so the rate follows the current editing pattern
+CHANGE_HISTORY = 16
+
+# Number of seconds an expired month is kept in the persistent cache so it can
+# still be revalidated with a conditional request
+REVALIDATE_TTL = 7 * 24 * 60 * 60
+
+# Default (connect, read) timeouts in seconds for requests to the calendar
+DEFAULT_TIMEOUT = (3.05, 5)
+
+# Default number of retries for a failed request to the calendar
+DEFAULT_RETRIES = 2
+
+# Default number of pooled connections to the calendar
+DEFAULT_POOL_SIZE = 4
+
+# Default number of months, starting with the current month, searched for the
+# next date of a flavor
+DEFAULT_INDEX_MONTHS = 3
+
+# Default number of seconds a search waits on the calendar before answering
+# with the last known good data, well within the Alexa response deadline
+DEFAULT_BUDGET = 2.5
+
+# Default number of seconds a month without any event is cached. Only the empty
+# month itself is, a month after it may still have events
+DEFAULT_NEGATIVE_TTL = 6 * 60 * 60
+
+# Default number of seconds a month whose every event is a closing is cached, as
+# a store closed for the season does not reopen from one hour to the next
+DEFAULT_CLOSED_TTL = 6 * 60 * 60
+
+# Number of seconds between two checks of a snapshot in S3 for a new version,
+# a local snapshot is checked on every search
+SNAPSHOT_POLL_INTERVAL = 60
+
+# Number of bytes of a calendar page read at a time in low memory mode
+STREAM_CHUNK_SIZE = 8 * 1024
+
+# Number of days before the end of a month from which a prefetch also fetches
+# the next month
+PREFETCH_NEXT_MONTH_DAYS = 3
+
+# Error of a search that could not reach the calendar in time
+UNAVAILABLE_ERROR = 'The flavor forecast is temporarily unavailable.'
+
+
+class BudgetExceededError(Exception):
+    """Raised when the calendar did not answer within the latency budget."""
+
+
+class _Refresh(object):
+    """A fetch of a calendar month in flight that concurrent lookups wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.days = None
+        self.error = None
+
+# Version of the parsed calendar format, bump whenever `calendar_parser` changes
+# so that persistently cached months from an older parser are ignored
+PARSER_VERSION = 1
+
+
+def _month_key(year, month, calendar=calendars.DEFAULT_CALENDAR.key):
+    """Takes a year and month and builds the persistent cache key
+
+    :param year: the year of the month
+    :param month: the month
+    :param calendar: the key of the calendar of the month
+    :returns: the cache key string
+    """
+    return 'month:{}:{:04d}-{:02d}'.format(calendar, year, month)
+
+
+def _load_days(days):
+    """Takes parsed days loaded from JSON and encodes the flavors the same way
+    `calendar_parser.parse_month` does
+
+    :param days: the `dict` of date strings to flavors
+    :returns: the `dict` of parsed days
+    """
+    return dict((str(date), None if flavors is None else [f.encode('UTF8') for f in flavors])
+                for date, flavors in days.items())
 
 
 class DGMApi(object):
     """Class to facilitate interaction."""
 
-    def __init__(self):
-        """Initialize the url.
+    def __init__(self, ttl=DEFAULT_TTL, cache=None, snapshot=None,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 pool_size=DEFAULT_POOL_SIZE, url=None, budget=DEFAULT_BUDGET,
+                 breaker=None, calendar=None, archive=None, compact_index=None,
+                 low_memory=False, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 closed_ttl=DEFAULT_CLOSED_TTL):
+        """Initialize the url, the http session and the calendar month cache.
+        Every calendar has its own `DGMApi`, so the caches, the connection pool
+        and the circuit breaker of one calendar never affect another.
 
+        :param ttl: the number of seconds a parsed calendar month is cached
+        :param cache: an optional persistent `cache.ForecastCache` shared across
+            invocations
+        :param snapshot: an optional local path or S3 url of a snapshot written
+            by `warmer.py`, searched before scraping until its months are as
+            old as the freshness of a cached month
+        :param timeout: the (connect, read) timeouts in seconds of a request
+        :param retries: the maximum number of retries of a failed request
+        :param pool_size: the maximum number of pooled connections, which also
+            bounds the number of months fetched concurrently
+        :param url: an optional url overriding the calendar page
+        :param budget: the number of seconds a search waits on the calendar
+            before serving stale data, or `None` to always wait
+        :param breaker: an optional `circuit.CircuitBreaker` for the calendar
+        :param calendar: the `calendars.Calendar` to scrape, The Dairy
+            Godmother by default
+        :param archive: an optional `archive.Archive` answering past months
+            without scraping
+        :param compact_index: an optional `compact_index.CompactIndex` that is
+            searched before scraping, without parsing
+        :param low_memory: whether calendar pages are streamed into the parser
+            instead of being read whole, for small memory sizes
+        :param negative_ttl: the number of seconds a month without any event
+            is cached
+        :param closed_ttl: the number of seconds an upcoming month whose every
+            event is a closing is cached
         :returns: `None`
         """
-        self.url = 'http://www.TheDairyGodmother.com/flavor-of-the-day-forecast/'
+        self.calendar = calendar or calendars.DEFAULT_CALENDAR
+        self.url = url or self.calendar.url
+        if self.calendar is calendars.DEFAULT_CALENDAR:
+            self.store_hours = STORE_HOURS
+        else:
+            self.store_hours = store_hours.StoreHours(self.calendar.hours, self.calendar.timezone)
+        self.retries = retries
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.timeout = timeout
+        self.workers = pool_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.closed_ttl = closed_ttl
+        self.cache = cache
+        self.snapshot = snapshot
+        self.archive = archive
+        self.compact_index = compact_index
+        self.low_memory = low_memory
+        self._months = {}
+        self._snapshot_state = (None, 0, {})
+        self._snapshot_checked = 0
+        self.budget = budget
+        self.breaker = breaker or CircuitBreaker()
+        self._refreshes = {}
+        self._refreshes_lock = threading.Lock()
+        self.flavors = flavor_index.FlavorIndex()
+        self._indexed = {}
+        self._index_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled http session, created on the first scrape.
+
+        :returns: the `requests.Session`
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = _build_session(self.retries, self.pool_size)
+        return self._session
 
     def operating_hours(self, dt):
         """Takes a date and determines the operating hours of the store
 
         :param dt: the `datetime` to check store hours for
-        :returns: a `Hours` `namedtuple` with hours information
+        :returns: a `Hours` `namedtuple` with hours information, both times are
+            `None` when the store does not open that day
 
         """
-        if dt.isoweekday() in range(1, 2):
-            return _build_hours('12 PM', '10 PM', dt)
-        else:
-            return _build_hours('12 PM', '11 PM', dt)
+        hours = self.store_hours.hours_on(dt)
+        if hours is None:
+            return _build_hours(None, None, dt)
+        return _build_hours(hours[0], hours[1], dt)
 
     def get_status(self):
         """Determines if the store is currently closed
@@ -183,7 +559,7 @@ class DGMApi(object):
 
         """
         dt = time_util.now()
-        return _is_closed(dt)
+        return _is_closed(dt, self.store_hours)
 
     def get_status_on_date(self, dt):
         """Determines if the store is currently closed
@@ -192,7 +568,498 @@ class DGMApi(object):
         :returns: a `Status `namedtuple` holding the open or closed status of the store
 
         """
-        return _is_closed(dt)
+        return _is_closed(dt, self.store_hours)
+
+    def fetch_page(self, year, month, headers=None, stream=False):
+        """Requests the calendar page of a month without parsing it
+
+        :param year: the year to fetch
+        :param month: the month to fetch
+        :param headers: optional request headers, e.g. conditional validators
+        :param stream: whether the body is left to be read in chunks
+        :returns: the `requests.Response`
+        """
+        params = _build_params(datetime.date(year, month, 1), self.calendar.cid)
+        with metrics.span('fetch'):
+            req = self.session.get(self.url, params=params, headers=headers or {},
+                                   timeout=self.timeout, stream=stream)
+        logger.debug("sent request to %s", req.url)
+        return req
+
+    def _fetch_month(self, year, month, entry=None):
+        """Scrapes the calendar page for a month and parses every day on it. When
+        a previous entry is given the page is revalidated with a conditional
+        request and the entry is reused if the page has not changed.
+
+        :param year: the year to fetch
+        :param month: the month to fetch
+        :param entry: an optional expired `MonthEntry` to revalidate
+        :returns: the fetched `MonthEntry`
+        """
+        headers = {}
+        if entry is not None and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+
+        req = self.fetch_page(year, month, headers, stream=self.low_memory)
+        try:
+            # the page has not changed since it was last parsed
+            if req.status_code == 304 and entry is not None:
+                metrics.count('not_modified')
+                checks, changes = _record_check(entry, False)
+                return entry._replace(fetched=time.time(), checks=checks, changes=changes)
+
+            req.raise_for_status()
+            with metrics.span('parse'):
+                days = self._parse_page(req, year, month)
+        finally:
+            req.close()
+
+        checks, changes = 0, 0
+        if entry is not None:
+            # a new page only counts as a change when the parsed days differ
+            checks, changes = _record_check(entry, days != entry.days)
+            if days != entry.days:
+                metrics.count('month_changed')
+        return MonthEntry(fetched=time.time(),
+                          days=days,
+                          etag=req.headers.get('ETag'),
+                          last_modified=req.headers.get('Last-Modified'),
+                          checks=checks,
+                          changes=changes)
+
+    def _parse_page(self, req, year, month):
+        """Parses the calendar page of a month, streaming the body into the
+        parser in low memory mode so neither the whole page nor its text is held
+
+        :param req: the `requests.Response` of the page
+        :param year: the year of the page
+        :param month: the month of the page
+        :returns: the `dict` of parsed days
+        """
+        if not self.low_memory:
+            return calendar_parser.parse_month(req.text, year, month)
+        # the encoding can not be guessed from a body that is never read whole
+        if req.encoding is None:
+            req.encoding = 'utf-8'
+        return calendar_parser.parse_month_stream(
+            req.iter_content(STREAM_CHUNK_SIZE, decode_unicode=True), year, month)
+
+    def _cached_month(self, year, month, dt=None):
+        """Looks up the parsed days of a month without scraping the calendar page
+
+        :param year: the year to look up
+        :param month: the month to look up
+        :param dt: an optional single date that is looked up, only that date is
+            read from the compact index
+        :returns: a tuple of the fresh parsed days or `None`, and the expired
+            `MonthEntry` if there is one
+        """
+        key = (year, month)
+        entry = self._months.get(key)
+        if entry is not None and self._is_fresh(year, month, entry):
+            metrics.count('month_cache.hit')
+            return entry.days, None
+
+        # prefer the published snapshot so the calendar is not scraped live
+        days = self._snapshot_month(year, month)
+        if days is not None:
+            metrics.count('snapshot.hit')
+            return days, None
+
+        # then the persistent cache, shared across invocations
+        if entry is None:
+            entry = self._load_month(year, month)
+            if entry is not None and self._is_fresh(year, month, entry):
+                metrics.count('persistent_cache.hit')
+                self._months[key] = entry
+                return entry.days, None
+
+        # then the memory mapped index, which is read without parsing
+        days = self._compact_month(year, month, dt, entry)
+        if days is not None:
+            metrics.count('index.hit')
+            return days, None
+
+        # past months are answered from the archive
+        days = self._archived_month(year, month)
+        if days is not None:
+            metrics.count('archive.hit')
+            return days, None
+
+        metrics.count('month_cache.miss')
+        return None, entry
+
+    def _refresh_month(self, year, month, entry):
+        """Scrapes a month, revalidating the expired entry if there is one, and
+        stores it in the caches. Failures are counted by the circuit breaker.
+
+        :param year: the year to scrape
+        :param month: the month to scrape
+        :param entry: the expired `MonthEntry` or `None`
+        :returns: the `dict` of parsed days
+        """
+        if not self.breaker.allow():
+            metrics.count('circuit.open')
+            raise CircuitOpenError('The calendar circuit is open.')
+        try:
+            entry = self._fetch_month(year, month, entry)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+
+        self._months[(year, month)] = entry
+        self._store_month(year, month, entry)
+        return entry.days
+
+    def _freshness(self, year, month, entry):
+        """Works out how long a cached month can be used without scraping it
+        again. Months without any event are kept for `negative_ttl` and past
+        months for `PAST_TTL_FACTOR` times the ttl. Other months whose every
+        event is a closing are kept for `closed_ttl`. The current month keeps
+        the ttl, while a future month is kept longer the less often it was
+        found changed, up to `MAX_TTL_FACTOR` times the ttl. How far out a
+        month is never lengthens its interval, the edits still to come to a
+        distant month are only known from its change rate.
+
+        :param year: the year of the month
+        :param month: the month
+        :param entry: the `MonthEntry`
+        :returns: the number of seconds the entry is fresh for
+        """
+        if not _has_events(entry.days):
+            return self.negative_ttl
+        distance = _months_between(datetime.date.today(), year, month)
+        if distance < 0:
+            return self.ttl * PAST_TTL_FACTOR
+        if _is_closed_month(entry.days):
+            return self.closed_ttl
+        if distance == 0:
+            return self.ttl
+        # smoothed share of the revalidations that found the month changed
+        change_rate = (entry.changes + 1.0) / (entry.checks + 1)
+        return self.ttl * min(1 / change_rate, MAX_TTL_FACTOR)
+
+    def _is_fresh(self, year, month, entry):
+        """Checks whether a cached month can be used without scraping it again
+
+        :param year: the year of the month
+        :param month: the month
+        :param entry: the `MonthEntry`
+        :returns: `True` if the entry has not expired
+        """
+        return time.time() - entry.fetched < self._freshness(year, month, entry)
+
+    def _join_refresh(self, year, month):
+        """Joins the fetch of a month already in flight, or registers a new one
+        that concurrent callers will join
+
+        :param year: the year to scrape
+        :param month: the month to scrape
+        :returns: a tuple of the `_Refresh` and whether the caller has to run it
+        """
+        key = (year, month)
+        with self._refreshes_lock:
+            refresh = self._refreshes.get(key)
+            if refresh is not None:
+                metrics.count('coalesced')
+                return refresh, False
+            refresh = self._refreshes[key] = _Refresh()
+            return refresh, True
+
+    def _run_refresh(self, refresh, year, month, entry):
+        """Scrapes a month for everyone waiting on the refresh, handing the days or
+        the error to all of them
+
+        :param refresh: the `_Refresh` registered by `_join_refresh`
+        :param year: the year to scrape
+        :param month: the month to scrape
+        :param entry: the expired `MonthEntry` or `None`
+        :returns: `None`
+        """
+        try:
+            # a refresh that finished just before this one was registered
+            fresh = self._months.get((year, month))
+            if fresh is not None and self._is_fresh(year, month, fresh):
+                refresh.days = fresh.days
+            else:
+                refresh.days = self._refresh_month(year, month, entry)
+        except Exception as e:
+            refresh.error = e
+        finally:
+            with self._refreshes_lock:
+                self._refreshes.pop((year, month), None)
+            refresh.done.set()
+
+    def _background_refresh(self, year, month, entry):
+        """Starts scraping a month in a background thread, joining the refresh
+        already in flight for the month if there is one
+
+        :param year: the year to scrape
+        :param month: the month to scrape
+        :param entry: the expired `MonthEntry` or `None`
+        :returns: the `_Refresh` to wait on
+        """
+        refresh, leader = self._join_refresh(year, month)
+        if not leader:
+            return refresh
+
+        recorder = metrics.current()
+
+        def run():
+            metrics.attach(recorder)
+            self._run_refresh(refresh, year, month, entry)
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return refresh
+
+    def _coalesced_refresh(self, year, month, entry):
+        """Scrapes a month in this thread, or waits on the refresh of the month
+        already in flight, so concurrent callers share a single request
+
+        :param year: the year to scrape
+        :param month: the month to scrape
+        :param entry: the expired `MonthEntry` or `None`
+        :returns: the `dict` of parsed days
+        """
+        refresh, leader = self._join_refresh(year, month)
+        if leader:
+            self._run_refresh(refresh, year, month, entry)
+        else:
+            refresh.done.wait()
+        if refresh.error is not None:
+            raise refresh.error
+        return refresh.days
+
+    def get_month(self, year, month):
+        """Gets the parsed days of a month, only scraping the calendar page when
+        the month is not cached or its cache entry has expired
+
+        :param year: the year to look up
+        :param month: the month to look up
+        :returns: the `dict` of parsed days returned by `calendar_parser.parse_month`
+        """
+        days, entry = self._cached_month(year, month)
+        if days is not None:
+            return days
+        return self._coalesced_refresh(year, month, entry)
+
+    def prefetch(self, dt=None, cancelled=None):
+        """Scrapes the month of a date ahead of the search that usually follows,
+        and the next month too near the end of the month. Months that are
+        cached are skipped and a month already being scraped is joined, so a
+        search arriving meanwhile shares the request. Failures are left for
+        that search to retry.
+
+        :param dt: the `date` to prefetch the month of, today by default
+        :param cancelled: an optional `threading.Event`, the months not fetched
+            yet are skipped once it is set
+        :returns: the list of `(year, month)` tuples that were scraped
+        """
+        dt = dt or datetime.date.today()
+        keys = _month_range(dt, 2)
+        day = datetime.date(dt.year, dt.month, dt.day)
+        year, month = keys[1]
+        if (datetime.date(year, month, 1) - day).days > PREFETCH_NEXT_MONTH_DAYS:
+            keys = keys[:1]
+
+        fetched = []
+        for year, month in keys:
+            if cancelled is not None and cancelled.is_set():
+                metrics.count('prefetch.cancelled')
+                break
+            days, entry = self._cached_month(year, month)
+            if days is not None:
+                continue
+            try:
+                self._coalesced_refresh(year, month, entry)
+            except Exception:
+                logger.debug("unable to prefetch %04d-%02d", year, month, exc_info=True)
+                break
+            metrics.count('prefetch')
+            fetched.append((year, month))
+        return fetched
+
+    def get_month_within_budget(self, year, month, dt=None):
+        """Gets the parsed days of a month, waiting at most the latency budget on
+        the calendar. When the calendar is slow, failing or its circuit is open
+        the last known good days are served as stale while the month keeps
+        refreshing in the background.
+
+        :param year: the year to look up
+        :param month: the month to look up
+        :param dt: an optional single date that is looked up, the days may then
+            only hold that date
+        :returns: a tuple of the `dict` of parsed days and whether they are stale
+        """
+        days, entry = self._cached_month(year, month, dt)
+        if days is not None:
+            return days, False
+        if self.budget is None:
+            return self._coalesced_refresh(year, month, entry), False
+
+        refresh = self._background_refresh(year, month, entry)
+        if refresh.done.wait(self.budget) and refresh.error is None:
+            return refresh.days, False
+
+        if not refresh.done.is_set():
+            metrics.count('budget.exceeded')
+        if entry is not None:
+            metrics.count('stale')
+            return entry.days, True
+        if refresh.error is not None:
+            raise refresh.error
+        raise BudgetExceededError('The calendar did not answer within {}s.'.format(self.budget))
+
+    def _reload_snapshot(self):
+        """Reloads the snapshot whenever it has been republished. A snapshot in
+        S3 is checked at most every `SNAPSHOT_POLL_INTERVAL` seconds.
+
+        :returns: a tuple of the version, the timestamp the snapshot was
+            generated at and the `dict` of parsed months
+        """
+        now = time.time()
+        if storage.is_s3(self.snapshot) and now - self._snapshot_checked < SNAPSHOT_POLL_INTERVAL:
+            return self._snapshot_state
+        self._snapshot_checked = now
+
+        try:
+            data, version = storage.read(self.snapshot, self._snapshot_state[0])
+            generated, months = _parse_snapshot(data)
+            self._snapshot_state = (version, generated, months)
+        except storage.NotModified:
+            pass
+        except Exception:
+            logger.debug("unable to read snapshot %s", self.snapshot, exc_info=True)
+            self._snapshot_state = (None, 0, {})
+        return self._snapshot_state
+
+    def _snapshot_month(self, year, month):
+        """Looks up a parsed month in the snapshot. A month of a snapshot that
+        is older than the freshness of the month is ignored, so an outdated
+        snapshot falls through to the caches and the calendar.
+
+        :param year: the year to look up
+        :param month: the month to look up
+        :returns: the `dict` of parsed days or `None` if it is not in the
+            snapshot or has expired
+        """
+        if self.snapshot is None:
+            return None
+        _, generated, months = self._reload_snapshot()
+        days = months.get((year, month))
+        if days is None:
+            return None
+        entry = MonthEntry(fetched=generated, days=days, etag=None, last_modified=None,
+                           checks=0, changes=0)
+        if not self._is_fresh(year, month, entry):
+            metrics.count('snapshot.expired')
+            return None
+        return days
+
+    def _compact_month(self, year, month, dt=None, entry=None):
+        """Looks up a parsed month in the compact index. Like the snapshot, a
+        month of the index is only served while it is as fresh as a cached
+        month scraped when the index was built, and never over an expired
+        `entry` scraped after the index was built.
+
+        :param year: the year to look up
+        :param month: the month to look up
+        :param dt: an optional single date, only its day is read unless the
+            freshness of the month can not be told from it
+        :param entry: the expired `MonthEntry` or `None`
+        :returns: the `dict` of parsed days or `None` if it is not indexed or
+            has expired
+        """
+        if self.compact_index is None:
+            return None
+        try:
+            built = self.compact_index.built()
+            if built is None or (entry is not None and entry.fetched >= built):
+                return None
+            days = month_days = None
+            if dt is not None:
+                days = self.compact_index.get_date(dt)
+                if days is None:
+                    return None
+                # a day with a flavor is enough to tell the month has events
+                # and is not closed, any other day needs the whole month
+                flavors = next(iter(days.values()), None)
+                if flavors and not _is_closing(flavors):
+                    month_days = days
+            if month_days is None:
+                month_days = self.compact_index.get_month(year, month)
+                if month_days is None:
+                    return None
+        except Exception:
+            logger.warning("unable to read month from index", exc_info=True)
+            return None
+
+        indexed = MonthEntry(fetched=built, days=month_days, etag=None, last_modified=None,
+                             checks=0, changes=0)
+        if not self._is_fresh(year, month, indexed):
+            metrics.count('index.expired')
+            return None
+        return month_days if days is None else days
+
+    def _archived_month(self, year, month):
+        """Looks up a month before the current month in the archive
+
+        :param year: the year to look up
+        :param month: the month to look up
+        :returns: the `dict` of parsed days or `None` if it is not archived
+        """
+        today = datetime.date.today()
+        if self.archive is None or (year, month) >= (today.year, today.month):
+            return None
+        try:
+            return self.archive.get_month(self.calendar.key, year, month)
+        except Exception:
+            logger.warning("unable to read month from archive", exc_info=True)
+            return None
+
+    def _load_month(self, year, month):
+        """Loads a parsed month from the persistent cache
+
+        :param year: the year to load
+        :param month: the month to load
+        :returns: a `MonthEntry` or `None` if it is not cached
+        """
+        if self.cache is None:
+            return None
+        try:
+            value = self.cache.get(_month_key(year, month, self.calendar.key), PARSER_VERSION)
+        except Exception:
+            logger.warning("unable to read month from cache", exc_info=True)
+            return None
+        if value is None:
+            return None
+        return MonthEntry(fetched=value['fetched'],
+                          days=_load_days(value['days']),
+                          etag=value.get('etag'),
+                          last_modified=value.get('last_modified'),
+                          checks=value.get('checks', 0),
+                          changes=value.get('changes', 0))
+
+    def _store_month(self, year, month, entry):
+        """Stores a parsed month in the persistent cache
+
+        :param year: the year to store
+        :param month: the month to store
+        :param entry: the `MonthEntry`
+        :returns: `None`
+        """
+        if self.cache is None:
+            return
+        try:
+            self.cache.set(_month_key(year, month, self.calendar.key), entry._asdict(),
+                           PARSER_VERSION, self._freshness(year, month, entry) + REVALIDATE_TTL)
+        except Exception:
+            logger.warning("unable to write month to cache", exc_info=True)
 
     def search(self, dt):
         """Search the flavor of the day based on the date
@@ -204,48 +1071,76 @@ class DGMApi(object):
 
         # perform search based on the passed in date
         try:
-            print("Searching for flavor of the day for {}".format(dt))
-
-            # build the params to scrap dgm webpage
-            params = _build_params(dt)
+            logger.debug("searching for flavor of the day for %s", dt)
+            days, stale = self.get_month_within_budget(dt.year, dt.month, dt)
+            with metrics.span('build'):
+                return _build_day_result(days, dt, stale)
+        except (BudgetExceededError, CircuitOpenError):
+            return _build_result(False, None, dt, 0, False, True, UNAVAILABLE_ERROR)
+        except Exception:
+            logger.warning("unable to search the flavor of the day for %s", dt, exc_info=True)
+            return _build_result(False, None, dt, 0, False, True,
+                    'An exception occured when performing a flavor forecast search.')
 
-            req = requests.get(self.url, params=params)
-            print("sending request to {}".format(req.url))
-            soup = BeautifulSoup(req.text, 'html.parser')
+    def search_range(self, start, end):
+        """Search the flavor of the day for every date between two dates. The
+        distinct months of the range are fetched concurrently.
 
-            # find the <td> with the specified date
-            results = soup.find_all(
-                'td', attrs={'id': 'calendar-' + time_util.stringify_date(dt)})
+        :param start: the first `datetime` to search for
+        :param end: the last `datetime` to search for, inclusive
+        :returns: a list of `Result `namedtuple` ordered by date
+        """
+        logger.debug("searching for flavors of the day from %s to %s", start, end)
+        dates = [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
 
-            # find the all of the event-title-summary for that day
-            if len(results) == 1:
-                event_summary = results[0].find(
-                    'h3', attrs={'class': 'event-title summary'}).find_all('a')
+        # fetch each month of the range once
+        months = sorted(set((dt.year, dt.month) for dt in dates))
+        fetched = dict(zip(months, _run_concurrently(
+            lambda key: self.get_month_within_budget(*key), months, self.workers)))
 
-                # create list to store clean flavors
-                flavors = []
+        results = []
+        with metrics.span('build'):
+            for dt in dates:
+                month, error = fetched[(dt.year, dt.month)]
+                if isinstance(error, (BudgetExceededError, CircuitOpenError)):
+                    results.append(_build_result(False, None, dt, 0, False, True, UNAVAILABLE_ERROR))
+                elif error is not None:
+                    results.append(_build_result(False, None, dt, 0, False, True,
+                        'An exception occured when performing a flavor forecast search.'))
+                else:
+                    results.append(_build_day_result(month[0], dt, month[1]))
+        return results
 
-                # clean up the summary
-                for summary in event_summary:
-                    flavors.append((summary.text.split('-')[0].split('(')[0]).strip())
+    def next_flavor(self, name, start=None, months=DEFAULT_INDEX_MONTHS):
+        """Search the next date a flavor is in the forecast. The months are
+        indexed by flavor once per fetch, so a lookup never scans the days.
 
-                # make sure the strings are encoded 
-                flavors = [x.encode('UTF8') for x in flavors]
+        :param name: the flavor name, e.g. from a speech slot
+        :param start: the first `datetime` to search from, today by default
+        :param months: the number of months to search, starting with the month
+            of the start date
+        :returns: a `NextFlavor `namedtuple` holding the lookup results
+        """
+        start = start or datetime.date.today()
+        logger.debug("searching for the next date of %s from %s", name, start)
 
-                # ensure that it is not closed on this day
-                if any('closed' in f.lower() for f in flavors):
-                    return _build_result(False, None, dt, 0, True, False, None)
+        keys = _month_range(start, months)
+        fetched = _run_concurrently(
+            lambda key: self.get_month_within_budget(*key), keys, self.workers)
+        if all(error is not None for _, error in fetched):
+            return _build_next_flavor(False, name, None, True,
+                'An exception occured when performing a flavor forecast search.')
 
-                # build the flavor forecast result
-                return _build_flavor_forecast(flavors, dt)
+        with self._index_lock:
+            # only reindex the months that were refetched
+            for key, (month, error) in zip(keys, fetched):
+                if error is None and self._indexed.get(key) is not month[0]:
+                    self.flavors.add_month(key[0], key[1], month[0])
+                    self._indexed[key] = month[0]
+            match, date = self.flavors.next_date(name, time_util.stringify_date(start))
 
-            # check for no results or html error
-            elif len(results) < 1:
-                return _build_result(False, None, dt, 0, False, False, None)
-            else:
-                return _build_result(False, None, dt, 0, False, True,
-                    'More than one table cell event summary with id of calendar-' + 
-                       time_util.stringify_date(dt) + 'found.')
-        except:
-            return _build_result(False, None, dt, 0, False, True,
-                    'An exception occured when performing a flavor forecast search.')
+        if date is None:
+            return _build_next_flavor(False, name, None, False, None)
+        return _build_next_flavor(True, self.flavors.display_name(match),
+                                  datetime.datetime.strptime(date, time_util.ALEXA_TIME_FORMAT).date(),
+                                  False, None)
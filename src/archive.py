@@ -0,0 +1,328 @@
+"""Incremental archive of the flavor history of the store calendars.
+
+Every archived month keeps a content hash of its calendar page, so re-running a
+crawl only re-parses and rewrites the months whose page actually changed. A
+crawl records its progress per month and resumes where an interrupted run of
+the same range stopped.
+
+    python src/archive.py crawl --start 2015-01 --end 2017-05 [--path FILE]
+    python src/archive.py export --output flavors.csv [--path FILE]
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import api
+import calendar_parser
+import calendars
+import crawler
+
+# Default location of the archive
+DEFAULT_ARCHIVE = 'flavorforecast-archive.db'
+
+# Create object to store the outcome of a crawl
+CrawlSummary = namedtuple('CrawlSummary', ['months', 'changed', 'unchanged', 'resumed', 'failed'])
+
+# Outcomes of archiving a month
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+
+
+def _month_name(year, month):
+    """Takes a year and month and builds the archived month name, e.g. `2017-05`
+
+    :param year: the year of the month
+    :param month: the month
+    :returns: the month name
+    """
+    return '{:04d}-{:02d}'.format(year, month)
+
+
+def _month_keys(start, end):
+    """Takes two dates and lists the months from the first through the last
+
+    :param start: the `datetime` of the first month
+    :param end: the `datetime` of the last month
+    :returns: a list of `(year, month)` tuples
+    """
+    months = api._months_between(start, end.year, end.month) + 1
+    return api._month_range(start, max(months, 0))
+
+
+class Archive(object):
+    """Archive of parsed calendar days backed by a local SQLite database."""
+
+    def __init__(self, path=DEFAULT_ARCHIVE):
+        """Initialize the database path.
+
+        :param path: the path of the SQLite database file
+        :returns: `None`
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        """Opens the database on first use and creates the archive tables
+
+        :returns: the `sqlite3.Connection`
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('CREATE TABLE IF NOT EXISTS archive_months ('
+                         'calendar TEXT NOT NULL, month TEXT NOT NULL, hash TEXT NOT NULL, '
+                         'version INTEGER NOT NULL, etag TEXT, last_modified TEXT, '
+                         'checked REAL NOT NULL, PRIMARY KEY (calendar, month)) WITHOUT ROWID')
+            conn.execute('CREATE TABLE IF NOT EXISTS archive_days ('
+                         'calendar TEXT NOT NULL, date TEXT NOT NULL, flavors TEXT, '
+                         'PRIMARY KEY (calendar, date)) WITHOUT ROWID')
+            conn.execute('CREATE TABLE IF NOT EXISTS archive_runs ('
+                         'calendar TEXT NOT NULL, first TEXT NOT NULL, last TEXT NOT NULL, '
+                         'started REAL NOT NULL, finished REAL, '
+                         'PRIMARY KEY (calendar, first, last)) WITHOUT ROWID')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _start_run(self, calendar, first, last):
+        """Starts a crawl of a range of months, or resumes the unfinished crawl of
+        the same range
+
+        :param calendar: the key of the calendar
+        :param first: the name of the first month
+        :param last: the name of the last month
+        :returns: the start timestamp of the run, months checked since are done
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute('SELECT started, finished FROM archive_runs '
+                               'WHERE calendar = ? AND first = ? AND last = ?',
+                               (calendar, first, last)).fetchone()
+            if row is not None and row[1] is None:
+                return row[0]
+
+            started = time.time()
+            conn.execute('INSERT OR REPLACE INTO archive_runs (calendar, first, last, started, finished) '
+                         'VALUES (?, ?, ?, ?, NULL)', (calendar, first, last, started))
+            conn.commit()
+            return started
+
+    def _finish_run(self, calendar, first, last):
+        with self._lock:
+            conn = self._connect()
+            conn.execute('UPDATE archive_runs SET finished = ? '
+                         'WHERE calendar = ? AND first = ? AND last = ?',
+                         (time.time(), calendar, first, last))
+            conn.commit()
+
+    def _month_row(self, calendar, month):
+        """Looks up the archived state of a month
+
+        :param calendar: the key of the calendar
+        :param month: the name of the month
+        :returns: a tuple of the hash, parser version, etag, last modified and
+            checked timestamp, or `None` if the month is not archived
+        """
+        with self._lock:
+            return self._connect().execute(
+                'SELECT hash, version, etag, last_modified, checked FROM archive_months '
+                'WHERE calendar = ? AND month = ?', (calendar, month)).fetchone()
+
+    def _write_month(self, calendar, month, days, digest, etag, last_modified):
+        """Replaces the archived days of a month in one transaction
+
+        :returns: `None`
+        """
+        rows = [(calendar, date, None if flavors is None else
+                 json.dumps([f.decode('UTF8') for f in flavors]))
+                for date, flavors in days.items()]
+        with self._lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM archive_days WHERE calendar = ? AND date LIKE ?',
+                         (calendar, month + '-%'))
+            conn.executemany('INSERT INTO archive_days (calendar, date, flavors) VALUES (?, ?, ?)', rows)
+            conn.execute('INSERT OR REPLACE INTO archive_months '
+                         '(calendar, month, hash, version, etag, last_modified, checked) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (calendar, month, digest, api.PARSER_VERSION, etag, last_modified, time.time()))
+            conn.commit()
+
+    def _touch_month(self, calendar, month):
+        with self._lock:
+            conn = self._connect()
+            conn.execute('UPDATE archive_months SET checked = ? WHERE calendar = ? AND month = ?',
+                         (time.time(), calendar, month))
+            conn.commit()
+
+    def archive_month(self, forecast, year, month):
+        """Fetches the page of a month and archives its days if the page changed
+        since it was last archived
+
+        :param forecast: the `api.DGMApi` of the calendar
+        :param year: the year to archive
+        :param month: the month to archive
+        :returns: `CHANGED` or `UNCHANGED`
+        """
+        calendar = forecast.calendar.key
+        name = _month_name(year, month)
+        row = self._month_row(calendar, name)
+        current = row is not None and row[1] == api.PARSER_VERSION
+
+        headers = {}
+        if current and row[2]:
+            headers['If-None-Match'] = row[2]
+        if current and row[3]:
+            headers['If-Modified-Since'] = row[3]
+
+        req = forecast.fetch_page(year, month, headers)
+        if req.status_code == 304 and current:
+            self._touch_month(calendar, name)
+            return UNCHANGED
+        req.raise_for_status()
+
+        digest = hashlib.sha1(req.content).hexdigest()
+        if current and row[0] == digest:
+            self._touch_month(calendar, name)
+            return UNCHANGED
+
+        days = calendar_parser.parse_month(req.text, year, month)
+        self._write_month(calendar, name, days, digest,
+                          req.headers.get('ETag'), req.headers.get('Last-Modified'))
+        return CHANGED
+
+    def crawl(self, forecast, start, end):
+        """Archives every month from the month of the start date through the
+        month of the end date. An unfinished crawl of the same range resumes
+        with the months it had not archived yet.
+
+        :param forecast: the `api.DGMApi` of the calendar, a
+            `crawler.ConcurrentDGMApi` fetches the months concurrently
+        :param start: the `datetime` of the first month
+        :param end: the `datetime` of the last month
+        :returns: a `CrawlSummary` `namedtuple`
+        """
+        calendar = forecast.calendar.key
+        keys = _month_keys(start, end)
+        first, last = _month_name(start.year, start.month), _month_name(end.year, end.month)
+        started = self._start_run(calendar, first, last)
+
+        todo = []
+        for year, month in keys:
+            row = self._month_row(calendar, _month_name(year, month))
+            if row is None or row[4] < started:
+                todo.append((year, month))
+
+        results = api._run_concurrently(lambda key: self.archive_month(forecast, *key),
+                                        todo, forecast.workers)
+        failed = sum(1 for _, error in results if error is not None)
+        if not failed:
+            self._finish_run(calendar, first, last)
+
+        return CrawlSummary(months=len(keys),
+                            changed=sum(1 for outcome, _ in results if outcome == CHANGED),
+                            unchanged=sum(1 for outcome, _ in results if outcome == UNCHANGED),
+                            resumed=len(keys) - len(todo),
+                            failed=failed)
+
+    def get_month(self, calendar, year, month):
+        """Gets the archived days of a month
+
+        :param calendar: the key of the calendar
+        :param year: the year to look up
+        :param month: the month to look up
+        :returns: the `dict` of parsed days or `None` if the month is not archived
+            by the current parser
+        """
+        name = _month_name(year, month)
+        row = self._month_row(calendar, name)
+        if row is None or row[1] != api.PARSER_VERSION:
+            return None
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT date, flavors FROM archive_days WHERE calendar = ? AND date LIKE ?',
+                (calendar, name + '-%')).fetchall()
+        return api._load_days(dict((date, None if flavors is None else json.loads(flavors))
+                                   for date, flavors in rows))
+
+    def export(self, f, calendar=None):
+        """Writes every archived flavor as csv rows of calendar, date and flavor.
+        Closed days and days without flavors are left out.
+
+        :param f: the file to write to
+        :param calendar: an optional key of the calendar to export
+        :returns: the number of rows written
+        """
+        query = 'SELECT calendar, date, flavors FROM archive_days WHERE flavors IS NOT NULL'
+        args = ()
+        if calendar is not None:
+            query += ' AND calendar = ?'
+            args = (calendar,)
+        with self._lock:
+            rows = self._connect().execute(query + ' ORDER BY calendar, date', args).fetchall()
+
+        writer = csv.writer(f)
+        writer.writerow(['calendar', 'date', 'flavor'])
+        count = 0
+        for key, date, flavors in rows:
+            for flavor in json.loads(flavors):
+                if 'closed' in flavor.lower():
+                    continue
+                writer.writerow([key.encode('UTF8'), date.encode('UTF8'), flavor.encode('UTF8')])
+                count += 1
+        return count
+
+
+def _parse_month(value):
+    return datetime.datetime.strptime(value, '%Y-%m').date()
+
+
+def main():
+    """Utility method to crawl and export the archive from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default=DEFAULT_ARCHIVE, help='the archive database')
+    parser.add_argument('--location', help='the calendar to archive, the default calendar by default')
+    commands = parser.add_subparsers(dest='command')
+
+    crawl = commands.add_parser('crawl', help='archive a range of months')
+    crawl.add_argument('--start', type=_parse_month, required=True, help='first month, e.g. 2015-01')
+    crawl.add_argument('--end', type=_parse_month, default=datetime.date.today(),
+                       help='last month, the current month by default')
+    crawl.add_argument('--concurrency', type=int, default=crawler.DEFAULT_CONCURRENCY)
+    crawl.add_argument('--delay', type=float, default=crawler.DEFAULT_DELAY,
+                       help='seconds between requests to the calendar')
+
+    export = commands.add_parser('export', help='write the archived flavors as csv')
+    export.add_argument('--output', help='the csv file, stdout by default')
+    args = parser.parse_args()
+
+    calendar = calendars.load_registry().get(args.location)
+    if calendar is None:
+        parser.error('unknown location: {}'.format(args.location))
+    archive = Archive(args.path)
+
+    if args.command == 'crawl':
+        forecast = crawler.ConcurrentDGMApi(concurrency=args.concurrency, delay=args.delay,
+                                            calendar=calendar)
+        summary = archive.crawl(forecast, args.start, args.end)
+        print("{} months: {} changed, {} unchanged, {} already done, {} failed".format(
+            summary.months, summary.changed, summary.unchanged, summary.resumed, summary.failed))
+        sys.exit(1 if summary.failed else 0)
+
+    if args.output:
+        with open(args.output, 'wb') as f:
+            count = archive.export(f, calendar.key)
+    else:
+        count = archive.export(sys.stdout, calendar.key)
+    sys.stderr.write("exported {} flavors\n".format(count))
+
+
+if __name__ == '__main__':
+    main()
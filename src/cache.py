@@ -0,0 +1,114 @@
+"""Persistent caches for the parsed flavor forecast data."""
+import json
+import sqlite3
+import threading
+import time
+
+
+class ForecastCache(object):
+    """Interface for a persistent key-value cache of parsed calendar data.
+
+    Values are JSON serializable objects. Every entry is stored with the
+    version of the parser that produced it and an expiry timestamp, so a
+    backend only has to return entries that match the requested version and
+    have not expired.
+    """
+
+    def get(self, key, version):
+        """Looks up a cached value
+
+        :param key: the cache key
+        :param version: the parser version the value must have been stored with
+        :returns: the cached value or `None` if it is missing, expired or stale
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, version, ttl):
+        """Stores a value in the cache
+
+        :param key: the cache key
+        :param value: the JSON serializable value to store
+        :param version: the parser version that produced the value
+        :param ttl: the number of seconds until the value expires
+        :returns: `None`
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Removes a value from the cache
+
+        :param key: the cache key
+        :returns: `None`
+        """
+        raise NotImplementedError
+
+
+class SQLiteCache(ForecastCache):
+    """Cache backed by a local SQLite database, e.g. under /tmp on Lambda."""
+
+    def __init__(self, path):
+        """Initialize the database path.
+
+        :param path: the path of the SQLite database file
+        :returns: `None`
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        """Opens the database on first use, creates the cache table and drops
+        the expired entries so the file does not keep growing
+
+        :returns: the `sqlite3.Connection`
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('CREATE TABLE IF NOT EXISTS forecast_cache ('
+                         'key TEXT PRIMARY KEY, version INTEGER NOT NULL, '
+                         'expires REAL NOT NULL, value TEXT NOT NULL)')
+            conn.execute('DELETE FROM forecast_cache WHERE expires < ?', (time.time(),))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key, version):
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT version, expires, value FROM forecast_cache WHERE key = ?',
+                (key,)).fetchone()
+        if row is None or row[0] != version or row[1] < time.time():
+            return None
+        return json.loads(row[2])
+
+    def set(self, key, value, version, ttl):
+        with self._lock:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO forecast_cache '
+                         '(key, version, expires, value) VALUES (?, ?, ?, ?)',
+                         (key, version, time.time() + ttl, json.dumps(value)))
+            conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM forecast_cache WHERE key = ?', (key,))
+            conn.commit()
+
+    def purge(self, version=None):
+        """Removes every entry that is expired, and optionally every entry that
+        was stored by another version. Expired entries are also purged
+        whenever the database is opened.
+
+        :param version: an optional current version, entries of any other
+            version are removed too
+        :returns: `None`
+        """
+        with self._lock:
+            conn = self._connect()
+            if version is None:
+                conn.execute('DELETE FROM forecast_cache WHERE expires < ?', (time.time(),))
+            else:
+                conn.execute('DELETE FROM forecast_cache WHERE version != ? OR expires < ?',
+                             (version, time.time()))
+            conn.commit()
@@ -0,0 +1,176 @@
+"""Extract the flavor forecast from The Dairy Godmother calendar page."""
+import re
+
+try:
+    from HTMLParser import HTMLParser
+    unescape = HTMLParser().unescape
+except ImportError:
+    from html import unescape
+
+# Prefix of the id of every day cell in the calendar table
+CELL_PREFIX = 'calendar-'
+
+# Opening tag of a day cell, capturing the date from its id
+CELL_RE = re.compile(r'<td\b[^>]*?\bid\s*=\s*([\'"])' + CELL_PREFIX +
+                     r'(\d{4}-\d{2}-\d{2})\1[^>]*>', re.IGNORECASE)
+
+# End of the calendar table, bounding the last day cell
+TABLE_END_RE = re.compile(r'</table\s*>', re.IGNORECASE)
+
+# Event summary heading of a day, capturing its inner html
+SUMMARY_RE = re.compile(r'<h3\b[^>]*?\bclass\s*=\s*([\'"])event-title summary\1[^>]*>'
+                        r'(.*?)</h3\s*>', re.IGNORECASE | re.DOTALL)
+
+# Event link inside a summary heading, capturing its inner html
+LINK_RE = re.compile(r'<a\b[^>]*>(.*?)</a\s*>', re.IGNORECASE | re.DOTALL)
+
+# Any tag or comment nested inside an event link
+TAG_RE = re.compile(r'<!--.*?-->|<[^>]*>', re.DOTALL)
+
+
+def clean_flavor(text):
+    """Takes the raw text of a calendar event link and strips the description
+    that follows the flavor name
+
+    :param text: the raw event title text
+    :returns: the cleaned flavor name
+    """
+    return (text.split('-')[0].split('(')[0]).strip()
+
+
+def link_text(html):
+    """Takes the inner html of a link and returns its text the way a parsed
+    document would
+
+    :param html: the html inside the `a` tag
+    :returns: the unescaped text without any nested tags
+    """
+    return unescape(TAG_RE.sub('', html))
+
+
+def parse_flavors(cell):
+    """Takes the html of a calendar day cell and extracts its flavors
+
+    :param cell: the html inside the `td` of the day
+    :returns: the list of encoded flavors, empty when the day has no events
+    """
+    # days without an event summary have no flavors
+    summary = SUMMARY_RE.search(cell)
+    if summary is None:
+        return []
+
+    # clean up the summary and make sure the strings are encoded
+    return [clean_flavor(link_text(a)).encode('UTF8')
+            for a in LINK_RE.findall(summary.group(2))]
+
+
+def iter_cells(html):
+    """Takes the html of a calendar page and slices out every day cell without
+    parsing the rest of the document. A cell ends where the next one starts or
+    where the calendar table closes.
+
+    :param html: the raw html of the calendar page
+    :returns: a generator of `(date, cell)` tuples of the date string and the
+        html inside the `td` of the day
+    """
+    matches = list(CELL_RE.finditer(html))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(html)
+        table_end = TABLE_END_RE.search(html, match.end(), end)
+        if table_end is not None:
+            yield str(match.group(2)), html[match.end():table_end.start()]
+            return
+        yield str(match.group(2)), html[match.end():end]
+
+
+def iter_cells_stream(chunks):
+    """Takes the html of a calendar page in chunks and slices out every day cell
+    as soon as the next one starts, the same way `iter_cells` does. Only the
+    unfinished cell is kept in memory, never the whole page, and no more chunks
+    are read once the calendar table closes.
+
+    :param chunks: an iterable of the decoded text of the page
+    :returns: a generator of `(date, cell)` tuples of the date string and the
+        html inside the `td` of the day
+    """
+    parts = []
+    pending = None
+    date = None
+    for chunk in chunks:
+        text = chunk if not pending else pending + chunk
+
+        # a tag that is still open at the end of the chunk is only searched once
+        # the next chunk completes it
+        cut = text.rfind('<')
+        if cut == -1 or '>' in text[cut:]:
+            cut = len(text)
+        pending = text[cut:]
+
+        pos = 0
+        while True:
+            cell = CELL_RE.search(text, pos, cut)
+            if date is not None:
+                table_end = TABLE_END_RE.search(text, pos, cell.start() if cell else cut)
+                if table_end is not None:
+                    parts.append(text[pos:table_end.start()])
+                    yield date, ''.join(parts)
+                    return
+            if cell is None:
+                break
+            if date is not None:
+                parts.append(text[pos:cell.start()])
+                yield date, ''.join(parts)
+            date = str(cell.group(2))
+            parts = []
+            pos = cell.end()
+
+        if date is not None:
+            parts.append(text[pos:cut])
+
+    if date is not None:
+        if pending:
+            parts.append(pending)
+        yield date, ''.join(parts)
+
+
+def parse_month(html, year, month):
+    """Takes the html of a calendar page and extracts the flavors for every day
+    of the given month
+
+    :param html: the raw html of the calendar page
+    :param year: the year of the calendar page
+    :param month: the month of the calendar page
+    :returns: a `dict` of date strings to the list of flavors for that day, or
+        `None` when more than one table cell exists for the date
+    """
+    return _parse_cells(iter_cells(html), year, month)
+
+
+def parse_month_stream(chunks, year, month):
+    """Takes the html of a calendar page in chunks and extracts the flavors for
+    every day of the given month, discarding every cell once it is parsed
+
+    :param chunks: an iterable of the decoded text of the page, e.g.
+        `requests.Response.iter_content(decode_unicode=True)`
+    :param year: the year of the calendar page
+    :param month: the month of the calendar page
+    :returns: the same `dict` as `parse_month`
+    """
+    return _parse_cells(iter_cells_stream(chunks), year, month)
+
+
+def _parse_cells(cells, year, month):
+    prefix = '{:04d}-{:02d}-'.format(year, month)
+
+    days = {}
+    for date, cell in cells:
+        if not date.startswith(prefix):
+            continue
+
+        # duplicate cells for the same date can not be trusted
+        if date in days:
+            days[date] = None
+        else:
+            days[date] = parse_flavors(cell)
+
+    return days
@@ -0,0 +1,125 @@
+"""Registry of the store calendars the flavor forecast is served for."""
+import json
+import os
+import re
+from collections import namedtuple
+
+import store_hours
+
+# Create object to store where the calendar of a store is scraped from, and the
+# address and opening hours of the store
+Calendar = namedtuple('Calendar', ['key', 'title', 'url', 'cid', 'timezone', 'hours', 'aliases',
+                                   'address'])
+
+# The calendar of The Dairy Godmother in Del Ray, used when no location is asked for
+DEFAULT_CALENDAR = Calendar(
+    key='dairy-godmother',
+    title='The Dairy Godmother',
+    url='http://www.TheDairyGodmother.com/flavor-of-the-day-forecast/',
+    cid='mc-0191cbfb6d82b4fdb92b8847a2046366',
+    timezone=store_hours.STORE_TIMEZONE,
+    hours=store_hours.WEEKLY_HOURS,
+    aliases=('dairy godmother', 'del ray', 'alexandria'),
+    address='2310 Mount Vernon Ave., Alexandria, VA 22301')
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+def _normalize(name):
+    """Takes a spoken or configured location and normalizes it for lookups
+
+    :param name: the location name
+    :returns: the normalized name
+    """
+    name = ' '.join(_NON_ALNUM_RE.sub(' ', name.lower()).split())
+    if name.startswith('the '):
+        name = name[len('the '):]
+    return name
+
+
+def _build_calendar(config):
+    """Takes a configured calendar and builds the calendar object
+
+    :param config: the `dict` read from the registry file
+    :returns: a `Calendar` `namedtuple`
+    :raises ValueError: if the store hours of the calendar are missing or invalid
+    """
+    try:
+        hours = dict((int(day), (tuple(opens), tuple(closes)))
+                     for day, (opens, closes) in config['hours'].items())
+        store_hours.validate_weekly(hours)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid hours of calendar {}: {}".format(config.get('key'), e))
+    return Calendar(key=config['key'],
+                    title=config['title'],
+                    url=config['url'],
+                    cid=config['cid'],
+                    timezone=config.get('timezone', store_hours.STORE_TIMEZONE),
+                    hours=hours,
+                    aliases=tuple(config.get('aliases', ())),
+                    address=config.get('address'))
+
+
+def snapshot_path(path, calendar):
+    """Takes the snapshot path of the default calendar and derives the snapshot
+    path of a calendar, e.g. `/tmp/flavorforecast-snapshot-<key>.json`
+
+    :param path: the path of the snapshot of the default calendar
+    :param calendar: the `Calendar`
+    :returns: the snapshot path
+    """
+    if calendar.key == DEFAULT_CALENDAR.key:
+        return path
+    root, ext = os.path.splitext(path)
+    return '{}-{}{}'.format(root, calendar.key, ext)
+
+
+class CalendarRegistry(object):
+    """The configured calendars, looked up by key, title or alias."""
+
+    def __init__(self, calendars=(DEFAULT_CALENDAR,), default=None):
+        """Index the calendars by every name they can be asked for by.
+
+        :param calendars: the `Calendar` objects
+        :param default: the key of the calendar used when no location is asked
+            for, the first calendar by default
+        :returns: `None`
+        """
+        self.calendars = list(calendars)
+        self.default = self.calendars[0]
+        self._names = {}
+        for calendar in self.calendars:
+            if calendar.key == default:
+                self.default = calendar
+            for name in (calendar.key, calendar.title) + tuple(calendar.aliases):
+                self._names[_normalize(name)] = calendar
+
+    def __iter__(self):
+        return iter(self.calendars)
+
+    def get(self, location=None):
+        """Gets the calendar of a location
+
+        :param location: the spoken location or `None` for the default calendar
+        :returns: the `Calendar` or `None` if the location is unknown
+        """
+        if not location:
+            return self.default
+        return self._names.get(_normalize(location))
+
+
+def load_registry(path=None):
+    """Loads the calendars from a json file, or only the default calendar when
+    no file is configured
+
+    :param path: the path of the registry file, `FLAVORFORECAST_CALENDARS` by default
+    :returns: the `CalendarRegistry`
+    """
+    path = path or os.environ.get('FLAVORFORECAST_CALENDARS')
+    if not path:
+        return CalendarRegistry()
+
+    with open(path) as f:
+        config = json.load(f)
+    return CalendarRegistry([_build_calendar(c) for c in config['calendars']],
+                            config.get('default'))
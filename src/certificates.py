@@ -0,0 +1,219 @@
+"""Cached verification of the certificates Alexa signs requests with.
+
+Flask-Ask downloads and checks the signing certificate chain on every request.
+The chain is fetched and validated once here and reused until it expires,
+in memory and optionally in a persistent cache shared across invocations.
+"""
+import calendar
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask_ask import verifier
+from flask_ask.verifier import VerificationError
+from OpenSSL import crypto
+from six.moves.urllib.request import urlopen
+
+# Default number of seconds a validated certificate chain is reused
+DEFAULT_CERTIFICATE_TTL = 24 * 60 * 60
+
+# Host the signing certificate has to be issued for
+ALEXA_HOST = u'echo-api.amazon.com'
+
+# Version of the persistently cached certificate chains
+CERTIFICATE_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+_PEM_RE = re.compile(br'-----BEGIN CERTIFICATE-----.+?-----END CERTIFICATE-----', re.DOTALL)
+
+
+def _download(cert_url):
+    """Downloads the certificate chain of a url
+
+    :param cert_url: the `SignatureCertChainUrl` of the request
+    :returns: the PEM encoded chain
+    """
+    return urlopen(cert_url).read()
+
+
+def _split_chain(pem):
+    """Takes a PEM encoded chain and loads every certificate of it
+
+    :param pem: the PEM encoded chain, the signing certificate first
+    :returns: a list of `OpenSSL.crypto.X509`
+    """
+    return [crypto.load_certificate(crypto.FILETYPE_PEM, cert) for cert in _PEM_RE.findall(pem)]
+
+
+def _load_roots(path):
+    """Reads the trusted root certificates from a PEM bundle
+
+    :param path: the path of the bundle, e.g. `certifi.where()`
+    :returns: a list of `OpenSSL.crypto.X509`
+    """
+    with open(path, 'rb') as f:
+        return _split_chain(f.read())
+
+
+def _not_after(cert):
+    """Takes a certificate and returns the timestamp it expires at
+
+    :param cert: the `OpenSSL.crypto.X509`
+    :returns: the number of seconds since the epoch
+    """
+    not_after = datetime.strptime(cert.get_notAfter().decode('utf-8'), '%Y%m%d%H%M%SZ')
+    return calendar.timegm(not_after.utctimetuple())
+
+
+def _valid_signing_certificate(cert):
+    """Checks the signing certificate is current and issued for `ALEXA_HOST`,
+    the check of `flask_ask.verifier._valid_certificate` without formatting
+    the extensions through pyOpenSSL
+
+    :param cert: the signing `OpenSSL.crypto.X509`
+    :returns: `True` if the certificate is valid
+    """
+    if time.time() >= _not_after(cert):
+        return False
+    # imported on the first validation, not on the cold start of every container
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+
+    parsed = x509.load_der_x509_certificate(crypto.dump_certificate(crypto.FILETYPE_ASN1, cert),
+                                            default_backend())
+    try:
+        names = parsed.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+    except x509.ExtensionNotFound:
+        return False
+    return names.get_values_for_type(x509.DNSName) == [ALEXA_HOST]
+
+
+def validate_chain(pem, roots):
+    """Validates a certificate chain: every certificate has to be signed by the
+    next one up to a trusted root, and the signing certificate has to be a
+    current certificate for `echo-api.amazon.com`
+
+    :param pem: the PEM encoded chain, the signing certificate first
+    :param roots: the list of trusted root `OpenSSL.crypto.X509`
+    :returns: the signing `OpenSSL.crypto.X509` and the timestamp the chain
+        expires at
+    """
+    chain = _split_chain(pem)
+    if not chain:
+        raise VerificationError("Certificate chain is empty")
+
+    store = crypto.X509Store()
+    for root in roots:
+        store.add_cert(root)
+
+    # validate from the top of the chain down, only trusting validated links
+    for cert in reversed(chain):
+        try:
+            crypto.X509StoreContext(store, cert).verify_certificate()
+        except crypto.X509StoreContextError as e:
+            raise VerificationError("Certificate chain verification failed: {}".format(e))
+        if cert is not chain[0]:
+            store.add_cert(cert)
+
+    if not _valid_signing_certificate(chain[0]):
+        raise VerificationError("Certificate verification failed")
+    return chain[0], min(_not_after(cert) for cert in chain)
+
+
+class CertificateCache(object):
+    """Signing certificates by url, validated once and reused until they expire."""
+
+    def __init__(self, ttl=DEFAULT_CERTIFICATE_TTL, cache=None, roots=None, fetch=None):
+        """Initialize the cache.
+
+        :param ttl: the number of seconds a validated chain is reused
+        :param cache: an optional persistent `cache.ForecastCache` to share the
+            downloaded chains across invocations, or a function opening it on
+            the first download
+        :param roots: an optional list of trusted root `OpenSSL.crypto.X509`,
+            the bundle of `certifi` by default
+        :param fetch: an optional function downloading a chain by url
+        :returns: `None`
+        """
+        self.ttl = ttl
+        self._cache = cache
+        self._roots = roots
+        self.fetch = fetch or _download
+        self._certs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def roots(self):
+        """The trusted root certificates, read on the first validation.
+
+        :returns: a list of `OpenSSL.crypto.X509`
+        """
+        if self._roots is None:
+            import certifi
+            self._roots = _load_roots(certifi.where())
+        return self._roots
+
+    @property
+    def cache(self):
+        """The persistent cache, opened on the first download.
+
+        :returns: the `cache.ForecastCache` or `None`
+        """
+        if callable(self._cache):
+            self._cache = self._cache()
+        return self._cache
+
+    def _load_pem(self, cert_url):
+        """Gets the chain of a url from the persistent cache or downloads it
+
+        :param cert_url: the url of the chain
+        :returns: the PEM encoded chain
+        """
+        key = 'cert:' + cert_url
+        cache = self.cache
+        if cache is not None:
+            try:
+                value = cache.get(key, CERTIFICATE_VERSION)
+                if value is not None:
+                    return value.encode('ascii')
+            except Exception:
+                logger.warning("unable to read certificate from cache", exc_info=True)
+
+        pem = self.fetch(cert_url)
+        if cache is not None:
+            try:
+                cache.set(key, pem.decode('ascii'), CERTIFICATE_VERSION, self.ttl)
+            except Exception:
+                logger.warning("unable to write certificate to cache", exc_info=True)
+        return pem
+
+    def load_certificate(self, cert_url):
+        """Gets the validated signing certificate of a url, a drop-in replacement
+        of `flask_ask.verifier.load_certificate`
+
+        :param cert_url: the `SignatureCertChainUrl` of the request
+        :returns: the signing `OpenSSL.crypto.X509`
+        """
+        if not verifier._valid_certificate_url(cert_url):
+            raise VerificationError("Certificate URL verification failed")
+
+        now = time.time()
+        with self._lock:
+            cached = self._certs.get(cert_url)
+        if cached is not None and now < cached[1]:
+            return cached[0]
+
+        cert, not_after = validate_chain(self._load_pem(cert_url), self.roots)
+        with self._lock:
+            self._certs[cert_url] = (cert, min(now + self.ttl, not_after))
+        return cert
+
+    def install(self):
+        """Replaces the certificate loading of flask-ask with this cache
+
+        :returns: `None`
+        """
+        verifier.load_certificate = self.load_certificate
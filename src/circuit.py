@@ -0,0 +1,77 @@
+"""Circuit breaker that stops calling a failing upstream until it recovers."""
+import threading
+import time
+
+# Number of consecutive failures that open the circuit
+DEFAULT_FAILURE_THRESHOLD = 3
+
+# Number of seconds the circuit stays open before a trial request is let through
+DEFAULT_RESET_TIMEOUT = 30
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream while its circuit is open."""
+
+
+class CircuitBreaker(object):
+    """Tracks the failures of an upstream.
+
+    The circuit opens after a number of consecutive failures, so callers fail
+    fast instead of waiting on the upstream. Once the reset timeout has passed a
+    single trial request is allowed through: a success closes the circuit and a
+    failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        """Initialize the thresholds of the circuit.
+
+        :param failure_threshold: the number of consecutive failures that open
+            the circuit
+        :param reset_timeout: the number of seconds before a trial request
+        :returns: `None`
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Determines if a request may be sent to the upstream
+
+        :returns: `True` when the circuit is closed or a trial request is due
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() - self.opened >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        """Closes the circuit after a successful request
+
+        :returns: `None`
+        """
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        """Counts a failed request, opening the circuit when the threshold is
+        reached or the trial request failed
+
+        :returns: `None`
+        """
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened = time.time()
@@ -0,0 +1,259 @@
+"""Compact binary forecast index read through mmap without parsing.
+
+The index holds one fixed-width record per day, from the first day of the
+first indexed month through the last day of the last one, so the record of a
+date is found by its offset from the first day. A record points into a list of
+flavor ids, and every flavor name is stored once in an interned string table:
+
+    header | day records | flavor ids | string offsets | string data
+
+Only the header and the records of the looked up days are read, so opening the
+index costs the same whatever its size. The header holds the time the parsed
+days were scraped at, so a reader can tell how fresh every month of it is.
+"""
+import datetime
+import mmap
+import os
+import struct
+import threading
+import time
+
+# Magic bytes at the start of every index file
+MAGIC = b'DGMI'
+
+# Version of the binary layout, bump whenever it changes
+FORMAT_VERSION = 2
+
+# magic, layout version, parser version, build timestamp, first day ordinal, days,
+# flavor ids, strings
+HEADER = struct.Struct('<4sHHdIIII')
+
+# start in the flavor ids or one of the day states below, number of flavors
+RECORD = struct.Struct('<iH')
+
+# Index of a flavor in the string table
+FLAVOR_ID = struct.Struct('<H')
+
+# Offset of a string in the string data
+STRING_OFFSET = struct.Struct('<I')
+
+# Day states stored in place of the start of the flavors
+MISSING = -1
+ERROR = -2
+NOT_INDEXED = -3
+
+# Format of the date keys of the parsed days
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def _month_days(year, month):
+    """Takes a year and month and lists the ordinals of its days
+
+    :param year: the year of the month
+    :param month: the month
+    :returns: the `range` of day ordinals
+    """
+    first = datetime.date(year, month, 1)
+    following = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return range(first.toordinal(), following.toordinal())
+
+
+def build_index(months, version=0, built=None):
+    """Takes parsed months and builds the binary index
+
+    :param months: a `dict` of `(year, month)` to the parsed days of
+        `calendar_parser.parse_month`
+    :param version: the parser version of the parsed days
+    :param built: the timestamp the parsed days were scraped at, now by default
+    :returns: the index bytes
+    """
+    strings, string_ids, flavor_ids, records = [], {}, [], []
+    if months:
+        ordinals = range(_month_days(*min(months))[0], _month_days(*max(months))[-1] + 1)
+    else:
+        ordinals = []
+
+    for ordinal in ordinals:
+        day = datetime.date.fromordinal(ordinal)
+        days = months.get((day.year, day.month))
+        key = day.strftime(DATE_FORMAT)
+        if days is None:
+            records.append((NOT_INDEXED, 0))
+        elif key not in days:
+            records.append((MISSING, 0))
+        elif days[key] is None:
+            records.append((ERROR, 0))
+        else:
+            records.append((len(flavor_ids), len(days[key])))
+            for flavor in days[key]:
+                if not isinstance(flavor, bytes):
+                    flavor = flavor.encode('UTF8')
+                if flavor not in string_ids:
+                    string_ids[flavor] = len(strings)
+                    strings.append(flavor)
+                flavor_ids.append(string_ids[flavor])
+
+    offsets = [0]
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+
+    if built is None:
+        built = time.time()
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, version, built, ordinals[0] if ordinals else 0,
+                         len(records), len(flavor_ids), len(strings))]
+    parts.extend(RECORD.pack(*record) for record in records)
+    parts.extend(FLAVOR_ID.pack(flavor_id) for flavor_id in flavor_ids)
+    parts.extend(STRING_OFFSET.pack(offset) for offset in offsets)
+    parts.extend(strings)
+    return b''.join(parts)
+
+
+def write_index(months, path, version=0, built=None):
+    """Builds the index of parsed months and writes it atomically so readers
+    never map a partial file
+
+    :param months: a `dict` of `(year, month)` to parsed days
+    :param path: the path of the index file
+    :param version: the parser version of the parsed days
+    :param built: the timestamp the parsed days were scraped at, now by default
+    :returns: `None`
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(build_index(months, version, built))
+    os.rename(tmp_path, path)
+
+
+class _MappedIndex(object):
+    """One opened index file and the offsets of its sections."""
+
+    def __init__(self, buf):
+        (magic, layout, self.version, self.built,
+         self.first, self.days, ids, strings) = HEADER.unpack_from(buf)
+        if magic != MAGIC or layout != FORMAT_VERSION:
+            raise ValueError("Not a forecast index of version {}".format(FORMAT_VERSION))
+        self.buf = buf
+        self.ids = HEADER.size + self.days * RECORD.size
+        self.offsets = self.ids + ids * FLAVOR_ID.size
+        self.strings = self.offsets + (strings + 1) * STRING_OFFSET.size
+
+    def _string(self, string_id):
+        start, end = struct.unpack_from('<II', self.buf, self.offsets + string_id * STRING_OFFSET.size)
+        return self.buf[self.strings + start:self.strings + end]
+
+    def day(self, ordinal):
+        """Reads the record of a day
+
+        :param ordinal: the ordinal of the day
+        :returns: a tuple of the day state or `None`, and the list of flavors
+        """
+        offset = ordinal - self.first
+        if not 0 <= offset < self.days:
+            return NOT_INDEXED, None
+        start, count = RECORD.unpack_from(self.buf, HEADER.size + offset * RECORD.size)
+        if start < 0:
+            return start, None
+        return None, [self._string(FLAVOR_ID.unpack_from(self.buf, self.ids + i * FLAVOR_ID.size)[0])
+                      for i in range(start, start + count)]
+
+
+class CompactIndex(object):
+    """Forecast index file mapped into memory, remapped whenever it is republished."""
+
+    def __init__(self, path, version=None):
+        """Initialize the path of the index.
+
+        :param path: the path of the index file written by `write_index`
+        :param version: the parser version the index has to be written with, or
+            `None` to accept any
+        :returns: `None`
+        """
+        self.path = path
+        self.version = version
+        self._index = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """Maps the index file, remapping it when its modification time changed
+
+        :returns: the `_MappedIndex` or `None` if there is no usable index
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None
+        if mtime == self._mtime:
+            return self._index
+
+        with self._lock:
+            if mtime != self._mtime:
+                index = None
+                try:
+                    with open(self.path, 'rb') as f:
+                        index = _MappedIndex(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                except (IOError, OSError, ValueError, struct.error):
+                    pass
+                if index is not None and self.version is not None and index.version != self.version:
+                    index = None
+                self._index, self._mtime = index, mtime
+            return self._index
+
+    def built(self):
+        """Gets the time the parsed days of the index were scraped at
+
+        :returns: the timestamp or `None` if there is no usable index
+        """
+        index = self._open()
+        return None if index is None else index.built
+
+    def get_day(self, dt):
+        """Looks up the parsed flavors of a single date
+
+        :param dt: the `datetime` or `date` to look up
+        :returns: the list of flavors, or `None` if the calendar had an error
+            on that day
+        :raises KeyError: if the date is not in the index
+        """
+        index = self._open()
+        state, flavors = (NOT_INDEXED, None) if index is None else index.day(dt.toordinal())
+        if state in (NOT_INDEXED, MISSING):
+            raise KeyError(dt.strftime(DATE_FORMAT))
+        return flavors
+
+    def get_date(self, dt):
+        """Looks up a single date in the shape of `get_month`, without reading
+        the rest of the month
+
+        :param dt: the `datetime` or `date` to look up
+        :returns: a `dict` of the parsed day, empty if the calendar had no events
+            that day, or `None` if the month is not indexed
+        """
+        index = self._open()
+        if index is None:
+            return None
+        state, flavors = index.day(dt.toordinal())
+        if state == NOT_INDEXED:
+            return None
+        if state == MISSING:
+            return {}
+        return {dt.strftime(DATE_FORMAT): flavors}
+
+    def get_month(self, year, month):
+        """Looks up the parsed days of a month
+
+        :param year: the year to look up
+        :param month: the month to look up
+        :returns: the `dict` of parsed days or `None` if the month is not indexed
+        """
+        index = self._open()
+        if index is None:
+            return None
+        days = {}
+        for ordinal in _month_days(year, month):
+            state, flavors = index.day(ordinal)
+            if state == NOT_INDEXED:
+                return None
+            if state != MISSING:
+                days[datetime.date.fromordinal(ordinal).strftime(DATE_FORMAT)] = flavors
+        return days
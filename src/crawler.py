@@ -0,0 +1,92 @@
+"""Crawl many months of The Dairy Godmother calendar concurrently."""
+import threading
+import time
+from collections import namedtuple
+
+try:
+    from urlparse import urlparse
+except ImportError:
+    from urllib.parse import urlparse
+
+import api
+
+# Default number of calendar pages requested at the same time
+DEFAULT_CONCURRENCY = 4
+
+# Default number of seconds between the starts of two requests to one host
+DEFAULT_DELAY = 0.1
+
+# Create object to store the outcome of crawling a month
+CrawledMonth = namedtuple('CrawledMonth', ['year', 'month', 'days', 'error'])
+
+
+class _HostThrottle(object):
+    """Spaces out the requests to each host by a politeness delay."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        """Blocks until the next request to a host may start
+
+        :param host: the host of the request
+        :returns: `None`
+        """
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next.get(host, 0))
+            self._next[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+
+class ConcurrentDGMApi(api.DGMApi):
+    """`api.DGMApi` that fetches many calendar months at the same time.
+
+    Python 2 has no asyncio, so months are fetched by a bounded pool of threads
+    sharing the pooled session. Every request waits on a per-host politeness
+    delay and is parsed by the same month parser as a search.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, delay=DEFAULT_DELAY, **kwargs):
+        """Initialize the concurrency limit and the politeness delay.
+
+        :param concurrency: the maximum number of months fetched at the same
+            time, which also sizes the connection pool
+        :param delay: the number of seconds between the starts of two requests
+            to the calendar host
+        :param kwargs: the arguments of `api.DGMApi`
+        :returns: `None`
+        """
+        kwargs.setdefault('pool_size', concurrency)
+        super(ConcurrentDGMApi, self).__init__(**kwargs)
+        self.workers = concurrency
+        self.throttle = _HostThrottle(delay)
+
+    def fetch_page(self, year, month, headers=None, stream=False):
+        """Waits on the politeness delay of the calendar host and requests the
+        page of a month.
+
+        :param year: the year to fetch
+        :param month: the month to fetch
+        :param headers: optional request headers
+        :param stream: whether the body is left to be read in chunks
+        :returns: the `requests.Response`
+        """
+        self.throttle.wait(urlparse(self.url).netloc)
+        return super(ConcurrentDGMApi, self).fetch_page(year, month, headers, stream)
+
+    def crawl(self, start, months):
+        """Gets the parsed days of the month of a date and the months after it,
+        fetching the months that are not cached concurrently
+
+        :param start: the `datetime` of the first month
+        :param months: the number of months to crawl
+        :returns: a list of `CrawledMonth` `namedtuple` in the order of the months
+        """
+        keys = api._month_range(start, months)
+        fetched = api._run_concurrently(lambda key: self.get_month(*key), keys, self.workers)
+        return [CrawledMonth(year=year, month=month, days=days, error=error)
+                for (year, month), (days, error) in zip(keys, fetched)]
@@ -0,0 +1,166 @@
+"""Lean handler answering the high-volume intents straight from the request JSON.
+
+The handler wraps the WSGI app of the skill. Requests for the intents in
+`FAST_INTENTS` are verified and dispatched to their flask-ask view functions
+inside an application context only, skipping the Flask request cycle and
+producing the same response body. Every other request, and any request that
+cannot be parsed or verified, falls through to Flask unchanged. Once a view
+has run it is never run again by Flask: its errors are answered the way Flask
+answers them.
+"""
+import inspect
+import io
+import json
+import logging
+import sys
+
+from flask_ask import models, verifier
+from werkzeug.datastructures import EnvironHeaders
+
+import metrics
+import profiling
+
+# Intents answered by the fast path
+FAST_INTENTS = frozenset(['GetSearchIntent', 'GetOpenIntent', 'GetHoursIntent'])
+
+logger = logging.getLogger(__name__)
+
+
+def _verify(ask, app, body, payload, headers):
+    """Verifies a request the same way flask-ask does
+
+    :param ask: the `flask_ask.Ask` of the skill
+    :param app: the Flask app
+    :param body: the raw request body
+    :param payload: the parsed request body
+    :param headers: the request headers
+    :returns: `None`
+    """
+    cert = verifier.load_certificate(headers['Signaturecertchainurl'])
+    verifier.verify_signature(cert, headers['Signature'], body)
+
+    timestamp = ask._parse_timestamp(payload.get('request', {}).get('timestamp'))
+    if not app.debug or ask.ask_verify_timestamp_debug:
+        verifier.verify_timestamp(timestamp)
+
+    if ask.ask_application_id is not None:
+        verifier.verify_application_id(
+            payload['session']['application']['applicationId'], ask.ask_application_id)
+
+
+def _accept(app, body, headers):
+    """Parses and verifies a request for one of the fast intents
+
+    :param app: the Flask app of the skill
+    :param body: the raw request body
+    :param headers: the request headers
+    :returns: a tuple of the intent name and the parsed body, or `None` when
+        the request has to go through Flask
+    """
+    payload = json.loads(body)
+    request = payload.get('request', {})
+    session = payload.get('session')
+    name = request.get('intent', {}).get('name')
+    if request.get('type') != 'IntentRequest' or name not in FAST_INTENTS:
+        return None
+    # sessions carrying attributes or audio state take the full path
+    if not session or session.get('attributes') or 'AudioPlayer' in payload.get('context', {}):
+        return None
+
+    if app.config.get('ASK_VERIFY_REQUESTS', True):
+        with app.app_context():
+            _verify(app.ask, app, body, payload, headers)
+    return name, payload
+
+
+def _answer(app, name, payload):
+    """Runs the session started callback and the view of an accepted request
+
+    :param app: the Flask app of the skill
+    :param name: the intent name
+    :param payload: the parsed request body
+    :returns: the serialized response, or whatever else the view returned
+    """
+    ask = app.ask
+    with app.app_context():
+        request_body = models._Field(payload)
+        ask.request = request_body.request
+        ask.version = request_body.version
+        ask.context = getattr(request_body, 'context', models._Field())
+        ask.session = request_body.session
+        ask.session.attributes = models._Field()
+        if ask.session.new and ask._on_session_started_callback is not None:
+            ask._on_session_started_callback()
+
+        view = ask._intent_view_funcs[name]
+        args = ask._map_params_to_view_args(name, inspect.getargspec(view).args)
+        metrics.start_request(name)
+        profiling.start_request(name)
+        try:
+            result = view(*args)
+            if isinstance(result, models._Response):
+                result = result.render_response()
+        finally:
+            profiling.end_request()
+            metrics.end_request()
+    return result
+
+
+def dispatch(app, body, headers):
+    """Answers a request for one of the fast intents
+
+    :param app: the Flask app of the skill
+    :param body: the raw request body
+    :param headers: the request headers
+    :returns: the result of the view, or `None` when the request has to go
+        through Flask
+    """
+    accepted = _accept(app, body, headers)
+    if accepted is None:
+        return None
+    return _answer(app, *accepted)
+
+
+class FastPath(object):
+    """WSGI middleware sending the fast intents past the Flask request cycle."""
+
+    def __init__(self, app, wsgi_app):
+        """Initialize the wrapped app.
+
+        :param app: the Flask app of the skill
+        :param wsgi_app: the WSGI app to fall through to, `app.wsgi_app`
+        :returns: `None`
+        """
+        self.app = app
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') != 'POST' or environ.get('PATH_INFO', '/') not in ('', '/'):
+            return self.wsgi_app(environ, start_response)
+
+        body = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+        environ['wsgi.input'] = io.BytesIO(body)
+        try:
+            accepted = _accept(self.app, body, EnvironHeaders(environ))
+        except Exception:
+            # parsing and verification failures are answered by flask-ask
+            logger.debug("falling back to flask", exc_info=True)
+            accepted = None
+        if accepted is None:
+            return self.wsgi_app(environ, start_response)
+
+        try:
+            response = _answer(self.app, *accepted)
+        except Exception:
+            # the view is not run a second time, its error is answered as Flask would
+            with self.app.request_context(environ):
+                error = self.app.handle_exception(sys.exc_info()[1])
+            return error(environ, start_response)
+        if not isinstance(response, str):
+            with self.app.request_context(environ):
+                response = self.app.make_response(response)
+            return response(environ, start_response)
+
+        start_response('200 OK', [('Content-Type', 'text/html; charset=utf-8'),
+                                  ('Content-Length', str(len(response)))])
+        return [response]
@@ -0,0 +1,140 @@
+"""Inverted index from flavor names to the dates they are in the forecast."""
+import bisect
+import difflib
+import re
+import unicodedata
+
+# Spoken or abbreviated names mapped to the normalized flavor they stand for
+ALIASES = {
+    'pb cup': 'peanut butter cup',
+    'peanut butter cups': 'peanut butter cup',
+    'mint chip': 'mint chocolate chip',
+    'chocolate': 'chocolate decadence',
+    'vanilla': 'vanilla bean',
+    'key lime': 'key lime pie',
+}
+
+# Minimum similarity of a fuzzy match of a flavor name
+FUZZY_CUTOFF = 0.75
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(name):
+    """Takes a flavor name from the calendar or from speech and normalizes it so
+    both compare equal, e.g. `Cookies 'n Cream` and `cookies and cream`
+
+    :param name: the flavor name, encoded or unicode
+    :returns: the normalized name
+    """
+    if isinstance(name, bytes):
+        name = name.decode('UTF8')
+
+    # strip accents, e.g. Creme Brulee
+    name = unicodedata.normalize('NFKD', name)
+    name = u''.join(c for c in name if not unicodedata.combining(c)).lower()
+
+    name = name.replace(u'&', u' and ').replace(u"'n'", u' and ').replace(u"'n", u' and ')
+    name = u' '.join(_NON_ALNUM_RE.sub(u' ', name).split())
+    name = re.sub(r'\bn\b', u'and', name)
+    return str(name)
+
+
+class FlavorIndex(object):
+    """Maps normalized flavor names to the sorted dates they are served on.
+
+    Months are added or replaced one at a time from the parsed calendar days, so
+    a refetched month simply replaces its previous dates.
+    """
+
+    def __init__(self):
+        """Initialize the empty index.
+
+        :returns: `None`
+        """
+        self._months = {}
+        self._index = None
+        self._names = {}
+
+    def add_month(self, year, month, days):
+        """Adds or replaces the dates of a month
+
+        :param year: the year of the month
+        :param month: the month
+        :param days: the `dict` of parsed days returned by `calendar_parser`
+        :returns: `None`
+        """
+        postings = {}
+        for date, flavors in days.items():
+            # skip ambiguous and closed days
+            if not flavors or any('closed' in f.lower() for f in flavors):
+                continue
+            for flavor in flavors:
+                name = normalize(flavor)
+                self._names.setdefault(name, flavor)
+                postings.setdefault(name, set()).add(date)
+        self._months[(year, month)] = postings
+        self._index = None
+
+    @property
+    def index(self):
+        """The merged index of every month, rebuilt after a month changes.
+
+        :returns: a `dict` of normalized names to sorted date strings
+        """
+        if self._index is None:
+            index = {}
+            for postings in self._months.values():
+                for name, dates in postings.items():
+                    index.setdefault(name, set()).update(dates)
+            self._index = dict((name, sorted(dates)) for name, dates in index.items())
+        return self._index
+
+    def match(self, name):
+        """Finds the indexed flavor meant by a possibly misrecognized name, trying
+        an exact match, the aliases, a partial name and then a fuzzy match
+
+        :param name: the flavor name, e.g. from a speech slot
+        :returns: the normalized indexed name or `None`
+        """
+        index = self.index
+        name = normalize(name)
+        if not name:
+            return None
+        if name in index:
+            return name
+
+        alias = ALIASES.get(name)
+        if alias in index:
+            return alias
+
+        # a partial name such as banana for banana pudding
+        partial = [n for n in index if n.startswith(name + ' ') or n.endswith(' ' + name)]
+        if len(partial) == 1:
+            return partial[0]
+
+        close = difflib.get_close_matches(name, list(index), n=1, cutoff=FUZZY_CUTOFF)
+        return close[0] if close else None
+
+    def display_name(self, name):
+        """Gets the flavor name as written on the calendar
+
+        :param name: the normalized name
+        :returns: the encoded flavor name
+        """
+        return self._names.get(name, name)
+
+    def next_date(self, name, after):
+        """Finds the first date on or after a date that a flavor is served
+
+        :param name: the flavor name, e.g. from a speech slot
+        :param after: the first date string to consider
+        :returns: a tuple of the normalized name and the date string, with
+            `None` for what could not be found
+        """
+        match = self.match(name)
+        if match is None:
+            return None, None
+        dates = self.index[match]
+        i = bisect.bisect_left(dates, after)
+        return match, dates[i] if i < len(dates) else None
@@ -0,0 +1,188 @@
+"""Per-request latency spans and counters emitted as structured log lines.
+
+Instrumentation is enabled with the `FLAVORFORECAST_METRICS` environment
+variable. Each request is emitted as one JSON line in the CloudWatch embedded
+metric format, so the spans and counters become metrics without any agent.
+When disabled every span is a shared no-op and nothing is recorded.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# Whether spans and counters are recorded
+enabled = os.environ.get('FLAVORFORECAST_METRICS', '').lower() in ('1', 'true', 'yes')
+
+# CloudWatch namespace of the emitted metrics
+NAMESPACE = 'FlavorForecast'
+
+logger = logging.getLogger('flavorforecast.metrics')
+
+# write the metric lines as they are to stdout, which ends up in CloudWatch
+if enabled:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_local = threading.local()
+
+
+class _Recorder(object):
+    """Collects the spans and counters of one request."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.spans = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, seconds):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0) + seconds
+
+    def add_count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def emit(self):
+        """Logs the collected spans and counters as one embedded metric line."""
+        record = {'request': self.name,
+                  'total_ms': round((time.time() - self.start) * 1000, 3)}
+        metrics = [{'Name': 'total_ms', 'Unit': 'Milliseconds'}]
+        for name, seconds in self.spans.items():
+            record[name + '_ms'] = round(seconds * 1000, 3)
+            metrics.append({'Name': name + '_ms', 'Unit': 'Milliseconds'})
+        for name, value in self.counters.items():
+            record[name] = value
+            metrics.append({'Name': name, 'Unit': 'Count'})
+
+        record['_aws'] = {'Timestamp': int(self.start * 1000),
+                          'CloudWatchMetrics': [{'Namespace': NAMESPACE,
+                                                 'Dimensions': [['request']],
+                                                 'Metrics': metrics}]}
+        logger.info(json.dumps(record, sort_keys=True))
+
+
+class _Span(object):
+    """Times a block of code into the current request."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        recorder = getattr(_local, 'recorder', None)
+        elapsed = time.time() - self.start
+        if recorder is not None:
+            recorder.add_span(self.name, elapsed)
+        else:
+            # spans outside of a request are emitted on their own
+            recorder = _Recorder(self.name)
+            recorder.add_span(self.name, elapsed)
+            recorder.emit()
+        return False
+
+
+class _NullSpan(object):
+    """Span used when instrumentation is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Times a block of code as a stage of the current request
+
+    :param name: the name of the stage, e.g. `fetch` or `parse`
+    :returns: a context manager
+    """
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def count(name, value=1):
+    """Increments a counter of the current request
+
+    :param name: the name of the counter, e.g. `month_cache.hit`
+    :param value: the amount to increment by
+    :returns: `None`
+    """
+    if not enabled:
+        return
+    recorder = getattr(_local, 'recorder', None)
+    if recorder is not None:
+        recorder.add_count(name, value)
+
+
+def instrument(name, func):
+    """Wraps a function so every call is timed as a stage of the current request.
+    The function is returned unchanged when instrumentation is disabled.
+
+    :param name: the name of the stage
+    :param func: the function to wrap
+    :returns: the wrapped function
+    """
+    if not enabled:
+        return func
+
+    def wrapper(*args, **kwargs):
+        with _Span(name):
+            return func(*args, **kwargs)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def start_request(name):
+    """Starts collecting the spans and counters of a request on this thread
+
+    :param name: the name of the request, e.g. the intent
+    :returns: `None`
+    """
+    if enabled:
+        _local.recorder = _Recorder(name)
+
+
+def current():
+    """Gets the request collecting on this thread, to hand to worker threads
+
+    :returns: the request recorder or `None`
+    """
+    return getattr(_local, 'recorder', None)
+
+
+def attach(recorder):
+    """Collects the spans and counters of this thread into a request started on
+    another thread
+
+    :param recorder: the request recorder returned by `current`
+    :returns: `None`
+    """
+    _local.recorder = recorder
+
+
+def end_request():
+    """Emits and stops collecting the request on this thread
+
+    :returns: `None`
+    """
+    recorder = getattr(_local, 'recorder', None)
+    if recorder is not None:
+        _local.recorder = None
+        recorder.emit()
@@ -0,0 +1,249 @@
+"""Opt-in profiling of sampled requests into pstats dumps.
+
+Profiling is enabled with `FLAVORFORECAST_PROFILE`, the share of requests to
+profile between 0 and 1. Each sampled request is run under `cProfile` and
+dumped with its wall time and memory into a directory per intent, by
+default `/tmp/flavorforecast-profiles`. When disabled no hook is installed and
+nothing is recorded. The dumps are aggregated into a ranked report of the
+hottest functions per intent:
+
+    python src/profiling.py [--dir DIR] [--intent NAME] [--top N] [--sort tottime]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+# Default directory the profiles are dumped to
+DEFAULT_DIRECTORY = '/tmp/flavorforecast-profiles'
+
+# Number of functions listed per intent by default
+DEFAULT_TOP = 15
+
+
+def _parse_rate(value):
+    """Takes the value of `FLAVORFORECAST_PROFILE` and returns the sampling rate
+
+    :param value: the environment value, e.g. `1`, `true` or `0.05`
+    :returns: the share of requests to profile between 0 and 1
+    """
+    value = (value or '').strip().lower()
+    if value in ('true', 'yes'):
+        return 1.0
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except ValueError:
+        return 0.0
+
+
+# Share of requests that are profiled
+rate = _parse_rate(os.environ.get('FLAVORFORECAST_PROFILE'))
+
+# Whether any request is profiled
+enabled = rate > 0
+
+# Directory the profiles are dumped to
+directory = os.environ.get('FLAVORFORECAST_PROFILE_DIR', DEFAULT_DIRECTORY)
+
+_local = threading.local()
+_sequence = [0]
+_sequence_lock = threading.Lock()
+
+
+def _peak_rss_kb():
+    """Gets the peak resident memory of the process since it started, the high
+    water mark of every request it served and not of a single one
+
+    :returns: the peak memory in kilobytes or `None` where it is unavailable
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _current_rss_kb():
+    """Gets the current resident memory of the process from `/proc/self/statm`
+
+    :returns: the memory in kilobytes or `None` where it is unavailable
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def _safe_name(name):
+    return re.sub(r'[^\w.-]', '_', name or 'unknown')
+
+
+class _Profile(object):
+    """The profiler and the memory baseline of one sampled request."""
+
+    def __init__(self, name):
+        import cProfile
+
+        self.name = name
+        self.rss_start = _current_rss_kb()
+        self.start = time.time()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def dump(self):
+        """Stops profiling and writes the pstats dump and its summary
+
+        :returns: the path of the pstats dump
+        """
+        self.profiler.disable()
+        elapsed = time.time() - self.start
+        rss_end = _current_rss_kb()
+
+        with _sequence_lock:
+            _sequence[0] += 1
+            sequence = _sequence[0]
+        intent_dir = os.path.join(directory, _safe_name(self.name))
+        if not os.path.isdir(intent_dir):
+            try:
+                os.makedirs(intent_dir)
+            except OSError:
+                if not os.path.isdir(intent_dir):
+                    raise
+        path = os.path.join(intent_dir, '{}-{}-{}'.format(int(self.start * 1000), os.getpid(), sequence))
+
+        self.profiler.dump_stats(path + '.prof')
+        with open(path + '.json', 'w') as f:
+            json.dump({'request': self.name,
+                       'started': self.start,
+                       'wall_ms': round(elapsed * 1000, 3),
+                       'rss_start_kb': self.rss_start,
+                       'rss_end_kb': rss_end,
+                       'rss_growth_kb': None if None in (self.rss_start, rss_end) else rss_end - self.rss_start,
+                       'process_peak_rss_kb': _peak_rss_kb()},
+                      f, sort_keys=True)
+        return path + '.prof'
+
+
+def start_request(name):
+    """Starts profiling the request on this thread if it is sampled. Only the
+    thread of the request is profiled, not the threads it hands work to.
+
+    :param name: the name of the request, e.g. the intent
+    :returns: `None`
+    """
+    if not enabled or getattr(_local, 'profile', None) is not None:
+        return
+    if rate < 1 and random.random() >= rate:
+        return
+    _local.profile = _Profile(name)
+
+
+def end_request():
+    """Stops profiling the request on this thread and dumps its profile
+
+    :returns: the path of the pstats dump or `None` if the request was not sampled
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return None
+    _local.profile = None
+    return profile.dump()
+
+
+def load_profiles(path=None, intent=None):
+    """Reads the dumped profiles and merges them per intent
+
+    :param path: the directory of the dumps, `directory` by default
+    :param intent: an optional intent to read the dumps of
+    :returns: a `dict` of intents to a tuple of the merged `pstats.Stats` and
+        the list of request summaries
+    """
+    import pstats
+
+    path = path or directory
+    profiles = {}
+    if not os.path.isdir(path):
+        return profiles
+    for name in sorted(os.listdir(path)):
+        if intent is not None and name != _safe_name(intent):
+            continue
+        intent_dir = os.path.join(path, name)
+        dumps = sorted(f for f in os.listdir(intent_dir) if f.endswith('.prof'))
+        if not dumps:
+            continue
+        stats = pstats.Stats(os.path.join(intent_dir, dumps[0]))
+        for dump in dumps[1:]:
+            stats.add(os.path.join(intent_dir, dump))
+
+        summaries = []
+        for dump in dumps:
+            try:
+                with open(os.path.join(intent_dir, dump[:-len('.prof')] + '.json')) as f:
+                    summaries.append(json.load(f))
+            except (IOError, ValueError):
+                continue
+        profiles[name] = (stats, summaries)
+    return profiles
+
+
+def hot_functions(stats, top=DEFAULT_TOP, sort='tottime'):
+    """Takes merged stats and ranks the functions by the time spent in them
+
+    :param stats: the `pstats.Stats`
+    :param top: the number of functions to list
+    :param sort: `tottime` for the time in the function itself or `cumtime`
+        including the functions it calls
+    :returns: a list of `(function, calls, tottime, cumtime)` tuples
+    """
+    rows = []
+    for (filename, line, func), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        if filename == '~':
+            label = func
+        else:
+            label = '{}:{}({})'.format(os.path.basename(filename), line, func)
+        rows.append((label, calls, tottime, cumtime))
+    column = 3 if sort == 'cumtime' else 2
+    rows.sort(key=lambda row: row[column], reverse=True)
+    return rows[:top]
+
+
+def main():
+    """Utility method to print the hot function report from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default=directory, help='the directory of the dumps')
+    parser.add_argument('--intent', help='only report this intent')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='functions listed per intent')
+    parser.add_argument('--sort', choices=['tottime', 'cumtime'], default='tottime')
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.dir, args.intent)
+    if not profiles:
+        print("no profiles in {}".format(args.dir))
+        return
+
+    for intent, (stats, summaries) in sorted(profiles.items()):
+        walls = sorted(s['wall_ms'] for s in summaries)
+        growths = [s['rss_growth_kb'] for s in summaries if s.get('rss_growth_kb') is not None]
+        peaks = [s['process_peak_rss_kb'] for s in summaries if s.get('process_peak_rss_kb') is not None]
+        print("{}: {} requests, median {:.1f}ms, max {:.1f}ms, max memory growth {} KB, "
+              "process peak memory {} KB".format(
+                  intent, len(summaries), walls[len(walls) // 2] if walls else 0,
+                  walls[-1] if walls else 0, max(growths) if growths else 'unknown',
+                  max(peaks) if peaks else 'unknown'))
+        print("  {:>9} {:>11} {:>11}  {}".format('calls', 'tottime ms', 'cumtime ms', 'function'))
+        for label, calls, tottime, cumtime in hot_functions(stats, args.top, args.sort):
+            print("  {:>9} {:>11.3f} {:>11.3f}  {}".format(calls, tottime * 1000, cumtime * 1000, label))
+        print("")
+
+
+if __name__ == '__main__':
+    main()
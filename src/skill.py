@@ -1,19 +1,233 @@
 """Alexa Skill to look up the flavor forecast for The Diary Godmother."""
 
+import os
 import sys
 import logging
 import datetime
+import threading
+# imported up front, the lazy import on the first `strptime` is not thread safe on
+# Python 2 and the prefetch thread parses dates while the request converts its slots
+import _strptime
 
-from flask import Flask, render_template
+from flask import Flask, request
 from flask_ask import Ask, statement, question, convert_errors, session
 
-import api
+import certificates
+import fastpath
+import metrics
+import profiling
+import speech
 
 
 app = Flask(__name__)
 ask = Ask(app, '/')
 logging.getLogger('flask_ask').setLevel(logging.DEBUG)
-forecast = api.DGMApi()
+logger = logging.getLogger(__name__)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Opens the persistent cache on first use, shared by the forecasts and the
+    signing certificates.
+    :returns: the `cache.SQLiteCache`
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                import cache
+
+                _cache = cache.SQLiteCache(os.environ.get('FLAVORFORECAST_CACHE', '/tmp/flavorforecast.db'))
+    return _cache
+
+
+# validate the request signing certificates once instead of on every request, sharing
+# the downloaded chains across containers through the persistent cache
+certificates.CertificateCache(cache=get_cache).install()
+
+# answer the high-volume intents without the Flask request cycle when enabled
+if os.environ.get('FLAVORFORECAST_FASTPATH', '').lower() in ('1', 'true', 'yes'):
+    app.wsgi_app = fastpath.FastPath(app, app.wsgi_app)
+
+# compile the speech templates once at startup
+SPEECH = speech.SpeechTemplates()
+
+# time every template rendering when metrics are enabled
+render_template = metrics.instrument('render', SPEECH.render)
+
+# Intents answered without the calendar, whose sessions are not prefetched for so
+# they never wait on the scraping stack being imported
+NO_PREFETCH_INTENTS = frozenset(['GetOpenIntent', 'GetClosedIntent', 'GetHoursIntent',
+                                 'GetLocationIntent', 'GetAboutIntent', 'AMAZON.HelpIntent',
+                                 'AMAZON.StopIntent', 'AMAZON.CancelIntent'])
+
+# Maximum number of prefetches running at the same time
+PREFETCH_LIMIT = 2
+
+_calendars = None
+_forecasts = {}
+_forecast_lock = threading.Lock()
+_prefetch_slots = threading.BoundedSemaphore(PREFETCH_LIMIT)
+_prefetches = {}
+
+
+def get_calendars():
+    """Loads the registry of store calendars on first use.
+    :returns: the `calendars.CalendarRegistry`
+    """
+    global _calendars
+    if _calendars is None:
+        with _forecast_lock:
+            if _calendars is None:
+                import calendars
+
+                _calendars = calendars.load_registry()
+    return _calendars
+
+
+def get_forecast(location=None):
+    """Gets the `api.DGMApi` of a location, creating it on first use so the scraping
+    stack is only imported by the intents that need it. Every calendar has its own
+    `api.DGMApi`, so a slow calendar never holds up or evicts another.
+    :param location: the spoken location or `None` for the default calendar
+    :returns: the `api.DGMApi` or `None` if the location is unknown
+    """
+    registry = get_calendars()
+    calendar = registry.get(location)
+    if calendar is None:
+        return None
+
+    forecast = _forecasts.get(calendar.key)
+    if forecast is None:
+        with _forecast_lock:
+            forecast = _forecasts.get(calendar.key)
+            if forecast is None:
+                import api
+                import calendars
+
+                history = None
+                if os.environ.get('FLAVORFORECAST_ARCHIVE'):
+                    import archive
+                    history = archive.Archive(os.environ['FLAVORFORECAST_ARCHIVE'])
+
+                index = None
+                # a local file bundled with the deployment, memory mapped by every container
+                if os.environ.get('FLAVORFORECAST_INDEX'):
+                    import compact_index
+                    index = compact_index.CompactIndex(
+                        calendars.snapshot_path(os.environ['FLAVORFORECAST_INDEX'], calendar),
+                        api.PARSER_VERSION)
+
+                is_default = calendar.key == registry.default.key
+                forecast = api.DGMApi(
+                    cache=get_cache(),
+                    snapshot=calendars.snapshot_path(
+                        os.environ.get('FLAVORFORECAST_SNAPSHOT', '/tmp/flavorforecast-snapshot.json'),
+                        calendar),
+                    url=os.environ.get('FLAVORFORECAST_URL') if is_default else None,
+                    calendar=calendar,
+                    archive=history,
+                    compact_index=index,
+                    low_memory=os.environ.get('FLAVORFORECAST_LOW_MEMORY', '').lower() in ('1', 'true', 'yes'))
+                _forecasts[calendar.key] = forecast
+    return forecast
+
+
+def _unknown_location(location):
+    """Asks again for a location that has no calendar.
+    :param location: the spoken location
+    :returns: a `flask-ask.question` result with the given template text
+    """
+    nolocation_text = render_template('nolocation', location=location)
+    return question(nolocation_text)
+
+
+def prefetch(session_id, location=None):
+    """Starts scraping the current month in the background, so the search that
+    usually follows a new session finds it cached. The response is never held
+    up: the forecast is created and scraped on another thread, no more than
+    `PREFETCH_LIMIT` prefetches run at once, and a prefetch is dropped when
+    its session ends before it started scraping.
+    :param session_id: the id of the new session
+    :param location: the spoken location or `None` for the default calendar
+    :returns: the prefetch `threading.Thread` or `None` if too many are running
+    """
+    # bound locally, the module globals are gone if the process exits meanwhile
+    prefetches, slots, log = _prefetches, _prefetch_slots, logger
+    if not slots.acquire(False):
+        return None
+    cancelled = threading.Event()
+    prefetches[session_id] = cancelled
+
+    def run():
+        try:
+            forecast = get_forecast(location)
+            if forecast is not None:
+                forecast.prefetch(cancelled=cancelled)
+        except Exception:
+            log.warning("unable to prefetch the forecast", exc_info=True)
+        finally:
+            if prefetches.get(session_id) is cancelled:
+                del prefetches[session_id]
+            slots.release()
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def cancel_prefetch(session_id):
+    """Drops the prefetch of a session that ended.
+    :param session_id: the id of the session
+    :returns: `None`
+    """
+    cancelled = _prefetches.pop(session_id, None)
+    if cancelled is not None:
+        cancelled.set()
+
+
+@ask.on_session_started
+def session_started():
+    """Prefetch the forecast for sessions that are likely to search next."""
+    alexa_request = ask.request
+    name = alexa_request.get('intent', {}).get('name')
+    if alexa_request.get('type') == 'IntentRequest' and name in NO_PREFETCH_INTENTS:
+        return
+    location = alexa_request.get('intent', {}).get('slots', {}).get('location', {}).get('value')
+    prefetch(ask.session.get('sessionId'), location)
+
+
+if metrics.enabled:
+    @app.before_request
+    def _start_metrics():
+        """Start collecting the spans of the request, named after its intent."""
+        body = request.get_json(silent=True) or {}
+        alexa_request = body.get('request', {})
+        metrics.start_request(alexa_request.get('intent', {}).get('name') or
+                              alexa_request.get('type', 'unknown'))
+
+    @app.teardown_request
+    def _end_metrics(exc):
+        """Emit the spans of the request."""
+        metrics.end_request()
+
+
+if profiling.enabled:
+    @app.before_request
+    def _start_profile():
+        """Profile the request if it is sampled, named after its intent."""
+        body = request.get_json(silent=True) or {}
+        alexa_request = body.get('request', {})
+        profiling.start_request(alexa_request.get('intent', {}).get('name') or
+                                alexa_request.get('type', 'unknown'))
+
+    @app.teardown_request
+    def _end_profile(exc):
+        """Dump the profile of the request."""
+        profiling.end_request()
 
 
 @ask.launch
@@ -25,9 +239,10 @@ def launch():
 
 
 @ask.intent('GetSearchDateIntent', convert={'date': 'date'})
-def search_date(date):
+def search_date(date, location):
     """The default intent to be triggered. Uses the date to search the DGM API.
     :param date: the date to search for the flavor of the day
+    :param location: the spoken location of the store
     :returns: a `flask-ask.statement` result with the given template text
     """
 
@@ -41,27 +256,36 @@ def search_date(date):
         nodate_text = render_template('nodate')
         return question(nodate_text)
 
+    forecast = get_forecast(location)
+    if(forecast is None):
+        return _unknown_location(location)
+
     result = forecast.search(date)
-    print("Searching for the flavor of the day for: {}".format(date))
-    return _search(result)
+    logger.debug("searching for the flavor of the day for: %s", date)
+    return _search(result, forecast.calendar)
 
 
 @ask.intent('GetSearchIntent')
-def search():
+def search(location):
     """The search for current day intent to be triggered. Uses the title to search 
     the DGM API.
-    :param date: the date to search for the flavor of the day
+    :param location: the spoken location of the store
     :returns: a `flask-ask.statement` result with the given template text
     """
+    forecast = get_forecast(location)
+    if(forecast is None):
+        return _unknown_location(location)
+
     date = datetime.datetime.now()
     result = forecast.search(date)
-    print("Searching for the flavor of the day for: {}".format(date))
-    return _search(result)
+    logger.debug("searching for the flavor of the day for: %s", date)
+    return _search(result, forecast.calendar)
 
 
-def _search(result):
+def _search(result, calendar):
     """Helper method for both the `GetSearchDateIntent` and the `GetSearchIntent`. 
     Will take the search results and format them into an appropriate `flask-ask.statement`.
+    :param calendar: the `calendars.Calendar` of the store
     :returns: a `flask-ask.statement` result with the given template text
     """
 
@@ -83,54 +307,162 @@ def _search(result):
     else:
         # check if store closed
         if(result.closed):
-            print 'Result: ', result
-            closed_text = render_template('notfoundclosed', date=result.date)
+            logger.debug("result: %s", result)
+            closed_text = render_template(
+                'notfoundclosed', date=result.date, store=calendar.title)
             return statement(closed_text)
         else:
             notfound_text = render_template('notfound', date=result.date)
             return statement(notfound_text)
 
 
+@ask.intent('GetWeekIntent')
+def search_week(location):
+    """The search for the next seven days intent to be triggered.
+    :param location: the spoken location of the store
+    :returns: a `flask-ask.statement` result with the given template text
+    """
+    forecast = get_forecast(location)
+    if(forecast is None):
+        return _unknown_location(location)
+
+    start = datetime.date.today()
+    results = forecast.search_range(start, start + datetime.timedelta(days=6))
+    return _search_range(results, render_template('week'), forecast.calendar)
+
+
+@ask.intent('GetWeekendIntent')
+def search_weekend(location):
+    """The search for the upcoming weekend intent to be triggered. Searches the
+    current weekend when asked on a Saturday or Sunday.
+    :param location: the spoken location of the store
+    :returns: a `flask-ask.statement` result with the given template text
+    """
+    forecast = get_forecast(location)
+    if(forecast is None):
+        return _unknown_location(location)
+
+    today = datetime.date.today()
+    if(today.isoweekday() == 7):
+        start = today - datetime.timedelta(days=1)
+    else:
+        start = today + datetime.timedelta(days=6 - today.isoweekday())
+    results = forecast.search_range(max(start, today), start + datetime.timedelta(days=1))
+    return _search_range(results, render_template('weekend'), forecast.calendar)
+
+
+def _search_range(results, period, calendar):
+    """Helper method for both the `GetWeekIntent` and the `GetWeekendIntent`.
+    Will take the results of a range search and format them into one `flask-ask.statement`.
+    :param results: the list of `Result` ordered by date
+    :param period: the spoken name of the searched range
+    :param calendar: the `calendars.Calendar` of the store
+    :returns: a `flask-ask.statement` result with the given template text
+    """
+    if(all(result.has_error for result in results)):
+        error_text = render_template('searcherror', date=period)
+        return question(error_text)
+
+    days = []
+    for result in results:
+        day = datetime.datetime.strptime(result.date, '%Y-%m-%d').strftime('%A')
+        if(result.found):
+            days.append(render_template(
+                'rangeday', day=day, flavors=(' and ').join(result.flavors)))
+        elif(result.closed):
+            days.append(render_template('rangedayclosed', day=day, store=calendar.title))
+
+    if(not days):
+        notfound_text = render_template('rangenotfound', period=period)
+        return statement(notfound_text)
+
+    found_text = render_template('rangefound', period=period, days=(', ').join(days))
+    return statement(found_text)
+
+
+@ask.intent('GetNextFlavorIntent')
+def next_flavor(flavor, location):
+    """Searches the next date a flavor is in the flavor forecast.
+    :param flavor: the spoken flavor name
+    :param location: the spoken location of the store
+    :returns: a `flask-ask.statement` result with the given template text
+    """
+    if(not flavor):
+        noflavor_text = render_template('noflavor')
+        return question(noflavor_text)
+
+    forecast = get_forecast(location)
+    if(forecast is None):
+        return _unknown_location(location)
+
+    result = forecast.next_flavor(flavor)
+    logger.debug("result: %s", result)
+
+    if(result.has_error):
+        error_text = render_template('searcherror', date=flavor)
+        return question(error_text)
+    if(result.found):
+        found_text = render_template(
+            'nextflavor', flavor=result.flavor, date=result.humanized_date)
+        return statement(found_text)
+
+    notfound_text = render_template('nextflavornotfound', flavor=flavor)
+    return statement(notfound_text)
+
+
 @ask.intent('GetOpenIntent')
-def open():
+def open(location):
     """Determines if The Diary Godmother is open or not based on the current time.
     Method also returns the time left until open or the time left until close
     based on the status.
+    :param location: the spoken location of the store
     :returns: a `flask-ask.statement` result with the given template text
     """
+    forecast = get_forecast(location)
+    if(forecast is None):
+        return _unknown_location(location)
+
     status = forecast.get_status()
+    store = forecast.calendar.title
 
     # check if open
     if(status.is_open):
-        opennow_text = render_template('opennow', time=status.time_left)
+        opennow_text = render_template('opennow', time=status.time_left, store=store)
         return statement(opennow_text)
     else:
-        closednow_text = render_template('closednow', time=status.time_left)
+        closednow_text = render_template('closednow', time=status.time_left, store=store)
         return statement(closednow_text)
 
 
 @ask.intent('GetClosedIntent')
-def closed():
+def closed(location):
     """Determines if The Diary Godmother is closed or not based on the current time.
     Method also returns the time left until open or the time left until close
     based on the status.
+    :param location: the spoken location of the store
     :returns: a `flask-ask.statement` result with the given template text
     """
+    forecast = get_forecast(location)
+    if(forecast is None):
+        return _unknown_location(location)
+
     status = forecast.get_status()
+    store = forecast.calendar.title
 
     # check if open
     if(status.is_open):
-        opennow_text = render_template('opennow', time=status.time_left)
+        opennow_text = render_template('opennow', time=status.time_left, store=store)
         return statement(opennow_text)
     else:
-        closednow_text = render_template('closednow', time=status.time_left)
+        closednow_text = render_template('closednow', time=status.time_left, store=store)
         return statement(closednow_text)
 
 
 @ask.intent('GetOpenDateIntent', convert={'date': 'date'})
-def open_date(date):
+def open_date(date, location):
     """Checks if The Dairy Godmother is open or closed on a particular day.
     :param date: the `datetime` date
+    :param location: the spoken location of the store
     :returns: a `flask-ask.statement` result with the given template text
     """
 
@@ -143,38 +475,91 @@ def open_date(date):
         nodate_text = render_template('nodate')
         return question(nodate_text)
 
+    forecast = get_forecast(location)
+    if(forecast is None):
+        return _unknown_location(location)
+    store = forecast.calendar.title
+
     # query to ensure was not randomly closed
     result = forecast.search(date)
 
-    if(result.closed):
-        closeddate_text = render_template('closeddate',  date=date)
+    # query for the hours on that day
+    hours = forecast.operating_hours(date)
+
+    # the calendar or the weekly hours close the store that day
+    if(result.closed or hours.open_str is None):
+        closeddate_text = render_template('closeddate',  date=date, store=store)
         return statement(closeddate_text)
 
     else:
-        # query for the hours on that day
-        hours = forecast.operating_hours(date)
         openndate_text = render_template(
-            'opendate', date=date, start=hours.open_str, end=hours.close_str)
+            'opendate', date=date, start=hours.open_str, end=hours.close_str, store=store,
+            timezone=forecast.store_hours.spoken_timezone(date))
         return statement(openndate_text)
 
 
+def _spoken_list(items, last=' and '):
+    """Joins words the way they are spoken, e.g. `Monday, Tuesday, and Sunday`
+    :param items: the list of words
+    :param last: the separator of two words
+    :returns: the joined text
+    """
+    if len(items) < 3:
+        return last.join(items)
+    return ', '.join(items[:-1]) + ', and ' + items[-1]
+
+
+def _hours_text(calendar):
+    """Describes the weekly hours of a store.
+    :param calendar: the `calendars.Calendar` of the store
+    :returns: the rendered hours text
+    """
+    import store_hours
+
+    groups, closed = store_hours.weekly_schedule(calendar.hours)
+    schedule = [render_template('hoursgroup', start=start, end=end, days=_spoken_list(days))
+                for start, end, days in groups]
+    if closed:
+        schedule.append(render_template('hoursclosed', days=_spoken_list(closed)))
+    return render_template('hours', store=calendar.title, schedule=_spoken_list(schedule, ', and '))
+
+
 @ask.intent('GetHoursIntent')
-def hours():
-    """Gives the operating hours of The Dairy Godmother
+def hours(location):
+    """Gives the operating hours of a store
+    :param location: the spoken location of the store
     :returns: a `flask-ask.statement` result with the given template text
     """
+    calendar = get_calendars().get(location)
+    if(calendar is None):
+        return _unknown_location(location)
+
+    return SPEECH.response(
+        'hours:' + calendar.key, lambda: statement(_hours_text(calendar)), session.attributes)
 
-    hours_text = render_template('hours')
-    return statement(hours_text)
+
+def _location_text(calendar):
+    """Renders the address of a store.
+    :param calendar: the `calendars.Calendar` of the store
+    :returns: the text of the address
+    """
+    if(calendar.address):
+        return render_template('location', store=calendar.title, address=calendar.address)
+    return render_template('noaddress', store=calendar.title)
 
 
 @ask.intent('GetLocationIntent')
-def location():
-    """Gives the address of The Dairy Godmother
+def location(location):
+    """Gives the address of a store
+    :param location: the spoken location of the store
     :returns: a `flask-ask.statement` result with the given template text
     """
-    location_text = render_template('location')
-    return statement(location_text)
+    calendar = get_calendars().get(location)
+    if(calendar is None):
+        return _unknown_location(location)
+
+    return SPEECH.response(
+        'location:' + calendar.key, lambda: statement(_location_text(calendar)), session.attributes)
 
 
 @ask.intent('GetAboutIntent')
@@ -183,13 +568,20 @@ def hours():
     :returns: a `flask-ask.statement` result with the given template text
     """
 
-    about_text = render_template('about')
-    return statement(about_text)
+    return SPEECH.response(
+        'about', lambda: statement(render_template('about')), session.attributes)
 
 
 @ask.intent('AMAZON.HelpIntent')
 def help():
     """Give the user the help text."""
+    return SPEECH.response('help', _help_question, session.attributes)
+
+
+def _help_question():
+    """Asks the user what to do next with the help text.
+    :returns: a `flask-ask.question` result with the given template text
+    """
     help_text = render_template('reprompt')
     return question(help_text).reprompt(help_text)
 
@@ -197,18 +589,19 @@ def help():
 @ask.intent('AMAZON.StopIntent')
 def stop():
     """Allow the user to stop interacting."""
-    return statement("Goodbye")
+    return SPEECH.response('stop', lambda: statement("Goodbye"), session.attributes)
 
 
 @ask.intent('AMAZON.CancelIntent')
 def cancel():
     """Allow the user to cancel the interaction."""
-    return statement("Goodbye")
+    return SPEECH.response('cancel', lambda: statement("Goodbye"), session.attributes)
 
 
 @ask.session_ended
 def session_ended():
     """End the session gracefully."""
+    cancel_prefetch(session.get('sessionId'))
     return "", 200
 
 
@@ -0,0 +1,85 @@
+"""Speech templates compiled once and responses rendered from memory.
+
+The flask-ask templates are loaded from `templates.yaml` and compiled when the
+skill starts instead of on every request. Rendered text is memoized on the
+template arguments and the responses of static intents are serialized once.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import jinja2
+import yaml
+
+# Path of the flask-ask speech templates
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates.yaml')
+
+# Maximum number of rendered texts kept in memory
+RENDER_CACHE_SIZE = 256
+
+
+class SpeechTemplates(object):
+    """The compiled speech templates with a bounded LRU of rendered texts."""
+
+    def __init__(self, path=TEMPLATES_PATH, cache_size=RENDER_CACHE_SIZE):
+        """Load and compile every template.
+
+        :param path: the path of the yaml file mapping names to templates
+        :param cache_size: the maximum number of rendered texts to keep
+        :returns: `None`
+        """
+        with open(path) as f:
+            sources = yaml.safe_load(f)
+
+        environment = jinja2.Environment()
+        self.templates = dict((name, environment.from_string(source))
+                              for name, source in sources.items())
+        self.cache_size = cache_size
+        self._rendered = OrderedDict()
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def render(self, name, **context):
+        """Renders a template, reusing the text of a previous call with the same
+        arguments
+
+        :param name: the name of the template, e.g. `found`
+        :param context: the template arguments
+        :returns: the rendered text
+        """
+        key = (name, tuple(sorted(context.items())))
+        try:
+            with self._lock:
+                text = self._rendered.pop(key)
+                self._rendered[key] = text
+            return text
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable arguments are rendered every time
+            return self.templates[name].render(**context)
+
+        text = self.templates[name].render(**context)
+        with self._lock:
+            self._rendered[key] = text
+            if len(self._rendered) > self.cache_size:
+                self._rendered.popitem(last=False)
+        return text
+
+    def response(self, name, build, attributes):
+        """Gets the serialized response of a static intent, built on first use.
+        Sessions holding attributes are answered with a newly built response.
+
+        :param name: the name of the response, e.g. the intent
+        :param build: a function building the `flask-ask` response
+        :param attributes: the attributes of the current session
+        :returns: the serialized response or the built `flask-ask` response
+        """
+        if attributes:
+            return build()
+
+        response = self._responses.get(name)
+        if response is None:
+            response = build().render_response()
+            self._responses[name] = response
+        return response
@@ -0,0 +1,97 @@
+"""Read and publish files on local disk or in S3.
+
+Lambda containers do not share `/tmp`, so files published by one invocation
+for every other, like the forecast snapshot, are named by an `s3://bucket/key`
+url. Any other path is a local file, e.g. for the command line or a mounted
+shared file system. `boto3` is only imported once an S3 url is used.
+"""
+import os
+
+# Prefix of the paths stored in S3
+S3_PREFIX = 's3://'
+
+
+class NotModified(Exception):
+    """Raised when a file has not changed since the version it was read at."""
+
+
+def is_s3(path):
+    """Checks whether a path names an object in S3
+
+    :param path: the path or url
+    :returns: `True` for an `s3://bucket/key` url
+    """
+    return path.startswith(S3_PREFIX)
+
+
+def _split_s3(url):
+    """Takes an S3 url and splits it into its bucket and key
+
+    :param url: the `s3://bucket/key` url
+    :returns: a tuple of the bucket and the key
+    """
+    bucket, _, key = url[len(S3_PREFIX):].partition('/')
+    return bucket, key
+
+
+def _s3_client():
+    import boto3
+    return boto3.client('s3')
+
+
+def _error_code(error):
+    """Takes an error raised by a `boto3` client and gets its error code
+
+    :param error: the exception
+    :returns: the code, e.g. `304`, or `None` for any other exception
+    """
+    return getattr(error, 'response', {}).get('Error', {}).get('Code')
+
+
+def read(path, version=None, client=None):
+    """Reads a file unless it is still at a version read before
+
+    :param path: the local path or S3 url of the file
+    :param version: the version of an earlier read, the modification time of
+        a local file or the ETag of an S3 object
+    :param client: an optional S3 client, a `boto3` client by default
+    :returns: a tuple of the contents and their version
+    :raises NotModified: if the file is still at the given version
+    """
+    if not is_s3(path):
+        mtime = os.path.getmtime(path)
+        if version is not None and mtime == version:
+            raise NotModified(path)
+        with open(path, 'rb') as f:
+            return f.read(), mtime
+
+    bucket, key = _split_s3(path)
+    kwargs = {'Bucket': bucket, 'Key': key}
+    if version is not None:
+        kwargs['IfNoneMatch'] = version
+    try:
+        response = (client or _s3_client()).get_object(**kwargs)
+    except Exception as e:
+        if _error_code(e) in ('304', 'NotModified'):
+            raise NotModified(path)
+        raise
+    return response['Body'].read(), response.get('ETag')
+
+
+def write(path, data, client=None):
+    """Publishes a file atomically, so a reader never sees a partial file
+
+    :param path: the local path or S3 url of the file
+    :param data: the contents
+    :param client: an optional S3 client, a `boto3` client by default
+    :returns: `None`
+    """
+    if is_s3(path):
+        bucket, key = _split_s3(path)
+        (client or _s3_client()).put_object(Bucket=bucket, Key=key, Body=data)
+        return
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.rename(tmp_path, path)
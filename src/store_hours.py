@@ -0,0 +1,300 @@
+"""Look up the opening hours of The Dairy Godmother."""
+import bisect
+import calendar
+import datetime
+from collections import namedtuple
+
+import pytz
+
+# Timezone the store hours are kept in
+STORE_TIMEZONE = 'America/New_York'
+
+# Store hours in local time by `isoweekday`, as ((open hour, minute), (close hour, minute)).
+# A close hour of 24 or more closes after midnight on the following day.
+WEEKLY_HOURS = {
+    1: ((12, 0), (21, 0)),
+    2: ((12, 0), (21, 0)),
+    3: ((12, 0), (22, 0)),
+    4: ((12, 0), (22, 0)),
+    5: ((12, 0), (22, 0)),
+    6: ((12, 0), (22, 0)),
+    7: ((12, 0), (22, 0)),
+}
+
+# Number of minutes in a week
+WEEK_MINUTES = 7 * 24 * 60
+
+# Spoken names of the days by `isoweekday`
+DAY_NAMES = {1: 'Monday', 2: 'Tuesday', 3: 'Wednesday', 4: 'Thursday',
+             5: 'Friday', 6: 'Saturday', 7: 'Sunday'}
+
+# Spoken regions of the timezones, other timezones are spoken by abbreviation
+TIMEZONE_REGIONS = {
+    'America/New_York': 'Eastern',
+    'America/Detroit': 'Eastern',
+    'America/Chicago': 'Central',
+    'America/Denver': 'Mountain',
+    'America/Phoenix': 'Mountain',
+    'America/Los_Angeles': 'Pacific',
+    'America/Anchorage': 'Alaska',
+    'Pacific/Honolulu': 'Hawaii',
+}
+
+# Maximum number of opening and closing times converted through the timezone
+# that are kept in memory
+CONVERSION_CACHE_SIZE = 1024
+
+# Create object to store the open or closed state of the store at a moment
+OpenState = namedtuple('OpenState', ['is_open', 'seconds_until_open',
+                                     'seconds_until_close', 'next_open', 'next_close'])
+
+
+def _build_weekly_table(weekly):
+    """Takes the store hours by weekday and builds the sorted weekly table of
+    open intervals in minutes since Monday midnight, local time
+
+    :param weekly: the `dict` of `isoweekday` to store hours
+    :returns: a sorted list of `(open, close)` minute tuples
+    """
+    table = []
+    for weekday, ((open_hour, open_minute), (close_hour, close_minute)) in weekly.items():
+        day = (weekday - 1) * 24 * 60
+        table.append((day + open_hour * 60 + open_minute,
+                      day + close_hour * 60 + close_minute))
+    return sorted(table)
+
+
+def validate_weekly(weekly):
+    """Checks a table of store hours by weekday can be looked up
+
+    :param weekly: the `dict` of `isoweekday` to store hours
+    :returns: `None`
+    :raises ValueError: if the table is empty or has an invalid day or time
+    """
+    if not weekly:
+        raise ValueError("The store hours table is empty.")
+    for weekday, ((open_hour, open_minute), (close_hour, close_minute)) in weekly.items():
+        if weekday not in DAY_NAMES:
+            raise ValueError("Invalid weekday {} in the store hours.".format(weekday))
+        opens, closes = open_hour * 60 + open_minute, close_hour * 60 + close_minute
+        if not (0 <= open_hour < 24 and 0 <= open_minute < 60 and 0 <= close_minute < 60 and
+                opens < closes <= opens + 24 * 60):
+            raise ValueError("Invalid store hours on {}.".format(DAY_NAMES[weekday]))
+
+
+def weekly_schedule(weekly):
+    """Takes the store hours by weekday and groups the days sharing their hours
+
+    :param weekly: the `dict` of `isoweekday` to store hours
+    :returns: a tuple of the list of `(open, close, days)` tuples of the
+        formatted times and the day names, in the order of the week, and the
+        list of the names of the days the store does not open
+    """
+    groups, closed = [], []
+    for weekday in sorted(DAY_NAMES):
+        hours = weekly.get(weekday)
+        if hours is None:
+            closed.append(DAY_NAMES[weekday])
+            continue
+        times = (_format_time(*hours[0]), _format_time(*hours[1]))
+        for group in groups:
+            if group[:2] == times:
+                group[2].append(DAY_NAMES[weekday])
+                break
+        else:
+            groups.append(times + ([DAY_NAMES[weekday]],))
+    return groups, closed
+
+
+def _timestamp(dt):
+    """Takes an aware `datetime` and returns its POSIX timestamp
+
+    :param dt: the aware `datetime`
+    :returns: the number of seconds since the epoch
+    """
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+def _from_timestamp(ts):
+    """Takes a POSIX timestamp and returns an aware UTC `datetime`
+
+    :param ts: the number of seconds since the epoch
+    :returns: the UTC `datetime`
+    """
+    return datetime.datetime.fromtimestamp(ts, pytz.utc)
+
+
+def _format_time(hour, minute):
+    """Takes a local wall time and formats it for speech, e.g. `12 PM`
+
+    :param hour: the hour, 24 or more for times after midnight
+    :param minute: the minute
+    :returns: the formatted time string
+    """
+    hour = hour % 24
+    suffix = 'AM' if hour < 12 else 'PM'
+    hour = hour % 12 or 12
+    if minute:
+        return '{}:{:02d} {}'.format(hour, minute, suffix)
+    return '{} {}'.format(hour, suffix)
+
+
+class StoreHours(object):
+    """Weekly store hours kept as one table of open intervals in local time.
+
+    The table is built once, with the intervals of the weeks before and after
+    it, so a moment is looked up by bisecting its local minute of the week.
+    Only the interval it falls in is converted through the timezone, so opening
+    times stay correct across daylight saving time changes.
+    """
+
+    def __init__(self, weekly=WEEKLY_HOURS, timezone=STORE_TIMEZONE):
+        """Initialize the weekly table and the timezone.
+
+        :param weekly: the `dict` of `isoweekday` to store hours in local time
+        :param timezone: the name of the timezone of the store
+        :returns: `None`
+        :raises ValueError: if the table is empty or invalid
+        """
+        validate_weekly(weekly)
+        self.weekly = weekly
+        self.timezone = pytz.timezone(timezone)
+        self.table = _build_weekly_table(weekly)
+
+        # the intervals of the previous and next weeks bound every lookup
+        extended = ([(o - WEEK_MINUTES, c - WEEK_MINUTES) for o, c in self.table] + self.table +
+                    [(o + WEEK_MINUTES, c + WEEK_MINUTES) for o, c in self.table])
+        self._opens = [i[0] for i in extended]
+        self._closes = [i[1] for i in extended]
+        self._converted = {}
+
+    def _localize(self, dt):
+        """Takes a `datetime` or `date` and converts it to store local time. Naive
+        datetimes are treated as UTC and dates as local midnight.
+
+        :param dt: the `datetime` or `date`
+        :returns: the aware local `datetime`
+        """
+        if not isinstance(dt, datetime.datetime):
+            return self.timezone.localize(datetime.datetime(dt.year, dt.month, dt.day))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=pytz.utc)
+        return dt.astimezone(self.timezone)
+
+    def _week_minute(self, dt):
+        """Takes a moment and finds its week and its minute of the week in local time
+
+        :param dt: the `datetime` or `date`
+        :returns: a tuple of the timestamp, the local `date` of the Monday of
+            the week and the minutes since that Monday midnight
+        """
+        local = self._localize(dt)
+        weekday = local.isoweekday() - 1
+        minute = (weekday * 24 * 60 + local.hour * 60 + local.minute +
+                  (local.second + local.microsecond / 1e6) / 60)
+        return _timestamp(local), local.date() - datetime.timedelta(days=weekday), minute
+
+    def _at(self, monday, minute):
+        """Converts a local minute of a week to an absolute time, remembering
+        the conversion since the same few times are asked for over and over
+
+        :param monday: the local `date` of the Monday of the week
+        :param minute: the minutes since that Monday midnight
+        :returns: the timestamp
+        """
+        key = (monday, minute)
+        ts = self._converted.get(key)
+        if ts is None:
+            start = datetime.datetime(monday.year, monday.month, monday.day)
+            ts = _timestamp(self.timezone.localize(start + datetime.timedelta(minutes=minute)))
+            if len(self._converted) >= CONVERSION_CACHE_SIZE:
+                self._converted.clear()
+            self._converted[key] = ts
+        return ts
+
+    def _state(self, ts, monday, minute, i):
+        """Builds the state of a moment from the last interval opening before it
+
+        :param ts: the timestamp of the moment
+        :param monday: the local `date` of the Monday of its week
+        :param minute: its minutes since that Monday midnight
+        :param i: the index of the last interval opening at or before it
+        :returns: an `OpenState` `namedtuple`
+        """
+        at = self._at
+        if minute < self._closes[i]:
+            closes, opens = at(monday, self._closes[i]), at(monday, self._opens[i + 1])
+            return OpenState(is_open=True, seconds_until_open=0,
+                             seconds_until_close=int(closes - ts),
+                             next_open=_from_timestamp(opens),
+                             next_close=_from_timestamp(closes))
+
+        opens, closes = at(monday, self._opens[i + 1]), at(monday, self._closes[i + 1])
+        return OpenState(is_open=False, seconds_until_open=int(opens - ts),
+                         seconds_until_close=0,
+                         next_open=_from_timestamp(opens),
+                         next_close=_from_timestamp(closes))
+
+    def lookup(self, dt):
+        """Determines if the store is open at a moment and how long until it opens
+        or closes
+
+        :param dt: the `datetime` to check, naive datetimes are treated as UTC
+        :returns: an `OpenState` `namedtuple`
+        """
+        ts, monday, minute = self._week_minute(dt)
+        # the last interval opening at or before the moment
+        i = bisect.bisect_right(self._opens, minute) - 1
+        return self._state(ts, monday, minute, i)
+
+    def lookup_many(self, dts):
+        """Determines the open or closed state of the store at many moments. The
+        moments are sorted and the table is walked once per week instead of
+        being bisected for every moment.
+
+        :param dts: an iterable of `datetime` to check
+        :returns: a list of `OpenState` `namedtuple` in the order of the moments
+        """
+        moments = []
+        for position, dt in enumerate(dts):
+            ts, monday, minute = self._week_minute(dt)
+            moments.append((monday, minute, ts, position))
+        moments.sort()
+        states = [None] * len(moments)
+        week, i = None, 0
+        for monday, minute, ts, position in moments:
+            if monday != week:
+                week, i = monday, 0
+            while i + 1 < len(self._opens) and self._opens[i + 1] <= minute:
+                i += 1
+            states[position] = self._state(ts, monday, minute, i)
+        return states
+
+    def hours_on(self, dt):
+        """Gets the local opening and closing times of the store on a day
+
+        :param dt: the `datetime` or `date` of the day, datetimes are converted
+            to the local day of the store
+        :returns: a tuple of the formatted open and close times, or `None` when
+            the store does not open that day
+        """
+        hours = self.weekly.get(self._localize(dt).isoweekday())
+        if hours is None:
+            return None
+        return _format_time(*hours[0]), _format_time(*hours[1])
+
+    def spoken_timezone(self, dt):
+        """Gets the name of the timezone of the store on a day as it is spoken,
+        e.g. `Eastern Daylight Time`
+
+        :param dt: the `datetime` or `date` of the day
+        :returns: the timezone name
+        """
+        local = self._localize(dt)
+        if not isinstance(dt, datetime.datetime):
+            # midday, clear of the daylight saving change in the night
+            local = self.timezone.normalize(local + datetime.timedelta(hours=12))
+        region = TIMEZONE_REGIONS.get(self.timezone.zone)
+        if region is None:
+            return local.tzname()
+        return '{} {} Time'.format(region, 'Daylight' if local.dst() else 'Standard')
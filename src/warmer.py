@@ -0,0 +1,129 @@
+"""Pre-scrape The Dairy Godmother calendar into a snapshot read by the skill.
+
+Lambda containers do not share `/tmp`, so a deployed warmer publishes the
+snapshot to S3 by setting `FLAVORFORECAST_SNAPSHOT` to an `s3://bucket/key`
+url, and the skill reads it from there.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import time
+
+import api
+import calendars
+import compact_index
+import crawler
+import storage
+
+# Number of months after the current month that are scraped by default
+DEFAULT_MONTHS = 2
+
+# Default location of the snapshot, shared with `skill.py`
+DEFAULT_SNAPSHOT = os.environ.get('FLAVORFORECAST_SNAPSHOT',
+                                  '/tmp/flavorforecast-snapshot.json')
+
+# Default location of the compact index, not written unless set
+DEFAULT_INDEX = os.environ.get('FLAVORFORECAST_INDEX')
+
+logger = logging.getLogger(__name__)
+
+
+def build_snapshot(forecast, start, months):
+    """Scrapes the month of the start date and the following months and builds
+    a snapshot of every parsed day. A month that fails to scrape is left out,
+    so the skill scrapes it live.
+
+    :param forecast: the `crawler.ConcurrentDGMApi` used to scrape the calendar
+    :param start: the `datetime` of the first month to scrape
+    :param months: the number of months to scrape after the first month
+    :returns: the snapshot `dict`
+    """
+    snapshot = {'version': api.PARSER_VERSION,
+                'generated': time.time(),
+                'months': {}}
+
+    for crawled in forecast.crawl(start, months + 1):
+        if crawled.error is not None:
+            logger.warning("unable to scrape %04d-%02d of %s: %s", crawled.year, crawled.month,
+                           forecast.calendar.key, crawled.error)
+            continue
+        snapshot['months']['{:04d}-{:02d}'.format(crawled.year, crawled.month)] = crawled.days
+
+    return snapshot
+
+
+def write_snapshot(snapshot, path, client=None):
+    """Publishes the snapshot atomically so the skill never reads a partial file
+
+    :param snapshot: the snapshot `dict`
+    :param path: the local path or S3 url of the snapshot
+    :param client: an optional S3 client, a `boto3` client by default
+    :returns: `None`
+    """
+    storage.write(path, json.dumps(snapshot, separators=(',', ':'), sort_keys=True), client)
+
+
+def write_index(snapshot, path):
+    """Writes the months of a snapshot as a compact index
+
+    :param snapshot: the snapshot `dict`
+    :param path: the path of the index file
+    :returns: `None`
+    """
+    months = {}
+    for month, days in snapshot['months'].items():
+        year, month = month.split('-')
+        months[(int(year), int(month))] = days
+    compact_index.write_index(months, path, snapshot['version'], snapshot['generated'])
+
+
+def warm(path=DEFAULT_SNAPSHOT, months=DEFAULT_MONTHS, index=DEFAULT_INDEX):
+    """Scrapes the current and upcoming months of every calendar and publishes
+    a snapshot per calendar. A calendar none of whose months could be scraped
+    keeps its previous snapshot.
+
+    :param path: the local path or S3 url of the snapshot of the default calendar
+    :param months: the number of months to scrape after the current month
+    :param index: an optional path of the compact index of the default
+        calendar, written next to the snapshots
+    :returns: a `dict` of calendar keys to snapshot `dict`
+    """
+    snapshots = {}
+    for calendar in calendars.load_registry():
+        snapshot = build_snapshot(crawler.ConcurrentDGMApi(calendar=calendar),
+                                  datetime.date.today(), months)
+        if not snapshot['months']:
+            logger.warning("no months of %s were scraped, keeping its snapshot", calendar.key)
+            continue
+        calendar_path = calendars.snapshot_path(path, calendar)
+        write_snapshot(snapshot, calendar_path)
+        logger.info("wrote %d months to %s", len(snapshot['months']), calendar_path)
+        if index:
+            write_index(snapshot, calendars.snapshot_path(index, calendar))
+        snapshots[calendar.key] = snapshot
+    return snapshots
+
+
+def handler(event, context):
+    """Entry point for the scheduled Zappa event."""
+    warm()
+
+
+def main():
+    """Utility method to build the snapshot from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--path', default=DEFAULT_SNAPSHOT,
+                        help='where to write the snapshot, a path or an s3://bucket/key url')
+    parser.add_argument('--months', type=int, default=DEFAULT_MONTHS,
+                        help='number of months to scrape after the current month')
+    parser.add_argument('--index', default=DEFAULT_INDEX,
+                        help='where to also write the compact index')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    warm(args.path, args.months, args.index)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Build Alexa request envelopes for driving the skill locally."""
+import datetime
+import json
+import os
+import re
+import uuid
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Value used for every `AMAZON.DATE` slot
+SAMPLE_DATE = '2017-05-29'
+
+# Values of the built-in slot types, the custom types are read from `speech_assets`
+BUILTIN_SLOT_VALUES = {
+    'AMAZON.DATE': [SAMPLE_DATE, '2017-05-02', '2017-05-14', '2017-03-25', '2017-03-27'],
+}
+
+_SLOT_RE = re.compile(r'{(\w+)}')
+
+
+def load_intents():
+    """Reads the intent names and their slots from the intent schema
+
+    :returns: a list of `(intent, slots)` tuples
+    """
+    with open(os.path.join(ROOT, 'intent_assets', 'intent_schema.json')) as f:
+        schema = json.load(f)
+    return [(intent['intent'], [slot['name'] for slot in intent.get('slots', [])])
+            for intent in schema['intents']]
+
+
+def load_slot_types():
+    """Reads the type of every slot from the intent schema
+
+    :returns: a `dict` of slot names to slot types
+    """
+    with open(os.path.join(ROOT, 'intent_assets', 'intent_schema.json')) as f:
+        schema = json.load(f)
+    return dict((slot['name'], slot['type'])
+                for intent in schema['intents'] for slot in intent.get('slots', []))
+
+
+def load_slot_values(slot_type):
+    """Reads the sample values of a slot type
+
+    :param slot_type: the slot type, e.g. `AMAZON.DATE` or `LIST_OF_FLAVORS`
+    :returns: a list of values
+    """
+    if slot_type in BUILTIN_SLOT_VALUES:
+        return BUILTIN_SLOT_VALUES[slot_type]
+    with open(os.path.join(ROOT, 'speech_assets', slot_type + '.txt')) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def load_utterances():
+    """Reads the sample utterances with the slots each one fills
+
+    :returns: a list of `(intent, slots)` tuples, one per utterance
+    """
+    utterances = []
+    with open(os.path.join(ROOT, 'speech_assets', 'utterances_en_US.txt')) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            intent, _, text = line.strip().partition(' ')
+            utterances.append((intent, _SLOT_RE.findall(text)))
+    return utterances
+
+
+def build_request(intent, slots=None, request_type='IntentRequest', new=True, session_id=None):
+    """Builds the json envelope Alexa posts to the skill
+
+    :param intent: the name of the intent, ignored for other request types
+    :param slots: an optional `dict` of slot names to values
+    :param request_type: `IntentRequest`, `LaunchRequest` or `SessionEndedRequest`
+    :param new: whether the request starts a new session
+    :param session_id: an optional id of the session
+    :returns: the request `dict`
+    """
+    request = {
+        'type': request_type,
+        'requestId': 'EdwRequestId.' + str(uuid.uuid4()),
+        'timestamp': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'locale': 'en-US',
+    }
+    if request_type == 'IntentRequest':
+        request['intent'] = {
+            'name': intent,
+            'slots': dict((name, {'name': name, 'value': value})
+                          for name, value in (slots or {}).items()),
+        }
+    return {
+        'version': '1.0',
+        'session': {
+            'new': new,
+            'sessionId': session_id or 'SessionId.' + str(uuid.uuid4()),
+            'application': {'applicationId': 'amzn1.ask.skill.flavorforecast'},
+            'attributes': {},
+            'user': {'userId': 'amzn1.ask.account.flavorforecast'},
+        },
+        'request': request,
+    }
+
+
+def sample_requests():
+    """Builds one sample request for the launch and every intent of the schema,
+    filling every slot with a sample value
+
+    :returns: a list of `(name, request)` tuples
+    """
+    types = load_slot_types()
+    samples = [('LaunchRequest', build_request(None, request_type='LaunchRequest'))]
+    for intent, slots in load_intents():
+        values = dict((slot, load_slot_values(types[slot])[0]) for slot in slots)
+        samples.append((intent, build_request(intent, values)))
+    return samples
@@ -0,0 +1,184 @@
+"""Offline benchmarks of the search, parse, status and response hot paths.
+
+Every benchmark runs against the saved calendar pages in `test/fixtures` with
+the network stubbed out, so runs are reproducible and can be compared.
+
+    python test/bench.py [--output FILE] [--compare FILE] [--number N]
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+TEST = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TEST, '..', 'src'))
+
+import pytz
+
+import api
+import calendar_parser
+import skill
+from alexa import build_request, sample_requests
+from fake_upstream import EMPTY_PAGE, load_fixture
+
+# The known edge dates of the calendar, see test.py
+EDGE_DATES = [
+    ('dash', datetime.date(2017, 5, 29)),
+    ('closed_long', datetime.date(2017, 5, 2)),
+    ('closed_short', datetime.date(2017, 5, 30)),
+    ('paren', datetime.date(2017, 3, 27)),
+    ('duplicate', datetime.date(2017, 3, 25)),
+    ('empty', datetime.date(1977, 3, 25)),
+]
+
+# Moments the store status is computed for
+STATUS_TIMES = [
+    ('open', datetime.datetime(2017, 5, 1, 16, 30, tzinfo=pytz.utc)),
+    ('closed', datetime.datetime(2017, 5, 2, 10, 0, tzinfo=pytz.utc)),
+    ('month_end', datetime.datetime(2017, 5, 31, 23, 0, tzinfo=pytz.utc)),
+]
+
+
+class StubResponse(object):
+    """Response of the stubbed session."""
+
+    def __init__(self, url, text):
+        self.url = url
+        self.text = text
+        self.encoding = 'utf-8'
+        self.status_code = 200
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for i in range(0, len(self.text), chunk_size):
+            yield self.text[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class StubSession(object):
+    """Session serving the saved calendar pages without any network."""
+
+    def get(self, url, params=None, headers=None, timeout=None, stream=False):
+        params = dict(params)
+        page = load_fixture(params['yr'], params['month'])
+        return StubResponse(url, EMPTY_PAGE if page is None else page)
+
+
+def _stub_forecast(ttl, low_memory=False):
+    # empty and closed months are kept for the ttl too, so a cold forecast scrapes
+    # them on every search instead of answering them from the negative cache
+    forecast = api.DGMApi(ttl=ttl, low_memory=low_memory, negative_ttl=ttl, closed_ttl=ttl)
+    forecast._session = StubSession()
+    return forecast
+
+
+def _measure(func, number, repeat):
+    """Times a function and returns its statistics in microseconds."""
+    # keep the output of the measured code out of the report
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        times = sorted(t / number * 1e6 for t in timeit.repeat(func, number=number, repeat=repeat))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return {'min_us': times[0],
+            'median_us': times[len(times) // 2],
+            'mean_us': sum(times) / len(times),
+            'number': number,
+            'repeat': repeat}
+
+
+def benchmarks(number):
+    """Builds every benchmark as a `(name, function, number)` tuple."""
+    cold = _stub_forecast(ttl=0)
+    warm = _stub_forecast(ttl=api.DEFAULT_TTL)
+    lean = _stub_forecast(ttl=0, low_memory=True)
+
+    for name, dt in EDGE_DATES:
+        yield 'search.cold.' + name, lambda dt=dt: cold.search(dt), number // 10 or 1
+        yield 'search.low_memory.' + name, lambda dt=dt: lean.search(dt), number // 10 or 1
+        yield 'search.cached.' + name, lambda dt=dt: warm.search(dt), number
+
+    for year, month in [(2017, 3), (2017, 5)]:
+        html = load_fixture(year, month)
+        yield ('parse.{:04d}-{:02d}'.format(year, month),
+               lambda html=html, year=year, month=month: calendar_parser.parse_month(html, year, month),
+               number // 10 or 1)
+
+    for name, dt in EDGE_DATES:
+        days = warm.get_month(dt.year, dt.month)
+        yield 'build_result.' + name, lambda days=days, dt=dt: api._build_day_result(days, dt), number
+
+    for name, dt in STATUS_TIMES:
+        yield 'status.' + name, lambda dt=dt: api._is_closed(dt), number
+
+    # dispatch the sample requests through flask-ask with the stubbed forecast
+    skill._forecasts[warm.calendar.key] = warm
+    skill.app.config['ASK_VERIFY_REQUESTS'] = False
+    logging.getLogger('flask_ask').setLevel(logging.WARNING)
+    client = skill.app.test_client()
+    requests = sample_requests()
+    for dt_name, dt in EDGE_DATES:
+        requests.append(('GetSearchDateIntent.' + dt_name,
+                         build_request('GetSearchDateIntent', {'date': dt.isoformat()})))
+    for name, request in requests:
+        body = json.dumps(request)
+        yield ('dispatch.' + name,
+               lambda body=body: client.post('/', data=body, content_type='application/json'),
+               number // 10 or 1)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=TEST).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output', help='write the results as json to this file')
+    parser.add_argument('--compare', help='compare against the results of a previous run')
+    parser.add_argument('--number', type=int, default=1000,
+                        help='number of calls per timing of the cheap benchmarks')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timings per benchmark')
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['benchmarks']
+
+    results = {'python': platform.python_version(),
+               'commit': _git_commit(),
+               'timestamp': time.time(),
+               'benchmarks': {}}
+
+    for name, func, number in benchmarks(args.number):
+        stats = _measure(func, number, args.repeat)
+        results['benchmarks'][name] = stats
+
+        line = "{:<40} {:12.1f}us".format(name, stats['min_us'])
+        if name in previous:
+            line += "  {:+7.1f}%".format((stats['min_us'] / previous[name]['min_us'] - 1) * 100)
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
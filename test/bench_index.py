@@ -0,0 +1,92 @@
+"""Compare opening and searching the compact index with parsing the html and the json snapshot.
+
+    python test/bench_index.py [--months N]
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import api
+import calendar_parser
+import compact_index
+import warmer
+from fake_upstream import load_fixture
+
+REPEAT = 20
+
+
+def build_months(count):
+    """Builds the parsed days of many months by relabelling the saved pages
+
+    :param count: the number of months, ending with May 2017
+    :returns: a `dict` of `(year, month)` to parsed days
+    """
+    pages = [calendar_parser.parse_month(load_fixture(2017, month), 2017, month) for month in (3, 5)]
+    months = {}
+    first = 2017 * 12 + 5 - count
+    start = datetime.date(first // 12, first % 12 + 1, 1)
+    for i, (year, month) in enumerate(api._month_range(start, count)):
+        days = {}
+        for key, flavors in pages[i % 2].items():
+            try:
+                day = datetime.date(year, month, int(key[-2:]))
+            except ValueError:
+                continue
+            days[day.strftime('%Y-%m-%d')] = flavors
+        months[(year, month)] = days
+    return months
+
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--months', type=int, default=36, help='number of months in the snapshot and index')
+    args = parser.parse_args()
+
+    months = build_months(args.months)
+    html = load_fixture(2017, 5)
+    dt = datetime.date(2017, 5, 29)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        snapshot_path = os.path.join(tmp, 'snapshot.json')
+        index_path = os.path.join(tmp, 'forecast.idx')
+        snapshot = {'version': api.PARSER_VERSION, 'generated': time.time(),
+                    'months': dict(('{:04d}-{:02d}'.format(*key), days) for key, days in months.items())}
+        warmer.write_snapshot(snapshot, snapshot_path)
+        warmer.write_index(snapshot, index_path)
+
+        def open_index():
+            return compact_index.CompactIndex(index_path).get_month(2017, 5)
+
+        index = compact_index.CompactIndex(index_path)
+        results = [
+            ('html parse (one month)', best(lambda: calendar_parser.parse_month(html, 2017, 5))),
+            ('json snapshot', best(lambda: api._read_snapshot(snapshot_path)[1][(2017, 5)])),
+            ('compact index (one month)', best(open_index)),
+            ('compact index (one day)', best(lambda: compact_index.CompactIndex(index_path).get_day(dt))),
+            ('compact index (mapped, one day)', best(lambda: index.get_day(dt))),
+        ]
+
+        print("{} months: json snapshot {} bytes, compact index {} bytes".format(
+            args.months, os.path.getsize(snapshot_path), os.path.getsize(index_path)))
+        for name, ms in results:
+            print("{:<34} open and search {:>9.3f}ms".format(name, ms))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
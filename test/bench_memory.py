@@ -0,0 +1,96 @@
+"""Compare the peak memory of a cold search reading the calendar page whole and streaming it.
+
+Every search runs in a fresh interpreter against the local stand-in calendar,
+after a warm-up search of an empty month, and reports how much the peak
+resident memory of the process grew during the search.
+
+    python test/bench_memory.py [--repeat N] [--output FILE]
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+TEST = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(TEST, '..', 'src')
+
+# Dates searched cold, one per saved calendar page
+DATES = [datetime.date(2017, 3, 27), datetime.date(2017, 5, 29)]
+
+# Month without a saved page, searched to warm up the interpreter
+WARM_UP = datetime.date(1977, 3, 25)
+
+
+def _peak_kb():
+    # macOS reports bytes, Linux kilobytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _child(url, low_memory, date):
+    import api
+
+    forecast = api.DGMApi(url=url, low_memory=low_memory)
+    forecast.search(WARM_UP)
+    gc.collect()
+    before = _peak_kb()
+
+    start = time.time()
+    result = forecast.search(datetime.datetime.strptime(date, '%Y-%m-%d'))
+    elapsed = time.time() - start
+    return {'peak_growth_kb': _peak_kb() - before,
+            'search_ms': elapsed * 1000,
+            'found': result.found}
+
+
+def _run_child(url, low_memory, date):
+    output = subprocess.check_output(
+        [sys.executable, '-W', 'ignore', os.path.abspath(__file__),
+         '--child', url, '1' if low_memory else '0', date.strftime('%Y-%m-%d')],
+        cwd=SRC, env=dict(os.environ, PYTHONPATH=os.pathsep.join([SRC, TEST])))
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help='fresh interpreters per date and mode')
+    parser.add_argument('--output', help='write the results as json to this file')
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        url, low_memory, date = args.child
+        sys.stdout.write(json.dumps(_child(url, low_memory == '1', date)) + '\n')
+        return
+
+    from fake_upstream import FakeUpstream
+
+    results = {}
+    with FakeUpstream() as upstream:
+        for mode, low_memory in [('whole page', False), ('low memory', True)]:
+            runs = [_run_child(upstream.url, low_memory, date)
+                    for date in DATES for _ in range(args.repeat)]
+            if not all(run['found'] for run in runs):
+                raise SystemExit("a {} search found no flavor".format(mode))
+            growth = sorted(run['peak_growth_kb'] for run in runs)
+            times = sorted(run['search_ms'] for run in runs)
+            results[mode] = {'peak_growth_kb': growth[len(growth) // 2],
+                             'max_peak_growth_kb': growth[-1],
+                             'search_ms': times[len(times) // 2]}
+            print("{:<11} peak growth per search {:6d} KB (max {:6d} KB)  search {:7.2f}ms".format(
+                mode, results[mode]['peak_growth_kb'], results[mode]['max_peak_growth_kb'],
+                results[mode]['search_ms']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
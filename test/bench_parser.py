@@ -0,0 +1,25 @@
+"""Compare the calendar parser with the original full document parse."""
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import calendar_parser
+from fake_upstream import load_fixture
+from test_calendar_parser import reference_search
+
+REPEAT = 20
+
+for year, month in [(2017, 3), (2017, 5)]:
+    html = load_fixture(year, month)
+    dt = datetime.date(year, month, 25)
+
+    full = min(timeit.repeat(lambda: reference_search(html, dt), number=1, repeat=REPEAT))
+    fast = min(timeit.repeat(
+        lambda: calendar_parser.parse_month(html, year, month), number=1, repeat=REPEAT))
+
+    print("{:04d}-{:02d} full document (one day): {:.2f}ms".format(year, month, full * 1000))
+    print("{:04d}-{:02d} calendar parser (whole month): {:.2f}ms ({:.1f}x)".format(
+        year, month, fast * 1000, full / fast))
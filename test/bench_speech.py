@@ -0,0 +1,51 @@
+"""Compare rendering responses through flask-ask with the precompiled speech templates."""
+import datetime
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from flask import render_template
+from flask_ask import statement
+
+import skill
+
+NUMBER = 2000
+REPEAT = 5
+
+# The templates of the static and the dynamic intents with their arguments
+RESPONSES = [
+    ('hours', {'store': 'The Dairy Godmother', 'schedule': 'from 12 PM to 9 PM Monday and Tuesday'}),
+    ('location', {'store': 'The Dairy Godmother', 'address': '2310 Mount Vernon Ave., Alexandria, VA 22301'}),
+    ('about', {}),
+    ('found', {'date': datetime.date(2017, 5, 29), 'flavors': 'Cotton Candy'}),
+    ('notfound', {'date': datetime.date(1977, 3, 25)}),
+    ('opennow', {'time': '2 hours and 5 minutes'}),
+    ('closednow', {'time': '14 hours and 30 minutes'}),
+]
+
+logging.getLogger('flask_ask').setLevel(logging.WARNING)
+
+with skill.app.test_request_context():
+    for name, context in RESPONSES:
+        if context:
+            # dynamic responses are still built per request, only the text is memoized
+            def flask_ask(name=name, context=context):
+                return render_template(name, **context)
+
+            def compiled(name=name, context=context):
+                return skill.SPEECH.render(name, **context)
+        else:
+            def flask_ask(name=name):
+                return statement(render_template(name)).render_response()
+
+            def compiled(name=name):
+                return skill.SPEECH.response(
+                    name, lambda: statement(skill.SPEECH.render(name)), {})
+
+        before = min(timeit.repeat(flask_ask, number=NUMBER, repeat=REPEAT)) / NUMBER
+        after = min(timeit.repeat(compiled, number=NUMBER, repeat=REPEAT)) / NUMBER
+        print("{:<10} flask-ask: {:7.1f}us  precompiled: {:6.1f}us ({:.1f}x)".format(
+            name, before * 1e6, after * 1e6, before / after))
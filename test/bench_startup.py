@@ -0,0 +1,126 @@
+"""Measure the cold start of the skill in fresh interpreters: the import time of
+each module and the time to the first response of every intent.
+
+    python test/bench_startup.py [--budget MS] [--output FILE]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+TEST = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(TEST, '..', 'src')
+sys.path.insert(0, SRC)
+
+# Modules whose import time is reported
+MODULES = ['flask', 'flask_ask', 'requests', 'humanize', 'pytz', 'dateutil',
+           'time_util', 'store_hours', 'calendar_parser', 'cache', 'api', 'skill']
+
+# Modules of the scraping stack that the static intents must not import
+SCRAPING_MODULES = ['requests', 'api', 'cache', 'calendar_parser']
+
+# Intents that never touch the forecast
+STATIC_INTENTS = ['GetHoursIntent', 'GetLocationIntent', 'GetAboutIntent',
+                  'AMAZON.HelpIntent', 'AMAZON.StopIntent', 'AMAZON.CancelIntent']
+
+
+def _child_import(module):
+    start = time.time()
+    __import__(module)
+    return {'import_ms': (time.time() - start) * 1000}
+
+
+def _child_intent(name):
+    import logging
+    from alexa import sample_requests
+
+    request = dict(sample_requests())[name]
+    start = time.time()
+    import skill
+    imported = time.time()
+
+    skill.app.config['ASK_VERIFY_REQUESTS'] = False
+    logging.getLogger('flask_ask').setLevel(logging.WARNING)
+    response = skill.app.test_client().post(
+        '/', data=json.dumps(request), content_type='application/json')
+    done = time.time()
+    scraping = [m for m in SCRAPING_MODULES if m in sys.modules]
+
+    # let the prefetch started by a new session finish before the child exits
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread():
+            thread.join(5)
+
+    return {'import_ms': (imported - start) * 1000,
+            'response_ms': (done - imported) * 1000,
+            'total_ms': (done - start) * 1000,
+            'status': response.status_code,
+            'scraping_modules': scraping}
+
+
+def _run_child(kind, name, env):
+    output = subprocess.check_output(
+        [sys.executable, '-W', 'ignore', os.path.abspath(__file__), '--child', kind, name],
+        env=env, cwd=SRC)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--budget', type=float,
+                        help='fail when an intent takes longer than this many ms to first response')
+    parser.add_argument('--output', help='write the results as json to this file')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, TEST)
+        kind, name = args.child
+        result = _child_import(name) if kind == 'import' else _child_intent(name)
+        sys.stdout.write(json.dumps(result) + '\n')
+        return
+
+    from alexa import sample_requests
+    from fake_upstream import FakeUpstream
+
+    results = {'modules': {}, 'intents': {}}
+    failures = []
+    with FakeUpstream() as upstream:
+        env = dict(os.environ)
+        env['FLAVORFORECAST_URL'] = upstream.url
+        env['PYTHONPATH'] = os.pathsep.join([SRC, TEST])
+
+        for module in MODULES:
+            results['modules'][module] = _run_child('import', module, env)
+            print("import {:<16} {:8.1f}ms".format(module, results['modules'][module]['import_ms']))
+
+        for name, _ in sample_requests():
+            # every intent starts from an empty cache like a cold container
+            env['FLAVORFORECAST_CACHE'] = os.path.join(tempfile.mkdtemp(), 'cache.db')
+            env['FLAVORFORECAST_SNAPSHOT'] = os.path.join(tempfile.mkdtemp(), 'snapshot.json')
+            result = _run_child('intent', name, env)
+            results['intents'][name] = result
+            print("intent {:<20} import {:7.1f}ms  first response {:7.1f}ms  total {:7.1f}ms  {}".format(
+                name, result['import_ms'], result['response_ms'], result['total_ms'],
+                ' '.join(result['scraping_modules'])))
+
+            if name in STATIC_INTENTS and result['scraping_modules']:
+                failures.append('{} imported {}'.format(name, ', '.join(result['scraping_modules'])))
+            if args.budget is not None and result['total_ms'] > args.budget:
+                failures.append('{} took {:.1f}ms'.format(name, result['total_ms']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    for failure in failures:
+        print("FAIL: " + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Local stand-in for The Dairy Godmother calendar serving the saved fixtures."""
+import hashlib
+import io
+import os
+import random
+import threading
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Page served for months that have no saved fixture
+EMPTY_PAGE = u'<html><body><table class="my-calendar-table"></table></body></html>'
+
+
+def load_fixture(year, month):
+    """Reads the saved calendar page for a month
+
+    :param year: the year of the page
+    :param month: the month of the page
+    :returns: the html of the page or `None` if there is no fixture
+    """
+    path = os.path.join(FIXTURES, 'calendar-{:04d}-{:02d}.html'.format(year, month))
+    if not os.path.exists(path):
+        return None
+    with io.open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients that gave up on a slow response close the connection early
+        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        upstream = self.server.upstream
+        query = parse_qs(urlparse(self.path).query)
+        year = int(query.get('yr', ['0'])[0])
+        month = int(query.get('month', ['0'])[0])
+        upstream.record(year, month)
+
+        if upstream.latency:
+            time.sleep(upstream.latency)
+
+        if upstream.failures > 0 or random.random() < upstream.error_rate:
+            upstream.failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        page = upstream.page(year, month).encode('utf-8')
+        etag = '"{}"'.format(hashlib.md5(page).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            upstream.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=UTF-8')
+        self.send_header('Content-Length', str(len(page)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(page)
+
+
+class FakeUpstream(object):
+    """Threaded http server standing in for the calendar page.
+
+    Serves the saved fixture of the requested `yr`/`month`, with an optional
+    injected latency, error rate or number of leading failures, and counts the
+    requests it receives per month.
+    """
+
+    def __init__(self, latency=0, error_rate=0, failures=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.failures = failures
+        self.pages = {}
+        self.hits = {}
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.upstream = self
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/flavor-of-the-day-forecast/'.format(self._server.server_port)
+
+    @property
+    def total_hits(self):
+        return sum(self.hits.values())
+
+    def page(self, year, month):
+        page = self.pages.get((year, month))
+        if page is None:
+            page = load_fixture(year, month)
+        return EMPTY_PAGE if page is None else page
+
+    def record(self, year, month):
+        with self._lock:
+            self.hits[(year, month)] = self.hits.get((year, month), 0) + 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
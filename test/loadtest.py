@@ -0,0 +1,195 @@
+"""Replay a realistic mix of Alexa requests against the skill at a target rate.
+
+The calendar is replaced by the local stand-in server with configurable
+latency and error rate. The intent mix is weighted by the sample utterances,
+and the slots of each request are the ones its utterance fills. Requests are
+sent open loop at the target rate, so the latency of a request includes the
+time it waited for a free worker.
+
+    python test/loadtest.py [--rate N] [--duration S] [--concurrency N]
+                            [--latency S] [--error-rate P] [--output FILE]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+TEST = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TEST, '..', 'src'))
+
+from alexa import build_request, load_slot_types, load_slot_values, load_utterances
+from fake_upstream import FakeUpstream
+
+# Number of seconds Alexa waits on a skill response
+ALEXA_DEADLINE = 8.0
+
+# Start of the speech of a search that could not reach the calendar
+ERROR_SPEECH = 'Sorry, I was unable'
+
+
+def build_mix(rng):
+    """Builds a generator of `(intent, request)` tuples weighted by the sample
+    utterances, filling the slots of each utterance with random sample values
+
+    :param rng: the `random.Random` used to pick utterances and values
+    :returns: a function returning the next `(intent, request)` tuple
+    """
+    utterances = load_utterances()
+    types = load_slot_types()
+    values = dict((slot, load_slot_values(slot_type)) for slot, slot_type in types.items())
+
+    def next_request():
+        intent, slots = rng.choice(utterances)
+        return intent, build_request(intent, dict((slot, rng.choice(values[slot])) for slot in slots))
+    return next_request
+
+
+def percentile(values, p):
+    """Takes sorted values and returns the nearest rank percentile
+
+    :param values: the sorted list of values
+    :param p: the percentile between 0 and 100
+    :returns: the value at the percentile
+    """
+    if not values:
+        return None
+    rank = max(int(round(p / 100.0 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def summarize(samples, elapsed, deadline):
+    """Takes the recorded requests and builds the report per intent
+
+    :param samples: a list of `(intent, latency, error)` tuples
+    :param elapsed: the number of seconds the load ran for
+    :param deadline: the number of seconds a response is useful for
+    :returns: a `dict` of intent names, and `total`, to their statistics
+    """
+    by_intent = {'total': []}
+    for intent, latency, error in samples:
+        by_intent.setdefault(intent, []).append((latency, error))
+        by_intent['total'].append((latency, error))
+
+    report = {}
+    for intent, results in by_intent.items():
+        latencies = sorted(latency for latency, _ in results)
+        report[intent] = {'requests': len(results),
+                          'throughput': len(results) / elapsed,
+                          'errors': sum(1 for _, error in results if error),
+                          'over_deadline': sum(1 for latency in latencies if latency > deadline),
+                          'p50_ms': percentile(latencies, 50) * 1000,
+                          'p95_ms': percentile(latencies, 95) * 1000,
+                          'p99_ms': percentile(latencies, 99) * 1000}
+    return report
+
+
+def run(app, rate, duration, concurrency, seed=None):
+    """Sends requests to the app at a target rate from a pool of workers
+
+    :param app: the Flask app of the skill
+    :param rate: the number of requests started per second
+    :param duration: the number of seconds to send requests for
+    :param concurrency: the number of requests handled at the same time
+    :param seed: an optional seed of the request mix
+    :returns: a tuple of the `(intent, latency, error)` samples and the elapsed seconds
+    """
+    next_request = build_mix(random.Random(seed))
+    pending = Queue()
+    samples = []
+    lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            scheduled, intent, request = item
+            try:
+                response = client.post('/', data=json.dumps(request), content_type='application/json')
+                body = json.loads(response.data.decode('utf-8')) if response.status_code == 200 else {}
+                speech = body.get('response', {}).get('outputSpeech', {}).get('text', '')
+                error = response.status_code != 200 or speech.startswith(ERROR_SPEECH)
+            except Exception:
+                error = True
+            latency = time.time() - scheduled
+            with lock:
+                samples.append((intent, latency, error))
+
+    workers = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in workers:
+        thread.daemon = True
+        thread.start()
+
+    # schedule open loop so a slow skill does not slow down the load
+    start = time.time()
+    for i in range(int(rate * duration)):
+        scheduled = start + i / float(rate)
+        delay = scheduled - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        intent, request = next_request()
+        pending.put((scheduled, intent, request))
+
+    for _ in workers:
+        pending.put(None)
+    for thread in workers:
+        thread.join()
+    return samples, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, default=20, help='requests per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to send requests for')
+    parser.add_argument('--concurrency', type=int, default=8, help='requests handled at the same time')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds the calendar takes to answer')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of failing calendar requests')
+    parser.add_argument('--deadline', type=float, default=ALEXA_DEADLINE,
+                        help='seconds after which a response counts as late')
+    parser.add_argument('--seed', type=int, help='seed of the request mix')
+    parser.add_argument('--output', help='write the report as json to this file')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    with FakeUpstream(latency=args.latency, error_rate=args.error_rate) as upstream:
+        # point a fresh skill at the stand-in calendar before its first search
+        os.environ['FLAVORFORECAST_URL'] = upstream.url
+        os.environ['FLAVORFORECAST_CACHE'] = os.path.join(tmp, 'cache.db')
+        os.environ['FLAVORFORECAST_SNAPSHOT'] = os.path.join(tmp, 'snapshot.json')
+        import skill
+        skill.app.config['ASK_VERIFY_REQUESTS'] = False
+        logging.getLogger('flask_ask').setLevel(logging.WARNING)
+
+        samples, elapsed = run(skill.app, args.rate, args.duration, args.concurrency, args.seed)
+        upstream_hits = upstream.total_hits
+
+    report = summarize(samples, elapsed, args.deadline)
+    print("{:<22} {:>8} {:>9} {:>7} {:>9} {:>9} {:>9} {:>6}".format(
+        'intent', 'requests', 'req/s', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'late'))
+    for intent in sorted(report, key=lambda name: (name == 'total', name)):
+        stats = report[intent]
+        print("{:<22} {:>8} {:>9.1f} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>6}".format(
+            intent, stats['requests'], stats['throughput'], stats['errors'],
+            stats['p50_ms'], stats['p95_ms'], stats['p99_ms'], stats['over_deadline']))
+    print("calendar requests: {}".format(upstream_hits))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'calendar_requests': upstream_hits, 'intents': report},
+                      f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Locally generated stand-ins for the certificates Alexa signs requests with."""
+import base64
+import datetime
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.x509.oid import NameOID
+from OpenSSL import crypto
+
+# Url of the signing certificate chain that passes the url checks of flask-ask
+CERT_URL = 'https://s3.amazonaws.com/echo.api/echo-api-cert-local.pem'
+
+# Host the signing certificate has to be issued for
+ALEXA_HOST = u'echo-api.amazon.com'
+
+
+def _key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+
+
+def _certificate(name, key, issuer_name, issuer_key, ca, host=None, days=30):
+    now = datetime.datetime.utcnow()
+    builder = (x509.CertificateBuilder()
+               .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name)]))
+               .issuer_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, issuer_name)]))
+               .public_key(key.public_key())
+               .serial_number(x509.random_serial_number())
+               .not_valid_before(now - datetime.timedelta(days=1))
+               .not_valid_after(now + datetime.timedelta(days=days))
+               .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True))
+    if host is not None:
+        builder = builder.add_extension(x509.SubjectAlternativeName([x509.DNSName(host)]), critical=False)
+    return builder.sign(issuer_key, hashes.SHA256(), default_backend())
+
+
+def _pem(cert):
+    return cert.public_bytes(serialization.Encoding.PEM)
+
+
+class LocalChain(object):
+    """A root, an intermediate and a signing certificate generated locally."""
+
+    def __init__(self, host=ALEXA_HOST, days=30):
+        root_key, intermediate_key, self.key = _key(), _key(), _key()
+        root = _certificate(u'Local Root', root_key, u'Local Root', root_key, True)
+        intermediate = _certificate(u'Local Intermediate', intermediate_key, u'Local Root', root_key, True)
+        leaf = _certificate(host, self.key, u'Local Intermediate', intermediate_key, False, host, days)
+
+        self.root = crypto.load_certificate(crypto.FILETYPE_PEM, _pem(root))
+        self.pem = _pem(leaf) + _pem(intermediate)
+
+    def sign(self, body):
+        """Signs a request body the way Alexa does
+
+        :param body: the raw request body
+        :returns: the `Signature` header value
+        """
+        signature = self.key.sign(body, padding.PKCS1v15(), hashes.SHA1())
+        return base64.b64encode(signature)
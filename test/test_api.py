@@ -0,0 +1,448 @@
+"""Offline tests of the DGM API against a local stand-in calendar server."""
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import api
+import time_util
+from circuit import CircuitBreaker
+from fake_upstream import FakeUpstream
+
+
+class SessionTest(unittest.TestCase):
+
+    def test_search_fixture(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url)
+            result = forecast.search(datetime.date(2017, 5, 29))
+            self.assertTrue(result.found)
+            self.assertEqual(result.flavors, ['Cotton Candy'])
+            self.assertTrue(forecast.search(datetime.date(2017, 5, 2)).closed)
+            self.assertEqual(upstream.total_hits, 1)
+
+    def test_conditional_revalidation(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, ttl=0)
+            first = forecast.search(datetime.date(2017, 3, 27))
+            second = forecast.search(datetime.date(2017, 3, 27))
+            self.assertEqual(upstream.total_hits, 2)
+            self.assertEqual(upstream.not_modified, 1)
+            self.assertEqual(first, second)
+
+    def test_retries_with_backoff(self):
+        with FakeUpstream(failures=2) as upstream:
+            forecast = api.DGMApi(url=upstream.url, retries=2)
+            result = forecast.search(datetime.date(2017, 3, 25))
+            self.assertFalse(result.has_error)
+            self.assertEqual(upstream.total_hits, 3)
+
+    def test_read_timeout(self):
+        with FakeUpstream(latency=0.5) as upstream:
+            forecast = api.DGMApi(url=upstream.url, timeout=(1, 0.1), retries=0)
+            result = forecast.search(datetime.date(2017, 3, 25))
+            self.assertTrue(result.has_error)
+
+    def test_low_memory(self):
+        with FakeUpstream() as upstream:
+            whole = api.DGMApi(url=upstream.url)
+            lean = api.DGMApi(url=upstream.url, low_memory=True)
+            for dt in [datetime.date(2017, 5, 29), datetime.date(2017, 3, 25), datetime.date(2017, 5, 2)]:
+                self.assertEqual(lean.search(dt), whole.search(dt))
+            self.assertEqual(lean.search(datetime.date(2017, 5, 29)).flavors, ['Cotton Candy'])
+
+
+class MonthCacheTest(unittest.TestCase):
+
+    def test_day_results(self):
+        days = {'2017-05-29': ['Cotton Candy'],
+                '2017-05-30': ['Closed'],
+                '2017-05-31': None,
+                '2017-05-01': []}
+        result = api._build_day_result(days, datetime.date(2017, 5, 29))
+        self.assertTrue(result.found)
+        self.assertEqual(result.flavors, ['Cotton Candy'])
+        self.assertTrue(api._build_day_result(days, datetime.date(2017, 5, 30)).closed)
+        self.assertTrue(api._build_day_result(days, datetime.date(2017, 5, 31)).has_error)
+        self.assertFalse(api._build_day_result(days, datetime.date(2017, 5, 1)).found)
+
+        missing = api._build_day_result(days, datetime.date(2017, 5, 2))
+        self.assertFalse(missing.found)
+        self.assertFalse(missing.has_error)
+
+    def test_month_fetched_once(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url)
+            for day in (1, 2, 25, 27, 31):
+                forecast.search(datetime.date(2017, 3, day))
+            self.assertEqual(upstream.hits, {(2017, 3): 1})
+            self.assertIs(forecast.get_month(2017, 3), forecast.get_month(2017, 3))
+
+    def test_month_expires(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, ttl=0)
+            forecast.search(datetime.date(2017, 3, 25))
+            forecast.search(datetime.date(2017, 3, 27))
+            self.assertEqual(upstream.hits, {(2017, 3): 2})
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'snapshot.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _publish(self, generated, flavor='Snapshot Swirl'):
+        with open(self.path, 'w') as f:
+            json.dump({'version': api.PARSER_VERSION, 'generated': generated,
+                       'months': {'2017-05': {'2017-05-29': [flavor]}}}, f)
+        # a republished snapshot is told apart by its modification time
+        os.utime(self.path, (generated, generated))
+
+    def test_snapshot_hit(self):
+        self._publish(time.time())
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, snapshot=self.path)
+            self.assertEqual(forecast.search(datetime.date(2017, 5, 29)).flavors, ['Snapshot Swirl'])
+            self.assertEqual(upstream.total_hits, 0)
+
+            # a republished snapshot is picked up
+            self._publish(time.time() + 1, 'Fresh Swirl')
+            self.assertEqual(forecast.search(datetime.date(2017, 5, 29)).flavors, ['Fresh Swirl'])
+
+            # months left out of the snapshot are scraped
+            forecast.search(datetime.date(2017, 3, 25))
+            self.assertEqual(upstream.hits, {(2017, 3): 1})
+
+    def test_snapshot_expired(self):
+        self._publish(time.time() - 2 * api.DEFAULT_TTL * api.PAST_TTL_FACTOR)
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, snapshot=self.path)
+            self.assertEqual(forecast.search(datetime.date(2017, 5, 29)).flavors, ['Cotton Candy'])
+            self.assertEqual(upstream.total_hits, 1)
+
+    def test_snapshot_missing(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, snapshot=self.path)
+            self.assertEqual(forecast.search(datetime.date(2017, 5, 29)).flavors, ['Cotton Candy'])
+            self.assertEqual(upstream.total_hits, 1)
+
+
+class RecordTest(unittest.TestCase):
+
+    def test_lazy_humanized_fields(self):
+        result = api._build_result(True, ['Cotton Candy'], datetime.date(2016, 5, 29), 1, False, False, None)
+        self.assertEqual(result.humanized_date, 'May 29 2016')
+        self.assertTrue(result._replace(stale=True).stale)
+        self.assertRaises(AttributeError, setattr, result, 'extra', 1)
+
+        status = api.DGMApi().get_status_on_date(datetime.datetime(2017, 5, 1, 16, 30))
+        self.assertTrue(status.is_open)
+        self.assertEqual(status.time_left, time_util.humanize_time(status.seconds_left))
+        self.assertEqual(status.humanized_date, 'May 01 2017')
+
+
+class SearchRangeTest(unittest.TestCase):
+
+    def test_range_across_months(self):
+        with FakeUpstream(latency=0.3) as upstream:
+            forecast = api.DGMApi(url=upstream.url)
+            start = time.time()
+            results = forecast.search_range(datetime.date(2017, 3, 27), datetime.date(2017, 4, 2))
+            elapsed = time.time() - start
+
+            self.assertEqual([r.date for r in results],
+                             ['2017-03-{}'.format(d) for d in range(27, 32)] + ['2017-04-01', '2017-04-02'])
+            self.assertEqual(results[0].flavors, ['Peach Cobbler'])
+            self.assertFalse(results[-1].found)
+            self.assertEqual(upstream.hits, {(2017, 3): 1, (2017, 4): 1})
+            self.assertLess(elapsed, 0.55)
+
+    def test_range_failed_month(self):
+        with FakeUpstream(failures=1) as upstream:
+            forecast = api.DGMApi(url=upstream.url, retries=0)
+            results = forecast.search_range(datetime.date(2017, 5, 29), datetime.date(2017, 5, 30))
+            self.assertTrue(all(r.has_error for r in results))
+
+
+class NextFlavorTest(unittest.TestCase):
+
+    def test_next_flavor(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url)
+            result = forecast.next_flavor('banana', start=datetime.date(2017, 3, 1))
+            self.assertTrue(result.found)
+            self.assertEqual(result.flavor, 'Banana Pudding')
+            self.assertEqual(result.date, '2017-03-25')
+
+            # the months are indexed once and reused
+            result = forecast.next_flavor('cotton candy', start=datetime.date(2017, 3, 26))
+            self.assertEqual(result.date, '2017-05-29')
+            self.assertEqual(upstream.total_hits, 3)
+
+    def test_next_flavor_not_found(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url)
+            result = forecast.next_flavor('peach cobbler', start=datetime.date(2017, 3, 28))
+            self.assertFalse(result.found)
+            self.assertFalse(result.has_error)
+
+
+def _concurrently(func, callers):
+    """Calls a function from many threads released at the same moment."""
+    start = threading.Event()
+    results = [None] * callers
+
+    def call(i):
+        start.wait()
+        try:
+            results[i] = func()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class CoalescingTest(unittest.TestCase):
+
+    def test_single_upstream_hit(self):
+        with FakeUpstream(latency=0.3) as upstream:
+            forecast = api.DGMApi(url=upstream.url)
+            months = _concurrently(lambda: forecast.get_month(2017, 5), 20)
+            self.assertEqual(upstream.total_hits, 1)
+        self.assertTrue(all(days is months[0] for days in months))
+
+    def test_single_upstream_hit_without_budget(self):
+        with FakeUpstream(latency=0.3) as upstream:
+            forecast = api.DGMApi(url=upstream.url, budget=None)
+            results = _concurrently(lambda: forecast.search(datetime.date(2017, 5, 29)), 20)
+            self.assertEqual(upstream.total_hits, 1)
+        self.assertTrue(all(result.flavors == ['Cotton Candy'] for result in results))
+
+    def test_error_propagated_to_all_callers(self):
+        with FakeUpstream(latency=0.3, failures=1) as upstream:
+            forecast = api.DGMApi(url=upstream.url, retries=0)
+            errors = _concurrently(lambda: forecast.get_month(2017, 5), 20)
+            self.assertEqual(upstream.total_hits, 1)
+        self.assertTrue(all(isinstance(error, Exception) for error in errors))
+        self.assertTrue(all(error is errors[0] for error in errors))
+
+
+class LatencyBudgetTest(unittest.TestCase):
+
+    def test_budget_without_stale_data(self):
+        with FakeUpstream(latency=0.5) as upstream:
+            forecast = api.DGMApi(url=upstream.url, budget=0.1)
+            start = time.time()
+            result = forecast.search(datetime.date(2017, 5, 29))
+            self.assertLess(time.time() - start, 0.3)
+            self.assertTrue(result.has_error)
+            self.assertEqual(result.error, api.UNAVAILABLE_ERROR)
+
+    def test_stale_while_revalidate(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, ttl=0, budget=0.1)
+            self.assertFalse(forecast.search(datetime.date(2017, 5, 29)).stale)
+
+            upstream.latency = 0.3
+            result = forecast.search(datetime.date(2017, 5, 29))
+            self.assertTrue(result.stale)
+            self.assertEqual(result.flavors, ['Cotton Candy'])
+
+            # the refresh finishes in the background
+            time.sleep(0.5)
+            self.assertEqual(upstream.total_hits, 2)
+            self.assertEqual(upstream.not_modified, 1)
+
+    def test_stale_if_error(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, ttl=0, retries=0)
+            forecast.search(datetime.date(2017, 5, 29))
+            upstream.failures = 1
+            result = forecast.search(datetime.date(2017, 5, 29))
+            self.assertTrue(result.stale)
+            self.assertTrue(result.found)
+
+    def test_circuit_breaker(self):
+        with FakeUpstream(failures=10) as upstream:
+            forecast = api.DGMApi(url=upstream.url, retries=0,
+                                  breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+            for _ in range(2):
+                self.assertTrue(forecast.search(datetime.date(2017, 5, 29)).has_error)
+            result = forecast.search(datetime.date(2017, 5, 29))
+            self.assertEqual(result.error, api.UNAVAILABLE_ERROR)
+            self.assertEqual(upstream.total_hits, 2)
+
+    def test_search_error(self):
+        forecast = api.DGMApi()
+
+        def fail(year, month, dt=None):
+            raise ValueError('unparseable calendar')
+        forecast.get_month_within_budget = fail
+        result = forecast.search(datetime.date(2017, 5, 29))
+        self.assertTrue(result.has_error)
+        self.assertFalse(result.found)
+
+        def interrupt(year, month, dt=None):
+            raise KeyboardInterrupt()
+        forecast.get_month_within_budget = interrupt
+        self.assertRaises(KeyboardInterrupt, forecast.search, datetime.date(2017, 5, 29))
+
+    def test_circuit_recovers(self):
+        with FakeUpstream(failures=1) as upstream:
+            forecast = api.DGMApi(url=upstream.url, retries=0,
+                                  breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.1))
+            self.assertTrue(forecast.search(datetime.date(2017, 5, 29)).has_error)
+            time.sleep(0.2)
+            self.assertTrue(forecast.search(datetime.date(2017, 5, 29)).found)
+
+
+def _add_months(dt, months):
+    month = dt.month - 1 + months
+    return datetime.date(dt.year + month // 12, month % 12 + 1, 1)
+
+
+class NegativeCacheTest(unittest.TestCase):
+
+    def test_empty_month_cached(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, ttl=0)
+            for _ in range(2):
+                self.assertFalse(forecast.search(datetime.date(1977, 3, 25)).found)
+            self.assertEqual(upstream.total_hits, 1)
+
+            # months with events still follow the regular ttl
+            forecast.search(datetime.date(2017, 5, 29))
+            forecast.search(datetime.date(2017, 5, 29))
+            self.assertEqual(upstream.hits[(2017, 5)], 2)
+
+    def test_closed_month_cached(self):
+        following = _add_months(datetime.date.today(), 1)
+        closed = dict((following.replace(day=day).strftime('%Y-%m-%d'), ['Closed for the season'])
+                      for day in range(1, 29))
+        entry = api.MonthEntry(fetched=time.time(), days=closed, etag=None, last_modified=None,
+                               checks=0, changes=0)
+        forecast = api.DGMApi(ttl=60, closed_ttl=600)
+        self.assertEqual(forecast._freshness(following.year, following.month, entry), 600)
+
+        # a month with a closing among its flavors is not a closed month
+        days = dict(closed, **{following.replace(day=1).strftime('%Y-%m-%d'): ['Vanilla']})
+        self.assertEqual(forecast._freshness(following.year, following.month, entry._replace(days=days)), 60)
+
+        with FakeUpstream() as upstream:
+            upstream.pages[(following.year, following.month)] = (
+                u"<table><td id='calendar-{}'><h3 class='event-title summary'>"
+                u"<a href='#'>Closed</a></h3></td></table>").format(following.strftime('%Y-%m-01'))
+            forecast = api.DGMApi(url=upstream.url, ttl=0)
+            self.assertTrue(forecast.search(following.replace(day=1)).closed)
+            self.assertTrue(forecast.search(following.replace(day=1)).closed)
+            self.assertEqual(upstream.hits[(following.year, following.month)], 1)
+
+    def test_gap_does_not_hide_months(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url)
+            self.assertTrue(forecast.search(datetime.date(2017, 5, 29)).found)
+            self.assertFalse(forecast.search(datetime.date(2017, 4, 10)).found)
+            self.assertTrue(forecast.search(datetime.date(2017, 3, 27)).found)
+            self.assertEqual(upstream.hits[(2017, 3)], 1)
+
+            # the empty month alone is cached for the negative ttl
+            forecast.search(datetime.date(2017, 4, 10))
+            self.assertEqual(upstream.hits[(2017, 4)], 1)
+
+    def test_empty_month_expires(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, negative_ttl=0.2)
+            forecast.search(datetime.date(2017, 4, 10))
+            forecast.search(datetime.date(2017, 4, 10))
+            self.assertEqual(upstream.hits[(2017, 4)], 1)
+            time.sleep(0.3)
+            forecast.search(datetime.date(2017, 4, 10))
+            self.assertEqual(upstream.hits[(2017, 4)], 2)
+
+
+class AdaptiveFreshnessTest(unittest.TestCase):
+
+    def _entry(self, checks=0, changes=0):
+        return api.MonthEntry(fetched=time.time(), days={'2017-05-29': ['Cotton Candy']},
+                              etag=None, last_modified=None, checks=checks, changes=changes)
+
+    def test_freshness(self):
+        forecast = api.DGMApi(ttl=60)
+        today = datetime.date.today()
+        current = (today.year, today.month)
+        following = _add_months(today, 1)
+        far = _add_months(today, 6)
+
+        self.assertEqual(forecast._freshness(2017, 5, self._entry()), 60 * api.PAST_TTL_FACTOR)
+        self.assertEqual(forecast._freshness(current[0], current[1], self._entry(checks=10)), 60)
+        self.assertEqual(forecast._freshness(following.year, following.month, self._entry()), 60)
+        self.assertEqual(forecast._freshness(following.year, following.month, self._entry(checks=3)), 240)
+        self.assertEqual(forecast._freshness(far.year, far.month, self._entry(checks=3)), 240)
+        self.assertEqual(forecast._freshness(far.year, far.month, self._entry(checks=15)),
+                         60 * api.MAX_TTL_FACTOR)
+        # a month often found changed keeps a short interval
+        self.assertEqual(forecast._freshness(far.year, far.month, self._entry(checks=3, changes=3)), 60)
+        self.assertEqual(forecast._freshness(2017, 3, self._entry()._replace(days={})),
+                         forecast.negative_ttl)
+
+    def test_distant_months_not_kept_longer(self):
+        forecast = api.DGMApi(ttl=60)
+        today = datetime.date.today()
+        for checks, changes in [(0, 0), (3, 0), (15, 0), (7, 2), (3, 3)]:
+            entry = self._entry(checks=checks, changes=changes)
+            intervals = [forecast._freshness(month.year, month.month, entry)
+                         for month in (_add_months(today, distance) for distance in range(13))]
+            self.assertEqual(intervals[0], 60)
+            for nearer, further in zip(intervals[1:], intervals[2:]):
+                self.assertLessEqual(further, nearer)
+
+        # the observed change rate sets the interval
+        following = _add_months(today, 1)
+        intervals = [forecast._freshness(following.year, following.month, self._entry(checks=7, changes=changes))
+                     for changes in range(8)]
+        self.assertEqual(intervals, sorted(intervals, reverse=True))
+        self.assertGreater(intervals[0], intervals[-1])
+
+    def test_past_month_immutable(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, ttl=0.1)
+            forecast.search(datetime.date(2017, 5, 29))
+            time.sleep(0.2)
+            self.assertTrue(forecast.search(datetime.date(2017, 5, 29)).found)
+            self.assertEqual(upstream.total_hits, 1)
+
+    def test_change_history(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, ttl=0)
+            forecast.get_month(2017, 5)
+            forecast.get_month(2017, 5)
+            upstream.pages[(2017, 5)] = upstream.page(2017, 5).replace(u'Cotton Candy', u'Closed')
+            forecast.get_month(2017, 5)
+            entry = forecast._months[(2017, 5)]
+            self.assertEqual((entry.checks, entry.changes), (2, 1))
+            self.assertEqual(upstream.not_modified, 1)
+
+    def test_change_history_window(self):
+        checks, changes = api._record_check(self._entry(checks=api.CHANGE_HISTORY, changes=5), True)
+        self.assertEqual((checks, changes), ((api.CHANGE_HISTORY + 1) // 2, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Tests of the incremental flavor archive against the local calendar server."""
+import datetime
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import api
+import archive
+import calendar_parser
+import crawler
+from fake_upstream import EMPTY_PAGE, FakeUpstream, load_fixture
+
+START = datetime.date(2017, 3, 1)
+END = datetime.date(2017, 5, 1)
+
+
+def _forecast(upstream, **kwargs):
+    return crawler.ConcurrentDGMApi(concurrency=1, delay=0, retries=0, url=upstream.url, **kwargs)
+
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.archive = archive.Archive(os.path.join(self.tmp, 'archive.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_crawl(self):
+        with FakeUpstream() as upstream:
+            summary = self.archive.crawl(_forecast(upstream), START, END)
+        self.assertEqual(summary, archive.CrawlSummary(months=3, changed=3, unchanged=0,
+                                                       resumed=0, failed=0))
+        self.assertEqual(self.archive.get_month('dairy-godmother', 2017, 5),
+                         calendar_parser.parse_month(load_fixture(2017, 5), 2017, 5))
+
+    def test_only_changed_months_rewritten(self):
+        with FakeUpstream() as upstream:
+            self.archive.crawl(_forecast(upstream), START, END)
+            summary = self.archive.crawl(_forecast(upstream), START, END)
+            self.assertEqual((summary.changed, summary.unchanged), (0, 3))
+            self.assertEqual(upstream.not_modified, 3)
+
+            upstream.pages[(2017, 4)] = load_fixture(2017, 3).replace('2017-03', '2017-04')
+            summary = self.archive.crawl(_forecast(upstream), START, END)
+            self.assertEqual((summary.changed, summary.unchanged), (1, 2))
+        self.assertEqual(self.archive.get_month('dairy-godmother', 2017, 4)['2017-04-27'],
+                         ['Peach Cobbler'])
+
+    def test_same_content_not_reparsed(self):
+        with FakeUpstream() as upstream:
+            self.archive.crawl(_forecast(upstream), START, END)
+        # without validators the content hash detects the unchanged pages
+        self.archive._connect().execute('UPDATE archive_months SET etag = NULL')
+        with FakeUpstream() as upstream:
+            summary = self.archive.crawl(_forecast(upstream), START, END)
+            self.assertEqual(upstream.not_modified, 0)
+        self.assertEqual((summary.changed, summary.unchanged), (0, 3))
+
+    def test_resume(self):
+        with FakeUpstream(failures=1) as upstream:
+            summary = self.archive.crawl(_forecast(upstream), START, END)
+            self.assertEqual(summary.failed, 1)
+
+            summary = self.archive.crawl(_forecast(upstream), START, END)
+            self.assertEqual((summary.resumed, summary.changed, summary.failed), (2, 1, 0))
+            self.assertEqual(upstream.hits[(2017, 3)], 2)
+            self.assertEqual(upstream.hits[(2017, 5)], 1)
+
+    def test_past_months_from_archive(self):
+        with FakeUpstream() as upstream:
+            self.archive.crawl(_forecast(upstream), START, END)
+            forecast = api.DGMApi(url=upstream.url, archive=self.archive)
+            result = forecast.search(datetime.date(2017, 5, 29))
+            self.assertEqual(result.flavors, ['Cotton Candy'])
+            self.assertEqual(upstream.total_hits, 3)
+
+    def test_export(self):
+        with FakeUpstream() as upstream:
+            upstream.pages[(2017, 4)] = EMPTY_PAGE
+            self.archive.crawl(_forecast(upstream), START, END)
+        f = io.BytesIO()
+        count = self.archive.export(f)
+        rows = f.getvalue().splitlines()
+        self.assertEqual(rows[0], 'calendar,date,flavor')
+        self.assertEqual(len(rows), count + 1)
+        self.assertIn('dairy-godmother,2017-05-29,Cotton Candy', rows)
+        self.assertFalse(any('Closed' in row for row in rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""Tests of the persistent SQLite forecast cache."""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import cache
+
+
+class SQLiteCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _keys(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return sorted(row[0] for row in conn.execute('SELECT key FROM forecast_cache'))
+        finally:
+            conn.close()
+
+    def test_round_trip(self):
+        forecast_cache = cache.SQLiteCache(self.path)
+        forecast_cache.set('month:dgm:2017-05', {'days': {'2017-05-29': ['Cotton Candy']}}, 1, 60)
+        self.assertEqual(forecast_cache.get('month:dgm:2017-05', 1),
+                         {'days': {'2017-05-29': ['Cotton Candy']}})
+
+        # a new connection reads what another invocation wrote
+        self.assertEqual(cache.SQLiteCache(self.path).get('month:dgm:2017-05', 1)['days'],
+                         {'2017-05-29': ['Cotton Candy']})
+
+        forecast_cache.delete('month:dgm:2017-05')
+        self.assertIsNone(forecast_cache.get('month:dgm:2017-05', 1))
+
+    def test_expiry(self):
+        forecast_cache = cache.SQLiteCache(self.path)
+        forecast_cache.set('short', 1, 1, 0.1)
+        forecast_cache.set('long', 2, 1, 60)
+        time.sleep(0.2)
+        self.assertIsNone(forecast_cache.get('short', 1))
+        self.assertEqual(forecast_cache.get('long', 1), 2)
+
+    def test_version_mismatch(self):
+        forecast_cache = cache.SQLiteCache(self.path)
+        forecast_cache.set('month', 1, 1, 60)
+        self.assertIsNone(forecast_cache.get('month', 2))
+        self.assertEqual(forecast_cache.get('month', 1), 1)
+
+    def test_purge(self):
+        forecast_cache = cache.SQLiteCache(self.path)
+        forecast_cache.set('expired', 1, 1, 0.1)
+        forecast_cache.set('old', 1, 1, 60)
+        forecast_cache.set('current', 1, 2, 60)
+        time.sleep(0.2)
+
+        forecast_cache.purge()
+        self.assertEqual(self._keys(), ['current', 'old'])
+        forecast_cache.purge(2)
+        self.assertEqual(self._keys(), ['current'])
+
+    def test_purged_on_open(self):
+        forecast_cache = cache.SQLiteCache(self.path)
+        forecast_cache.set('expired', 1, 1, 0.1)
+        forecast_cache.set('current', 1, 1, 60)
+        time.sleep(0.2)
+
+        cache.SQLiteCache(self.path).get('current', 1)
+        self.assertEqual(self._keys(), ['current'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Parity tests of the calendar parser against the saved calendar pages."""
+import calendar
+import datetime
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bs4 import BeautifulSoup
+
+import calendar_parser
+from fake_upstream import load_fixture
+
+
+def reference_search(html, dt):
+    """The original full document lookup of a single day in `DGMApi.search`."""
+    soup = BeautifulSoup(html, 'html.parser')
+    results = soup.find_all('td', attrs={'id': 'calendar-' + dt.strftime('%Y-%m-%d')})
+    if len(results) != 1:
+        return None if results else []
+    summary = results[0].find('h3', attrs={'class': 'event-title summary'})
+    if summary is None:
+        return []
+    flavors = [(a.text.split('-')[0].split('(')[0]).strip() for a in summary.find_all('a')]
+    return [x.encode('UTF8') for x in flavors]
+
+
+class ParseMonthTest(unittest.TestCase):
+
+    def assert_parity(self, year, month):
+        html = load_fixture(year, month)
+        days = calendar_parser.parse_month(html, year, month)
+        for day in range(1, calendar.monthrange(year, month)[1] + 1):
+            dt = datetime.date(year, month, day)
+            self.assertEqual(days.get(dt.isoformat(), []), reference_search(html, dt), dt)
+
+    def test_parity(self):
+        for year, month in [(2017, 3), (2017, 5)]:
+            self.assert_parity(year, month)
+
+    def test_edge_dates(self):
+        march = calendar_parser.parse_month(load_fixture(2017, 3), 2017, 3)
+        may = calendar_parser.parse_month(load_fixture(2017, 5), 2017, 5)
+        self.assertEqual(may['2017-05-29'], ['Cotton Candy'])
+        self.assertEqual(may['2017-05-02'], ['Closed Tuesdays'])
+        self.assertEqual(may['2017-05-30'], ['Closed'])
+        self.assertEqual(march['2017-03-27'], ['Peach Cobbler'])
+        self.assertEqual(march['2017-03-25'], ['Banana Pudding', 'Banana Pudding'])
+        self.assertNotIn('2017-04-01', march)
+
+    def test_markup_variations(self):
+        html = ('<TD class="mon" id="calendar-2017-05-01"><h3 class="event-title summary">'
+                '<a href="#">Rocky Road &amp; Friends (new)</a></h3></TD>'
+                '<td id="calendar-2017-05-02"><h3 class="event-title">'
+                '<a>Not A Summary</a></h3></td></table>'
+                '<h3 class="event-title summary"><a>Outside</a></h3>')
+        self.assertEqual(calendar_parser.parse_month(html, 2017, 5),
+                         {'2017-05-01': ['Rocky Road & Friends'], '2017-05-02': []})
+
+    def test_duplicate_cells(self):
+        html = ("<td id='calendar-2017-05-01'></td>"
+                "<td id='calendar-2017-05-01'></td>")
+        self.assertEqual(calendar_parser.parse_month(html, 2017, 5), {'2017-05-01': None})
+
+    def test_stream_parity(self):
+        for year, month in [(2017, 3), (2017, 5)]:
+            html = load_fixture(year, month)
+            days = calendar_parser.parse_month(html, year, month)
+            for size in (1, 17, 8192, len(html)):
+                chunks = (html[i:i + size] for i in range(0, len(html), size))
+                self.assertEqual(calendar_parser.parse_month_stream(chunks, year, month), days, size)
+
+    def test_stream_markup_variations(self):
+        html = ('<p>x < y</p><TD class="mon" id="calendar-2017-05-01">a</TD>'
+                "<td id='calendar-2017-05-01'></td><td id=\"calendar-2017-05-02\">b</table>c")
+        for size in (1, 5, len(html)):
+            chunks = [html[i:i + size] for i in range(0, len(html), size)]
+            self.assertEqual(list(calendar_parser.iter_cells_stream(chunks)),
+                             list(calendar_parser.iter_cells(html)))
+        self.assertEqual(list(calendar_parser.iter_cells_stream([])), [])
+
+    def test_stream_stops_at_table_end(self):
+        read = []
+
+        def chunks():
+            for chunk in ["<td id='calendar-2017-05-01'>a</td></ta", "ble><p>footer</p>",
+                          "<td id='calendar-2017-05-02'>b</td>"]:
+                read.append(chunk)
+                yield chunk
+        self.assertEqual(list(calendar_parser.iter_cells_stream(chunks())), [('2017-05-01', 'a</td>')])
+        self.assertEqual(len(read), 2)
+        html = "<td id='calendar-2017-05-01'>a</td></table><td id='calendar-2017-05-02'>b</td>"
+        self.assertEqual(list(calendar_parser.iter_cells(html)), [('2017-05-01', 'a</td>')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+"""Tests of the store calendar registry and the per calendar forecasts."""
+import datetime
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import api
+import cache
+import calendars
+import skill
+import store_hours
+from alexa import build_request
+from fake_upstream import FakeUpstream
+
+# A second store open every day from 11 AM to 8 PM
+CLARENDON = {'key': 'clarendon',
+             'title': 'The Clarendon Creamery',
+             'url': 'http://example.com/clarendon/',
+             'cid': 'mc-clarendon',
+             'timezone': 'America/New_York',
+             'hours': dict((str(day), [[11, 0], [20, 0]]) for day in range(1, 8)),
+             'aliases': ['courthouse'],
+             'address': '3100 Clarendon Blvd., Arlington, VA 22201'}
+
+# A store in Chicago that does not open on Mondays, with no known address
+WICKER_PARK = {'key': 'wicker-park',
+               'title': 'The Wicker Park Scoop',
+               'url': 'http://example.com/wicker-park/',
+               'cid': 'mc-wicker-park',
+               'timezone': 'America/Chicago',
+               'hours': dict((str(day), [[13, 0], [21, 30]]) for day in range(2, 8))}
+
+
+def _registry_file(directory, *configs):
+    path = os.path.join(directory, 'calendars.json')
+    with open(path, 'w') as f:
+        json.dump({'calendars': list(configs)}, f)
+    return path
+
+
+class CalendarRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'calendars.json')
+        with open(self.path, 'w') as f:
+            json.dump({'calendars': [CLARENDON], 'default': 'clarendon'}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_default_registry(self):
+        registry = calendars.load_registry()
+        self.assertIs(registry.get(), calendars.DEFAULT_CALENDAR)
+        self.assertIs(registry.get('the Dairy Godmother'), calendars.DEFAULT_CALENDAR)
+        self.assertIs(registry.get('Del Ray'), calendars.DEFAULT_CALENDAR)
+        self.assertIsNone(registry.get('Clarendon'))
+
+    def test_load_registry(self):
+        registry = calendars.load_registry(self.path)
+        calendar = registry.get()
+        self.assertEqual(calendar.key, 'clarendon')
+        self.assertIs(registry.get('Courthouse'), calendar)
+        self.assertEqual(calendar.hours[1], ((11, 0), (20, 0)))
+
+    def test_snapshot_path(self):
+        calendar = calendars.load_registry(self.path).get()
+        self.assertEqual(calendars.snapshot_path('/tmp/snapshot.json', calendar),
+                         '/tmp/snapshot-clarendon.json')
+        self.assertEqual(calendars.snapshot_path('/tmp/snapshot.json', calendars.DEFAULT_CALENDAR),
+                         '/tmp/snapshot.json')
+
+    def test_hours_per_calendar(self):
+        calendar = calendars.load_registry(self.path).get()
+        forecast = api.DGMApi(calendar=calendar)
+        self.assertEqual(forecast.operating_hours(datetime.date(2017, 5, 1)).open_str, '11 AM')
+        self.assertEqual(api.DGMApi().operating_hours(datetime.date(2017, 5, 1)).open_str, '12 PM')
+
+    def test_invalid_hours_rejected(self):
+        for hours in ({}, {'8': [[11, 0], [20, 0]]}, {'1': [[20, 0], [11, 0]]},
+                      {'1': [[11, 0], [20, 75]]}, {'1': [11, 20]}):
+            config = dict(CLARENDON, hours=hours)
+            self.assertRaises(ValueError, calendars.load_registry, _registry_file(self.tmp, config))
+        config = dict(CLARENDON)
+        del config['hours']
+        self.assertRaises(ValueError, calendars.load_registry, _registry_file(self.tmp, config))
+        self.assertRaises(ValueError, store_hours.StoreHours, {})
+
+    def test_closed_weekday(self):
+        calendar = calendars.load_registry(_registry_file(self.tmp, WICKER_PARK)).get()
+        forecast = api.DGMApi(calendar=calendar)
+        hours = forecast.operating_hours(datetime.date(2017, 5, 1))
+        self.assertIsNone(hours.open_str)
+        self.assertIsNone(hours.close_str)
+        self.assertEqual(forecast.operating_hours(datetime.date(2017, 5, 2)).close_str, '9:30 PM')
+        self.assertFalse(forecast.get_status_on_date(datetime.datetime(2017, 5, 1, 20, 0)).is_open)
+
+    def test_weekly_schedule(self):
+        self.assertEqual(store_hours.weekly_schedule(store_hours.WEEKLY_HOURS),
+                         ([('12 PM', '9 PM', ['Monday', 'Tuesday']),
+                           ('12 PM', '10 PM', ['Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])],
+                          []))
+        calendar = calendars.load_registry(_registry_file(self.tmp, WICKER_PARK)).get()
+        groups, closed = store_hours.weekly_schedule(calendar.hours)
+        self.assertEqual(closed, ['Monday'])
+
+    def test_spoken_timezone(self):
+        hours = store_hours.StoreHours()
+        self.assertEqual(hours.spoken_timezone(datetime.date(2017, 5, 1)), 'Eastern Daylight Time')
+        self.assertEqual(hours.spoken_timezone(datetime.date(2017, 1, 2)), 'Eastern Standard Time')
+        self.assertEqual(store_hours.StoreHours(timezone='America/Chicago').spoken_timezone(
+            datetime.date(2017, 5, 1)), 'Central Daylight Time')
+        self.assertEqual(store_hours.StoreHours(timezone='Europe/Paris').spoken_timezone(
+            datetime.date(2017, 5, 1)), 'CEST')
+
+    def test_cache_sharded_per_calendar(self):
+        shared = cache.SQLiteCache(os.path.join(self.tmp, 'cache.db'))
+        calendar = calendars.load_registry(self.path).get()
+        with FakeUpstream() as upstream:
+            default = api.DGMApi(url=upstream.url, cache=shared)
+            other = api.DGMApi(url=upstream.url, cache=shared, calendar=calendar)
+            default.get_month(2017, 5)
+            other.get_month(2017, 5)
+            self.assertEqual(upstream.total_hits, 2)
+        self.assertIsNotNone(shared.get(api._month_key(2017, 5, calendar.key), api.PARSER_VERSION))
+        self.assertIsNotNone(shared.get(api._month_key(2017, 5), api.PARSER_VERSION))
+
+
+class SkillCalendarTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.upstream = FakeUpstream().start()
+        cls.level = logging.getLogger('flask_ask').level
+        logging.getLogger('flask_ask').setLevel(logging.WARNING)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.upstream.stop()
+        logging.getLogger('flask_ask').setLevel(cls.level)
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        registry = calendars.load_registry(_registry_file(self.tmp, CLARENDON, WICKER_PARK))
+        self._calendars, skill._calendars = skill._calendars, registry
+        self._forecasts = dict(skill._forecasts)
+        skill._forecasts.clear()
+        for calendar in registry:
+            skill._forecasts[calendar.key] = api.DGMApi(url=self.upstream.url, calendar=calendar)
+        self._verify = skill.app.config.get('ASK_VERIFY_REQUESTS', True)
+        skill.app.config['ASK_VERIFY_REQUESTS'] = False
+        self.client = skill.app.test_client()
+
+    def tearDown(self):
+        skill._calendars = self._calendars
+        skill._forecasts.clear()
+        skill._forecasts.update(self._forecasts)
+        skill.app.config['ASK_VERIFY_REQUESTS'] = self._verify
+        shutil.rmtree(self.tmp)
+
+    def _speak(self, intent, **slots):
+        response = self.client.post('/', data=json.dumps(build_request(intent, slots)),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)['response']['outputSpeech']['text']
+
+    def test_open_date_closed_weekday(self):
+        self.assertEqual(self._speak('GetOpenDateIntent', date='2017-05-01', location='wicker park'),
+                         'The Wicker Park Scoop is closed on 2017-05-01.')
+
+    def test_open_date_timezone(self):
+        self.assertEqual(self._speak('GetOpenDateIntent', date='2017-05-03', location='wicker park'),
+                         'The Wicker Park Scoop is open 2017-05-03 from 1 PM to 9:30 PM '
+                         'Central Daylight Time.')
+        self.assertIn('Eastern Daylight Time', self._speak('GetOpenDateIntent', date='2017-05-01'))
+
+    def test_hours(self):
+        self.assertEqual(self._speak('GetHoursIntent', location='courthouse'),
+                         'The Clarendon Creamery is open from 11 AM to 8 PM Monday, Tuesday, '
+                         'Wednesday, Thursday, Friday, Saturday, and Sunday unless otherwise '
+                         'specified on our flavor forecast calendar.')
+        self.assertEqual(self._speak('GetHoursIntent', location='wicker park'),
+                         'The Wicker Park Scoop is open from 1 PM to 9:30 PM Tuesday, Wednesday, '
+                         'Thursday, Friday, Saturday, and Sunday, and closed Monday unless otherwise '
+                         'specified on our flavor forecast calendar.')
+
+    def test_location(self):
+        self.assertEqual(self._speak('GetLocationIntent'),
+                         'The Clarendon Creamery is located at 3100 Clarendon Blvd., Arlington, VA 22201.')
+        self.assertEqual(self._speak('GetLocationIntent', location='wicker park'),
+                         'Sorry, I do not know the address of The Wicker Park Scoop.')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Tests of the cached signing certificate verification with local certificates."""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from flask_ask import verifier
+from flask_ask.verifier import VerificationError
+
+import cache
+import certificates
+from local_certs import CERT_URL, LocalChain
+
+CHAIN = LocalChain()
+
+
+class CertificateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fetches = []
+
+    def _cache(self, chain=CHAIN, roots=None, **kwargs):
+        def fetch(url):
+            self.fetches.append(url)
+            return chain.pem
+        return certificates.CertificateCache(roots=roots or [CHAIN.root], fetch=fetch, **kwargs)
+
+    def test_fetched_and_validated_once(self):
+        certs = self._cache()
+        cert = certs.load_certificate(CERT_URL)
+        self.assertIs(certs.load_certificate(CERT_URL), cert)
+        self.assertEqual(self.fetches, [CERT_URL])
+        verifier.verify_signature(cert, CHAIN.sign(b'{}'), b'{}')
+
+    def test_expiry(self):
+        certs = self._cache(ttl=0.05)
+        certs.load_certificate(CERT_URL)
+        time.sleep(0.1)
+        certs.load_certificate(CERT_URL)
+        self.assertEqual(len(self.fetches), 2)
+
+    def test_persistent_cache(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            shared = cache.SQLiteCache(os.path.join(tmp, 'cache.db'))
+            self._cache(cache=shared).load_certificate(CERT_URL)
+            self._cache(cache=shared).load_certificate(CERT_URL)
+            self.assertEqual(len(self.fetches), 1)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_cache_opened_on_first_download(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            opened = []
+
+            def open_cache():
+                opened.append(True)
+                return cache.SQLiteCache(os.path.join(tmp, 'cache.db'))
+
+            certs = self._cache(cache=open_cache)
+            self.assertEqual(opened, [])
+            certs.load_certificate(CERT_URL)
+            self._cache(cache=certs.cache).load_certificate(CERT_URL)
+            self.assertEqual(opened, [True])
+            self.assertEqual(len(self.fetches), 1)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_untrusted_root(self):
+        certs = self._cache(roots=[LocalChain().root])
+        self.assertRaises(VerificationError, certs.load_certificate, CERT_URL)
+
+    def test_wrong_host(self):
+        certs = self._cache(chain=LocalChain(host=u'example.com'))
+        self.assertRaises(VerificationError, certs.load_certificate, CERT_URL)
+
+    def test_url_checked(self):
+        certs = self._cache()
+        self.assertRaises(VerificationError, certs.load_certificate,
+                          'https://example.com/echo.api/echo-api-cert.pem')
+        self.assertEqual(self.fetches, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+"""Tests of the memory mapped compact forecast index."""
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import api
+import cache
+import calendar_parser
+import compact_index
+from fake_upstream import FakeUpstream, load_fixture
+
+MONTHS = dict(((year, month), calendar_parser.parse_month(load_fixture(year, month), year, month))
+              for year, month in [(2017, 3), (2017, 5)])
+
+
+class CompactIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'forecast.idx')
+        compact_index.write_index(MONTHS, self.path, api.PARSER_VERSION)
+        self.index = compact_index.CompactIndex(self.path, api.PARSER_VERSION)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_months_round_trip(self):
+        for (year, month), days in MONTHS.items():
+            self.assertEqual(self.index.get_month(year, month), days)
+
+    def test_gaps_are_not_indexed(self):
+        self.assertIsNone(self.index.get_month(2017, 4))
+        self.assertIsNone(self.index.get_month(2017, 2))
+        self.assertIsNone(self.index.get_month(2017, 6))
+        self.assertRaises(KeyError, self.index.get_day, datetime.date(2017, 4, 10))
+
+    def test_get_day(self):
+        self.assertEqual(self.index.get_day(datetime.date(2017, 5, 29)), ['Cotton Candy'])
+        days = MONTHS[(2017, 3)]
+        self.assertEqual(self.index.get_day(datetime.date(2017, 3, 25)), days['2017-03-25'])
+
+    def test_error_days(self):
+        compact_index.write_index({(2017, 5): {'2017-05-01': None}}, self.path)
+        index = compact_index.CompactIndex(self.path)
+        self.assertIsNone(index.get_day(datetime.date(2017, 5, 1)))
+        self.assertRaises(KeyError, index.get_day, datetime.date(2017, 5, 2))
+        self.assertEqual(index.get_month(2017, 5), {'2017-05-01': None})
+
+    def test_get_date(self):
+        self.assertEqual(self.index.get_date(datetime.date(2017, 5, 29)), {'2017-05-29': ['Cotton Candy']})
+        self.assertIsNone(self.index.get_date(datetime.date(2017, 4, 10)))
+        compact_index.write_index({(2017, 5): {'2017-05-01': None}}, self.path)
+        index = compact_index.CompactIndex(self.path)
+        self.assertEqual(index.get_date(datetime.date(2017, 5, 1)), {'2017-05-01': None})
+        self.assertEqual(index.get_date(datetime.date(2017, 5, 2)), {})
+
+    def test_built(self):
+        compact_index.write_index(MONTHS, self.path, api.PARSER_VERSION, 1500000000.5)
+        self.assertEqual(self.index.built(), 1500000000.5)
+        self.assertIsNone(compact_index.CompactIndex(os.path.join(self.tmp, 'missing')).built())
+
+    def test_interned_strings(self):
+        flavors = {'2017-05-{:02d}'.format(day): ['Vanilla'] for day in range(1, 32)}
+        data = compact_index.build_index({(2017, 5): flavors})
+        self.assertEqual(data.count(b'Vanilla'), 1)
+
+    def test_republished_index_is_remapped(self):
+        self.assertIsNotNone(self.index.get_month(2017, 5))
+        compact_index.write_index({(2017, 4): {}}, self.path, api.PARSER_VERSION)
+        os.utime(self.path, (time.time() + 5, time.time() + 5))
+        self.assertIsNone(self.index.get_month(2017, 5))
+        self.assertEqual(self.index.get_month(2017, 4), {})
+
+    def test_unusable_index(self):
+        self.assertIsNone(compact_index.CompactIndex(self.path, api.PARSER_VERSION + 1).get_month(2017, 5))
+        self.assertIsNone(compact_index.CompactIndex(os.path.join(self.tmp, 'missing')).get_month(2017, 5))
+        with open(self.path, 'wb') as f:
+            f.write(b'not an index')
+        self.assertIsNone(compact_index.CompactIndex(self.path).get_month(2017, 5))
+
+    def test_search_without_scraping(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, compact_index=self.index)
+            result = forecast.search(datetime.date(2017, 5, 29))
+            self.assertEqual(result.flavors, ['Cotton Candy'])
+            self.assertTrue(forecast.search(datetime.date(2017, 5, 2)).closed)
+            self.assertEqual(upstream.total_hits, 0)
+
+    def test_search_reads_single_day(self):
+        def get_month(year, month):
+            raise AssertionError('the whole month was read')
+        self.index.get_month = get_month
+        forecast = api.DGMApi(url='http://localhost:1/', compact_index=self.index)
+        self.assertEqual(forecast.search(datetime.date(2017, 5, 29)).flavors, ['Cotton Candy'])
+
+    def test_fresh_caches_preferred(self):
+        compact_index.write_index({(2017, 5): {'2017-05-29': ['Stale Vanilla']}}, self.path,
+                                  api.PARSER_VERSION)
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url, cache=cache.SQLiteCache(os.path.join(self.tmp, 'cache.db')),
+                                  compact_index=self.index)
+            self.assertEqual(forecast.get_month(2017, 5), {'2017-05-29': ['Stale Vanilla']})
+
+            # a month scraped meanwhile is served from memory and the persistent cache
+            forecast._months.clear()
+            forecast._refresh_month(2017, 5, None)
+            self.assertEqual(forecast.search(datetime.date(2017, 5, 29)).flavors, ['Cotton Candy'])
+            forecast._months.clear()
+            self.assertEqual(forecast.search(datetime.date(2017, 5, 29)).flavors, ['Cotton Candy'])
+            self.assertEqual(upstream.total_hits, 1)
+
+    def _current_month(self, upstream, days, built):
+        today = datetime.date.today()
+        compact_index.write_index({(today.year, today.month): days}, self.path, api.PARSER_VERSION, built)
+        upstream.pages[(today.year, today.month)] = upstream.page(2017, 5).replace(
+            u'2017-05-', today.strftime(u'%Y-%m-'))
+        return today
+
+    def test_index_month_expires(self):
+        with FakeUpstream() as upstream:
+            today = datetime.date.today()
+            today = self._current_month(upstream, {today.strftime('%Y-%m-%d'): ['Old Flavor']},
+                                        time.time() - 10 * 60 * 60)
+            forecast = api.DGMApi(url=upstream.url, compact_index=self.index)
+            self.assertNotEqual(forecast.search(today).flavors, ['Old Flavor'])
+            self.assertEqual(upstream.total_hits, 1)
+
+            # past months of the same index stay fresh far longer
+            compact_index.write_index(MONTHS, self.path, api.PARSER_VERSION, time.time() - 10 * 60 * 60)
+            os.utime(self.path, (time.time() + 5, time.time() + 5))
+            self.assertEqual(forecast.search(datetime.date(2017, 3, 27)).flavors,
+                             [MONTHS[(2017, 3)]['2017-03-27'][0]])
+            self.assertEqual(upstream.total_hits, 1)
+
+    def test_index_older_than_expired_entry(self):
+        with FakeUpstream() as upstream:
+            # an empty month of the index is fresh for the negative ttl, longer
+            # than the expired entry with events scraped after it
+            today = self._current_month(upstream, {}, time.time() - 3 * 60 * 60)
+            forecast = api.DGMApi(url=upstream.url, compact_index=self.index)
+            forecast._months[(today.year, today.month)] = api.MonthEntry(
+                fetched=time.time() - 2 * 60 * 60, days={today.strftime('%Y-%m-%d'): ['New Flavor']},
+                etag=None, last_modified=None, checks=0, changes=0)
+            forecast.search(today)
+            self.assertEqual(upstream.total_hits, 1)
+
+            # without the newer entry the index month is still served
+            forecast = api.DGMApi(url=upstream.url, compact_index=self.index)
+            self.assertFalse(forecast.search(today).found)
+            self.assertEqual(upstream.total_hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
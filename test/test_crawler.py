@@ -0,0 +1,72 @@
+"""Tests of the concurrent crawler against a slow local calendar server."""
+import datetime
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import crawler
+import warmer
+from fake_upstream import FakeUpstream
+
+# Number of seconds the local calendar takes to answer
+LATENCY = 0.2
+
+# Number of months crawled
+MONTHS = 8
+
+
+def _crawl(upstream, concurrency, delay=0):
+    forecast = crawler.ConcurrentDGMApi(concurrency=concurrency, delay=delay, url=upstream.url)
+    start = time.time()
+    months = forecast.crawl(datetime.date(2017, 1, 1), MONTHS)
+    return months, time.time() - start
+
+
+class ConcurrentDGMApiTest(unittest.TestCase):
+
+    def test_wall_time_scales_with_concurrency(self):
+        with FakeUpstream(latency=LATENCY) as upstream:
+            serial, serial_time = _crawl(upstream, concurrency=1)
+            concurrent, concurrent_time = _crawl(upstream, concurrency=MONTHS)
+
+        self.assertEqual(serial, concurrent)
+        self.assertGreaterEqual(serial_time, MONTHS * LATENCY)
+        self.assertLess(concurrent_time, 3 * LATENCY)
+
+    def test_months_parsed_in_order(self):
+        with FakeUpstream() as upstream:
+            months, _ = _crawl(upstream, concurrency=4)
+        self.assertEqual([(m.year, m.month) for m in months],
+                         [(2017, m) for m in range(1, MONTHS + 1)])
+        self.assertTrue(all(m.error is None for m in months))
+        self.assertEqual(months[4].days['2017-05-29'], ['Cotton Candy'])
+
+    def test_politeness_delay(self):
+        with FakeUpstream() as upstream:
+            _, elapsed = _crawl(upstream, concurrency=MONTHS, delay=0.05)
+        self.assertGreaterEqual(elapsed, (MONTHS - 1) * 0.05)
+
+    def test_failed_month(self):
+        with FakeUpstream(failures=1) as upstream:
+            forecast = crawler.ConcurrentDGMApi(concurrency=2, delay=0, retries=0, url=upstream.url)
+            months = forecast.crawl(datetime.date(2017, 3, 1), 2)
+        self.assertEqual(len([m for m in months if m.error is not None]), 1)
+
+    def test_snapshot(self):
+        with FakeUpstream() as upstream:
+            forecast = crawler.ConcurrentDGMApi(delay=0, url=upstream.url)
+            snapshot = warmer.build_snapshot(forecast, datetime.date(2017, 3, 1), 2)
+        self.assertEqual(sorted(snapshot['months']), ['2017-03', '2017-04', '2017-05'])
+
+    def test_snapshot_skips_failed_month(self):
+        with FakeUpstream(failures=1) as upstream:
+            forecast = crawler.ConcurrentDGMApi(concurrency=1, delay=0, retries=0, url=upstream.url)
+            snapshot = warmer.build_snapshot(forecast, datetime.date(2017, 3, 1), 2)
+        self.assertEqual(sorted(snapshot['months']), ['2017-04', '2017-05'])
+
+
+if __name__ == '__main__':
+    unittest.main()
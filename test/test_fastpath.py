@@ -0,0 +1,150 @@
+"""Tests the fast path answers the hot intents exactly like the Flask request cycle."""
+import datetime
+import json
+import logging
+import os
+import sys
+import unittest
+
+import pytz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from flask_ask import verifier
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse
+
+import api
+import certificates
+import fastpath
+import skill
+import time_util
+from alexa import build_request
+from fake_upstream import FakeUpstream
+from local_certs import CERT_URL, LocalChain
+
+# Fixed time of the open and closed status, a Monday afternoon in Richmond
+NOW = datetime.datetime(2017, 5, 29, 18, 30, tzinfo=pytz.utc)
+
+
+class FastPathTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.upstream = FakeUpstream().start()
+        cls.chain = LocalChain()
+        cls.level = logging.getLogger('flask_ask').level
+        logging.getLogger('flask_ask').setLevel(logging.WARNING)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.upstream.stop()
+        logging.getLogger('flask_ask').setLevel(cls.level)
+
+    def setUp(self):
+        calendar = skill.get_calendars().default
+        self._forecasts = dict(skill._forecasts)
+        skill._forecasts[calendar.key] = api.DGMApi(url=self.upstream.url, calendar=calendar)
+
+        self._now = time_util.now
+        time_util.now = lambda: NOW
+        self._load_certificate = verifier.load_certificate
+        certs = certificates.CertificateCache(roots=[self.chain.root], fetch=lambda url: self.chain.pem)
+        certs.install()
+        self._verify = skill.app.config.get('ASK_VERIFY_REQUESTS', True)
+        skill.app.config['ASK_VERIFY_REQUESTS'] = False
+
+        self.flask = Client(skill.app.wsgi_app, BaseResponse)
+        self.fast = Client(fastpath.FastPath(skill.app, skill.app.wsgi_app), BaseResponse)
+
+    def tearDown(self):
+        skill._forecasts.clear()
+        skill._forecasts.update(self._forecasts)
+        time_util.now = self._now
+        verifier.load_certificate = self._load_certificate
+        skill.app.config['ASK_VERIFY_REQUESTS'] = self._verify
+
+    def _post(self, client, body, headers=None):
+        return client.post('/', data=body, content_type='application/json', headers=headers or {})
+
+    def assertSameResponse(self, body, headers=None):
+        expected = self._post(self.flask, body, headers)
+        actual = self._post(self.fast, body, headers)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.headers.get('Content-Type'), expected.headers.get('Content-Type'))
+        self.assertEqual(actual.data, expected.data)
+        return actual
+
+    def test_identical_responses(self):
+        for intent in sorted(fastpath.FAST_INTENTS):
+            body = json.dumps(build_request(intent))
+            self.assertIsNotNone(fastpath.dispatch(skill.app, body, {}))
+            self.assertSameResponse(body)
+
+    def test_identical_with_location(self):
+        body = json.dumps(build_request('GetOpenIntent', {'location': 'nowhere'}))
+        self.assertSameResponse(body)
+
+    def test_other_intents_fall_through(self):
+        body = json.dumps(build_request('GetLocationIntent'))
+        self.assertIsNone(fastpath.dispatch(skill.app, body, {}))
+        self.assertSameResponse(body)
+
+        request = build_request('GetHoursIntent')
+        request['session']['attributes'] = {'previous': 'GetSearchIntent'}
+        self.assertIsNone(fastpath.dispatch(skill.app, json.dumps(request), {}))
+
+    def _replace_view(self, name, view):
+        views = skill.ask._intent_view_funcs
+        original = views[name]
+        views[name] = view
+        self.addCleanup(views.__setitem__, name, original)
+
+    def test_failing_view_runs_once(self):
+        calls = []
+
+        def failing():
+            calls.append('view')
+            raise ValueError('broken view')
+        self._replace_view('GetHoursIntent', failing)
+        started = skill.ask._on_session_started_callback
+        skill.ask._on_session_started_callback = lambda: calls.append('session')
+        skill.app.logger.disabled = True
+        try:
+            response = self._post(self.fast, json.dumps(build_request('GetHoursIntent')))
+        finally:
+            skill.app.logger.disabled = False
+            skill.ask._on_session_started_callback = started
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(calls, ['session', 'view'])
+
+    def test_other_results_not_rerun(self):
+        calls = []
+
+        def text():
+            calls.append('view')
+            return u'{}'
+        self._replace_view('GetHoursIntent', text)
+        response = self._post(self.fast, json.dumps(build_request('GetHoursIntent')))
+        self.assertEqual((response.status_code, response.data), (200, b'{}'))
+        self.assertEqual(calls, ['view'])
+
+    def test_signed_requests(self):
+        skill.app.config['ASK_VERIFY_REQUESTS'] = True
+        body = json.dumps(build_request('GetHoursIntent'))
+        headers = {'Signaturecertchainurl': CERT_URL, 'Signature': self.chain.sign(body)}
+        self.assertEqual(self.assertSameResponse(body, headers).status_code, 200)
+        self.assertIsNotNone(fastpath.dispatch(skill.app, body, headers))
+
+        # a bad signature is rejected by flask-ask on the fall through
+        headers['Signature'] = LocalChain().sign(body)
+        self.assertRaises(verifier.VerificationError, fastpath.dispatch, skill.app, body, headers)
+        skill.app.logger.disabled = True
+        try:
+            self.assertNotEqual(self._post(self.fast, body, headers).status_code, 200)
+        finally:
+            skill.app.logger.disabled = False
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Tests of the inverted flavor index against the saved calendar pages."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import calendar_parser
+import flavor_index
+from fake_upstream import load_fixture
+
+
+def _index(*months):
+    index = flavor_index.FlavorIndex()
+    for year, month in months:
+        index.add_month(year, month, calendar_parser.parse_month(load_fixture(year, month), year, month))
+    return index
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_conjunctions(self):
+        self.assertEqual(flavor_index.normalize("Cookies 'n Cream"), 'cookies and cream')
+        self.assertEqual(flavor_index.normalize('cookies n cream'), 'cookies and cream')
+        self.assertEqual(flavor_index.normalize('Cookies & Cream'), 'cookies and cream')
+
+    def test_accents(self):
+        self.assertEqual(flavor_index.normalize(u'Cr\xe8me Br\xfbl\xe9e'.encode('UTF8')), 'creme brulee')
+
+
+class FlavorIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = _index((2017, 3), (2017, 5))
+
+    def test_sorted_dates_across_months(self):
+        self.assertEqual(self.index.index['black raspberry'], ['2017-03-18', '2017-05-04'])
+
+    def test_skips_closed_days(self):
+        self.assertIsNone(self.index.match('closed'))
+        self.assertIsNone(self.index.match('closed tuesdays'))
+
+    def test_match(self):
+        self.assertEqual(self.index.match('Peach Cobbler'), 'peach cobbler')
+        self.assertEqual(self.index.match('mint chip'), 'mint chocolate chip')
+        self.assertEqual(self.index.match('banana'), 'banana pudding')
+        self.assertEqual(self.index.match('salted carmel'), 'salted caramel')
+        self.assertIsNone(self.index.match('pizza'))
+
+    def test_next_date(self):
+        self.assertEqual(self.index.next_date('key lime', '2017-03-16'), ('key lime pie', '2017-03-24'))
+        self.assertEqual(self.index.next_date('key lime', '2017-03-24'), ('key lime pie', '2017-03-24'))
+        self.assertEqual(self.index.next_date('cotton candy', '2017-05-30'), ('cotton candy', None))
+
+    def test_replace_month(self):
+        self.index.add_month(2017, 3, {'2017-03-01': ['Pistachio']})
+        self.assertEqual(self.index.index['black raspberry'], ['2017-05-04'])
+        self.assertEqual(self.index.next_date('pistachio', '2017-03-01'), ('pistachio', '2017-03-01'))
+
+
+if __name__ == '__main__':
+    unittest.main()
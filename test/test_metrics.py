@@ -0,0 +1,109 @@
+"""Tests of the per-request spans and counters and their embedded metric lines."""
+import json
+import logging
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import metrics
+
+
+class _Lines(logging.Handler):
+    """Keeps the emitted metric lines."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(record.getMessage()))
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.enabled = metrics.enabled
+        self.level = metrics.logger.level
+        self.propagate = metrics.logger.propagate
+        metrics.enabled = True
+        self.handler = _Lines()
+        metrics.logger.addHandler(self.handler)
+        metrics.logger.setLevel(logging.INFO)
+        metrics.logger.propagate = False
+
+    def tearDown(self):
+        metrics.end_request()
+        metrics.enabled = self.enabled
+        metrics.logger.removeHandler(self.handler)
+        metrics.logger.setLevel(self.level)
+        metrics.logger.propagate = self.propagate
+
+    def test_embedded_metric_format(self):
+        metrics.start_request('GetSearchIntent')
+        with metrics.span('fetch'):
+            pass
+        with metrics.span('fetch'):
+            pass
+        metrics.count('month_cache.hit')
+        metrics.count('month_cache.hit', 2)
+        metrics.end_request()
+
+        self.assertEqual(len(self.handler.lines), 1)
+        line = self.handler.lines[0]
+        self.assertEqual(line['request'], 'GetSearchIntent')
+        self.assertEqual(line['month_cache.hit'], 3)
+        self.assertIn('fetch_ms', line)
+        self.assertGreaterEqual(line['total_ms'], line['fetch_ms'])
+
+        directive = line['_aws']['CloudWatchMetrics'][0]
+        self.assertEqual(directive['Namespace'], metrics.NAMESPACE)
+        self.assertEqual(directive['Dimensions'], [['request']])
+        self.assertEqual(sorted((m['Name'], m['Unit']) for m in directive['Metrics']),
+                         [('fetch_ms', 'Milliseconds'), ('month_cache.hit', 'Count'),
+                          ('total_ms', 'Milliseconds')])
+        self.assertIsInstance(line['_aws']['Timestamp'], int)
+
+    def test_request_pairing(self):
+        metrics.start_request('GetHoursIntent')
+        metrics.end_request()
+        # ending a request twice or counting outside of one emits nothing
+        metrics.end_request()
+        metrics.count('month_cache.hit')
+        self.assertEqual([line['request'] for line in self.handler.lines], ['GetHoursIntent'])
+        self.assertIsNone(metrics.current())
+
+    def test_span_outside_request(self):
+        with metrics.span('parse'):
+            pass
+        self.assertEqual(len(self.handler.lines), 1)
+        self.assertEqual(self.handler.lines[0]['request'], 'parse')
+
+    def test_worker_thread_attached(self):
+        metrics.start_request('GetSearchWeekIntent')
+        recorder = metrics.current()
+
+        def work():
+            metrics.attach(recorder)
+            metrics.count('coalesced')
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        metrics.end_request()
+        self.assertEqual(self.handler.lines[0]['coalesced'], 1)
+
+    def test_disabled(self):
+        metrics.enabled = False
+        metrics.start_request('GetSearchIntent')
+        with metrics.span('fetch'):
+            pass
+        metrics.end_request()
+        self.assertEqual(self.handler.lines, [])
+        self.assertIs(metrics.instrument('render', len), len)
+
+
+if __name__ == '__main__':
+    unittest.main()
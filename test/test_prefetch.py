@@ -0,0 +1,112 @@
+"""Tests of the speculative prefetch on launch and session start."""
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import api
+import skill
+from alexa import build_request
+from fake_upstream import FakeUpstream
+
+
+class PrefetchTest(unittest.TestCase):
+
+    def test_current_month(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url)
+            self.assertEqual(forecast.prefetch(datetime.date(2017, 5, 10)), [(2017, 5)])
+            self.assertEqual(forecast.search(datetime.date(2017, 5, 29)).flavors, ['Cotton Candy'])
+            self.assertEqual(upstream.total_hits, 1)
+
+    def test_next_month_near_month_end(self):
+        with FakeUpstream() as upstream:
+            forecast = api.DGMApi(url=upstream.url)
+            self.assertEqual(forecast.prefetch(datetime.date(2017, 5, 29)), [(2017, 5), (2017, 6)])
+            self.assertEqual(forecast.prefetch(datetime.date(2017, 5, 30)), [])
+            self.assertEqual(upstream.total_hits, 2)
+
+    def test_cancelled(self):
+        with FakeUpstream() as upstream:
+            cancelled = threading.Event()
+            cancelled.set()
+            forecast = api.DGMApi(url=upstream.url)
+            self.assertEqual(forecast.prefetch(datetime.date(2017, 5, 10), cancelled), [])
+            self.assertEqual(upstream.total_hits, 0)
+
+    def test_failures_are_left_to_the_search(self):
+        with FakeUpstream(failures=10) as upstream:
+            forecast = api.DGMApi(url=upstream.url, retries=0)
+            self.assertEqual(forecast.prefetch(datetime.date(2017, 5, 10)), [])
+
+
+class SkillPrefetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.upstream = FakeUpstream(latency=0.5).start()
+        calendar = skill.get_calendars().default
+        self._forecasts = dict(skill._forecasts)
+        self.forecast = skill._forecasts[calendar.key] = api.DGMApi(url=self.upstream.url, calendar=calendar)
+        self._verify = skill.app.config.get('ASK_VERIFY_REQUESTS', True)
+        skill.app.config['ASK_VERIFY_REQUESTS'] = False
+        self.level = logging.getLogger('flask_ask').level
+        logging.getLogger('flask_ask').setLevel(logging.WARNING)
+        self.client = skill.app.test_client()
+
+    def tearDown(self):
+        self.upstream.stop()
+        skill._forecasts.clear()
+        skill._forecasts.update(self._forecasts)
+        skill.app.config['ASK_VERIFY_REQUESTS'] = self._verify
+        logging.getLogger('flask_ask').setLevel(self.level)
+
+    def _post(self, request):
+        return self.client.post('/', data=json.dumps(request), content_type='application/json')
+
+    def _wait_for_prefetch(self):
+        deadline = time.time() + 5
+        while skill._prefetches and time.time() < deadline:
+            time.sleep(0.01)
+        today = datetime.date.today()
+        refresh = self.forecast._refreshes.get((today.year, today.month))
+        if refresh is not None:
+            refresh.done.wait(5)
+
+    def test_launch_is_not_delayed(self):
+        start = time.time()
+        response = self._post(build_request(None, request_type='LaunchRequest'))
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.time() - start, 0.4)
+
+        self._wait_for_prefetch()
+        hits = self.upstream.total_hits
+        self.assertGreaterEqual(hits, 1)
+
+        start = time.time()
+        self._post(build_request('GetSearchIntent', new=False))
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(self.upstream.total_hits, hits)
+
+    def test_static_intents_do_not_prefetch(self):
+        self._post(build_request('GetHoursIntent'))
+        self.assertEqual(skill._prefetches, {})
+        time.sleep(0.1)
+        self.assertEqual(self.upstream.total_hits, 0)
+
+    def test_session_end_cancels(self):
+        cancelled = threading.Event()
+        skill._prefetches['SessionId.ended'] = cancelled
+        self._post(build_request(None, request_type='SessionEndedRequest', new=False,
+                                 session_id='SessionId.ended'))
+        self.assertTrue(cancelled.is_set())
+        self.assertNotIn('SessionId.ended', skill._prefetches)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""Tests of the sampled request profiling and the hot function report."""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import profiling
+
+
+def slow_lookup():
+    return sum(i * i for i in range(20000))
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self._settings = profiling.enabled, profiling.rate, profiling.directory
+        profiling.enabled, profiling.rate, profiling.directory = True, 1.0, self.tmp
+
+    def tearDown(self):
+        profiling.enabled, profiling.rate, profiling.directory = self._settings
+        shutil.rmtree(self.tmp)
+
+    def _profile(self, name, func):
+        profiling.start_request(name)
+        func()
+        return profiling.end_request()
+
+    def test_parse_rate(self):
+        self.assertEqual(profiling._parse_rate('1'), 1.0)
+        self.assertEqual(profiling._parse_rate('true'), 1.0)
+        self.assertEqual(profiling._parse_rate('0.25'), 0.25)
+        self.assertEqual(profiling._parse_rate(None), 0.0)
+        self.assertEqual(profiling._parse_rate('off'), 0.0)
+        self.assertEqual(profiling._parse_rate('7'), 1.0)
+
+    def test_dumps_profile_and_summary(self):
+        path = self._profile('GetSearchIntent', slow_lookup)
+        self.assertTrue(path.startswith(os.path.join(self.tmp, 'GetSearchIntent')))
+        self.assertTrue(os.path.exists(path))
+        with open(path[:-len('.prof')] + '.json') as f:
+            summary = json.load(f)
+        self.assertEqual(summary['request'], 'GetSearchIntent')
+        self.assertGreater(summary['wall_ms'], 0)
+        self.assertGreater(summary['rss_start_kb'], 0)
+        self.assertEqual(summary['rss_growth_kb'], summary['rss_end_kb'] - summary['rss_start_kb'])
+        self.assertGreater(summary['process_peak_rss_kb'], 0)
+
+    def test_memory_growth_per_request(self):
+        held = []
+        path = self._profile('GetSearchIntent', lambda: held.append(bytearray(16 * 1024 * 1024)))
+        with open(path[:-len('.prof')] + '.json') as f:
+            summary = json.load(f)
+        self.assertGreaterEqual(summary['rss_growth_kb'], 15 * 1024)
+
+        # the next request does not inherit the growth of the one before
+        del held[:]
+        path = self._profile('GetSearchIntent', lambda: None)
+        with open(path[:-len('.prof')] + '.json') as f:
+            summary = json.load(f)
+        self.assertLess(summary['rss_growth_kb'], 1024)
+
+    def test_not_sampled(self):
+        profiling.rate = 0.0
+        self.assertIsNone(self._profile('GetSearchIntent', slow_lookup))
+        profiling.rate, profiling.enabled = 1.0, False
+        self.assertIsNone(self._profile('GetSearchIntent', slow_lookup))
+        self.assertEqual(os.listdir(self.tmp), [])
+
+    def test_report_per_intent(self):
+        for _ in range(3):
+            self._profile('GetSearchIntent', slow_lookup)
+        self._profile('GetHoursIntent', lambda: None)
+
+        profiles = profiling.load_profiles(self.tmp)
+        self.assertEqual(sorted(profiles), ['GetHoursIntent', 'GetSearchIntent'])
+        stats, summaries = profiles['GetSearchIntent']
+        self.assertEqual(len(summaries), 3)
+
+        hot = profiling.hot_functions(stats, top=5, sort='cumtime')
+        self.assertTrue(any('slow_lookup' in label for label, _, _, _ in hot))
+        calls = [calls for label, calls, _, _ in hot if 'slow_lookup' in label]
+        self.assertEqual(calls, [3])
+        self.assertEqual(list(profiling.load_profiles(self.tmp, 'GetHoursIntent')), ['GetHoursIntent'])
+
+
+if __name__ == '__main__':
+    unittest.main()
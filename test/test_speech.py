@@ -0,0 +1,87 @@
+"""Tests of the precompiled speech templates against flask-ask rendering."""
+import datetime
+import json
+import logging
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from flask import render_template
+
+import skill
+import speech
+from alexa import build_request
+
+# Arguments every template is rendered with
+CONTEXT = {'date': datetime.date(2017, 5, 29), 'flavors': 'Cotton Candy', 'time': '2 hours',
+           'period': 'this week', 'days': 'Monday is Cotton Candy', 'day': 'Monday',
+           'flavor': 'Cotton Candy', 'start': '12 PM', 'end': '9 PM',
+           'store': 'The Dairy Godmother', 'location': 'Del Ray', 'timezone': 'Eastern Daylight Time',
+           'schedule': 'from 12 PM to 9 PM Monday', 'address': '2310 Mount Vernon Ave.'}
+
+
+class StubResponse(object):
+
+    def render_response(self):
+        return '{}'
+
+
+class SpeechTemplatesTest(unittest.TestCase):
+
+    def test_matches_flask_ask(self):
+        with skill.app.app_context():
+            for name in skill.SPEECH.templates:
+                self.assertEqual(skill.SPEECH.render(name, **CONTEXT),
+                                 render_template(name, **CONTEXT), name)
+
+    def test_memoized(self):
+        templates = speech.SpeechTemplates(cache_size=2)
+        first = templates.render('found', date='today', flavors='Cotton Candy')
+        self.assertIs(templates.render('found', date='today', flavors='Cotton Candy'), first)
+
+        templates.render('found', date='tomorrow', flavors='Cotton Candy')
+        templates.render('notfound', date='today')
+        self.assertEqual(len(templates._rendered), 2)
+        self.assertNotIn(('found', (('date', 'today'), ('flavors', 'Cotton Candy'))),
+                         templates._rendered)
+
+    def test_static_response(self):
+        templates = speech.SpeechTemplates()
+        built = []
+
+        def build():
+            built.append(True)
+            return StubResponse()
+
+        self.assertEqual(templates.response('stop', build, {}), '{}')
+        self.assertEqual(templates.response('stop', build, {}), '{}')
+        self.assertEqual(len(built), 1)
+        self.assertIsInstance(templates.response('stop', build, {'count': 1}), StubResponse)
+
+    def test_static_intents_not_rendered_again(self):
+        verify = skill.app.config.get('ASK_VERIFY_REQUESTS', True)
+        level = logging.getLogger('flask_ask').level
+        skill.app.config['ASK_VERIFY_REQUESTS'] = False
+        logging.getLogger('flask_ask').setLevel(logging.WARNING)
+        render = skill.render_template
+        rendered = []
+        client = skill.app.test_client()
+        try:
+            for intent in ('AMAZON.HelpIntent', 'GetLocationIntent', 'GetHoursIntent', 'GetAboutIntent'):
+                body = json.dumps(build_request(intent))
+                expected = client.post('/', data=body, content_type='application/json').data
+                skill.render_template = lambda name, **context: rendered.append(name)
+                self.assertEqual(client.post('/', data=body, content_type='application/json').data,
+                                 expected, intent)
+                skill.render_template = render
+        finally:
+            skill.render_template = render
+            skill.app.config['ASK_VERIFY_REQUESTS'] = verify
+            logging.getLogger('flask_ask').setLevel(level)
+        self.assertEqual(rendered, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Tests of reading and publishing files locally and in S3."""
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import storage
+import warmer
+
+
+class _ClientError(Exception):
+    """Error carrying the response of a failed S3 call, like `botocore`."""
+
+    def __init__(self, code):
+        super(_ClientError, self).__init__(code)
+        self.response = {'Error': {'Code': code}}
+
+
+class _S3Objects(object):
+    """In-memory stand-in for the `get_object` and `put_object` calls of an S3 client."""
+
+    def __init__(self):
+        self.objects = {}
+        self.gets = 0
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.gets += 1
+        if (Bucket, Key) not in self.objects:
+            raise _ClientError('NoSuchKey')
+        body = self.objects[(Bucket, Key)]
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if IfNoneMatch == etag:
+            raise _ClientError('304')
+        return {'Body': io.BytesIO(body), 'ETag': etag}
+
+
+class StorageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_local(self):
+        path = os.path.join(self.directory, 'snapshot.json')
+        storage.write(path, b'{}')
+        data, version = storage.read(path)
+        self.assertEqual(data, b'{}')
+        self.assertRaises(storage.NotModified, storage.read, path, version)
+        self.assertFalse(os.path.exists(path + '.tmp'))
+
+    def test_s3(self):
+        client = _S3Objects()
+        url = 's3://flavorforecast/flavorforecast-snapshot.json'
+        self.assertTrue(storage.is_s3(url))
+        warmer.write_snapshot({'version': 1, 'generated': 0, 'months': {}}, url, client)
+        self.assertIn(('flavorforecast', 'flavorforecast-snapshot.json'), client.objects)
+
+        data, version = storage.read(url, client=client)
+        self.assertEqual(data, b'{"generated":0,"months":{},"version":1}')
+        self.assertRaises(storage.NotModified, storage.read, url, version, client)
+
+        self.assertRaises(_ClientError, storage.read, 's3://flavorforecast/missing', None, client)
+
+
+if __name__ == '__main__':
+    unittest.main()
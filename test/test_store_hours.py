@@ -0,0 +1,84 @@
+"""Tests of the store hours table across month ends and daylight saving time."""
+import datetime
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pytz
+
+import store_hours
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=pytz.utc)
+
+
+class StoreHoursTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hours = store_hours.StoreHours()
+
+    def test_open_summer(self):
+        # Monday 12:30 EDT, closes at 21:00 EDT
+        state = self.hours.lookup(utc(2017, 5, 1, 16, 30))
+        self.assertTrue(state.is_open)
+        self.assertEqual(state.seconds_until_close, 8.5 * 3600)
+        self.assertEqual(state.next_close, utc(2017, 5, 2, 1, 0))
+
+    def test_open_winter(self):
+        # Monday 12:30 EST, closes at 21:00 EST
+        state = self.hours.lookup(utc(2017, 1, 2, 17, 30))
+        self.assertTrue(state.is_open)
+        self.assertEqual(state.next_close, utc(2017, 1, 3, 2, 0))
+
+    def test_month_end(self):
+        # Wednesday 19:00 EDT on the last day of the month, closes at 22:00 EDT
+        state = self.hours.lookup(utc(2017, 5, 31, 23, 0))
+        self.assertTrue(state.is_open)
+        self.assertEqual(state.seconds_until_close, 3 * 3600)
+
+    def test_closed_morning(self):
+        # Tuesday 06:00 EDT, opens at 12:00 EDT
+        state = self.hours.lookup(utc(2017, 5, 2, 10, 0))
+        self.assertFalse(state.is_open)
+        self.assertEqual(state.seconds_until_open, 6 * 3600)
+        self.assertEqual(state.next_open, utc(2017, 5, 2, 16, 0))
+
+    def test_daylight_saving_change(self):
+        # Sunday 01:00 EST before the change, opens at 12:00 EDT
+        state = self.hours.lookup(utc(2017, 3, 12, 6, 0))
+        self.assertFalse(state.is_open)
+        self.assertEqual(state.seconds_until_open, 10 * 3600)
+
+    def test_week_boundary(self):
+        # Sunday 23:00 EDT, opens Monday at 12:00 EDT
+        state = self.hours.lookup(utc(2017, 5, 1, 3, 0))
+        self.assertFalse(state.is_open)
+        self.assertEqual(state.seconds_until_open, 13 * 3600)
+
+    def test_naive_is_utc(self):
+        self.assertEqual(self.hours.lookup(datetime.datetime(2017, 5, 1, 16, 30)),
+                         self.hours.lookup(utc(2017, 5, 1, 16, 30)))
+
+    def test_lookup_many(self):
+        dts = [utc(2017, 5, 1, 16, 30), utc(2017, 5, 2, 10, 0), utc(2017, 3, 12, 6, 0)]
+        self.assertEqual(self.hours.lookup_many(dts), [self.hours.lookup(dt) for dt in dts])
+
+    def test_lookup_many_unordered(self):
+        # every half hour of three weeks around the daylight saving change, shuffled
+        start = utc(2017, 3, 1)
+        dts = [start + datetime.timedelta(minutes=30 * i) for i in range(3 * 7 * 48)]
+        dts = dts[1::2] + dts[::-2]
+        self.assertEqual(self.hours.lookup_many(dts), [self.hours.lookup(dt) for dt in dts])
+
+    def test_hours_on(self):
+        self.assertEqual(self.hours.hours_on(datetime.date(2017, 5, 1)), ('12 PM', '9 PM'))
+        self.assertEqual(self.hours.hours_on(datetime.date(2017, 5, 3)), ('12 PM', '10 PM'))
+        # Thursday 01:00 UTC is still Wednesday in the store
+        self.assertEqual(self.hours.hours_on(utc(2017, 5, 4, 1, 0)), ('12 PM', '10 PM'))
+
+
+if __name__ == '__main__':
+    unittest.main()